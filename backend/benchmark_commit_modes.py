@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark for product commit modes against a local chain
+Registers the same synthetic products three ways and reports transactions,
+gas and throughput for each:
+  - mint: one mintProduct transaction per product
+  - mint batch: one mintBatch transaction per MINT_BATCH_SIZE products
+  - anchored: one commitRoot transaction per ANCHOR_BATCH_SIZE products
+Start a local chain and deploy the contract first:
+  cd hardhat && npx hardhat node
+  npx hardhat run scripts/deploy.js --network localhost
+Usage: LOCAL_CHAIN_CONTRACT=0x... LOCAL_CHAIN_PRIVATE_KEY=0x... python benchmark_commit_modes.py [product_count]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+from web3 import Web3
+from eth_account import Account
+
+from main import (
+    PRODUCT_NFT_ABI,
+    MINT_BATCH_SIZE,
+    ANCHOR_BATCH_SIZE,
+    build_merkle_tree,
+    merkle_leaf,
+    verify_merkle_proof,
+)
+
+LOCAL_CHAIN_URL = os.getenv("LOCAL_CHAIN_URL", "http://127.0.0.1:8545")
+LOCAL_CHAIN_CONTRACT = os.getenv("LOCAL_CHAIN_CONTRACT")
+LOCAL_CHAIN_PRIVATE_KEY = os.getenv("LOCAL_CHAIN_PRIVATE_KEY")
+PRODUCT_COUNT = 1000
+
+def generate_products(count):
+    # A per-run prefix keeps roots unique, since commitRoot rejects a root it has seen
+    run_id = os.urandom(4).hex()
+    products = []
+    for i in range(count):
+        metadata = {"name": f"Product {i}", "serial_number": f"SN-{run_id}-{i:06d}", "batch_id": f"BATCH-{i // 100}"}
+        metadata_hash = hashlib.sha256(json.dumps(metadata, sort_keys=True).encode()).hexdigest()
+        products.append({
+            "name": metadata["name"],
+            "description": "Benchmark product",
+            "serial_number": metadata["serial_number"],
+            "batch_id": metadata["batch_id"],
+            "manufacturing_date": "01-01-25",
+            "ipfs_cid": f"bafy{metadata_hash[:42]}",
+            "metadata_hash": metadata_hash
+        })
+    return products
+
+def mint_args(product):
+    return (
+        product["name"],
+        product["description"],
+        product["serial_number"],
+        product["batch_id"],
+        product["manufacturing_date"],
+        product["ipfs_cid"],
+        bytes.fromhex(product["metadata_hash"])
+    )
+
+class LocalChain:
+    def __init__(self):
+        self.w3 = Web3(Web3.HTTPProvider(LOCAL_CHAIN_URL))
+        self.account = Account.from_key(LOCAL_CHAIN_PRIVATE_KEY)
+        self.contract = self.w3.eth.contract(address=Web3.to_checksum_address(LOCAL_CHAIN_CONTRACT), abi=PRODUCT_NFT_ABI)
+        self.nonce = self.w3.eth.get_transaction_count(self.account.address, "pending")
+
+    def send(self, function_call):
+        """Submit without waiting, so each mode is measured with pipelined transactions"""
+        tx = function_call.build_transaction({
+            "from": self.account.address,
+            "nonce": self.nonce,
+            "gasPrice": self.w3.eth.gas_price
+        })
+        signed_tx = self.account.sign_transaction(tx)
+        self.nonce += 1
+        return self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+
+    def run(self, calls):
+        start = time.perf_counter()
+        tx_hashes = [self.send(call) for call in calls]
+        receipts = [self.w3.eth.wait_for_transaction_receipt(tx_hash) for tx_hash in tx_hashes]
+        seconds = time.perf_counter() - start
+
+        if any(receipt["status"] != 1 for receipt in receipts):
+            print("FAILED: a transaction reverted")
+            sys.exit(1)
+        return len(receipts), sum(receipt["gasUsed"] for receipt in receipts), seconds
+
+def report(mode, count, transactions, gas, seconds):
+    print(
+        f"{mode:<11} {transactions:>6} txs  {gas:>14,} gas  {gas // count:>9,} gas/product  "
+        f"{seconds:>7.2f}s  {count / seconds:>9,.0f} products/s"
+    )
+
+def run(count):
+    chain = LocalChain()
+    products = generate_products(count)
+    to = chain.account.address
+    functions = chain.contract.functions
+
+    report("mint", count, *chain.run([functions.mintProduct(to, *mint_args(p)) for p in products]))
+
+    report("mint batch", count, *chain.run([
+        functions.mintBatch(to, [mint_args(p) for p in products[start:start + MINT_BATCH_SIZE]])
+        for start in range(0, count, MINT_BATCH_SIZE)
+    ]))
+
+    # Tree building is part of the anchored cost, so it is inside the timing
+    start = time.perf_counter()
+    calls = []
+    for offset in range(0, count, ANCHOR_BATCH_SIZE):
+        chunk = products[offset:offset + ANCHOR_BATCH_SIZE]
+        leaves = [merkle_leaf(json.dumps(p, sort_keys=True).encode()) for p in chunk]
+        root, proofs = build_merkle_tree(leaves)
+        if not all(verify_merkle_proof(leaf, proof, root) for leaf, proof in zip(leaves, proofs)):
+            print("FAILED: an inclusion proof did not verify")
+            sys.exit(1)
+        calls.append(functions.commitRoot(root, len(chunk)))
+    tree_seconds = time.perf_counter() - start
+    transactions, gas, seconds = chain.run(calls)
+    report("anchored", count, transactions, gas, seconds + tree_seconds)
+
+if __name__ == "__main__":
+    print("Benchmarking product commit modes")
+    print("=" * 50)
+
+    if not LOCAL_CHAIN_CONTRACT or not LOCAL_CHAIN_PRIVATE_KEY:
+        print("ERROR: set LOCAL_CHAIN_CONTRACT and LOCAL_CHAIN_PRIVATE_KEY for the local chain")
+        sys.exit(1)
+
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else PRODUCT_COUNT)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for per-request IPFS overhead
+Adds the same small JSON documents to a local IPFS daemon two ways:
+  - before: a fresh HTTP client and daemon version check per request, which
+    is what connecting with ipfshttpclient on every request cost
+  - after: the shared, pooled IPFSClient used by the API
+Both are run sequentially (per-request latency) and concurrently (throughput).
+Start an IPFS daemon first (ipfs daemon), then:
+Usage: IPFS_HOST=localhost IPFS_PORT=5001 python benchmark_ipfs_client.py [request_count]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import httpx
+
+from main import IPFS_HOST, IPFS_PORT, IPFS_MAX_CONCURRENCY, IPFS_TIMEOUT, ipfs
+
+REQUEST_COUNT = 500
+
+def generate_documents(count):
+    return [json.dumps({"serial_number": f"SN-{i:06d}", "batch_id": "BENCH", "action": "shipped"}) for i in range(count)]
+
+async def add_connect_per_request(data):
+    async with httpx.AsyncClient(base_url=f"http://{IPFS_HOST}:{IPFS_PORT}", timeout=IPFS_TIMEOUT) as client:
+        (await client.post("/api/v0/version")).raise_for_status()
+        response = await client.post("/api/v0/add", files={"file": ("data", data.encode())})
+        response.raise_for_status()
+        return response.json()["Hash"]
+
+async def add_pooled(data):
+    return await ipfs.add_str(data)
+
+async def run_sequential(add, documents):
+    start = time.perf_counter()
+    cids = [await add(data) for data in documents]
+    return cids, time.perf_counter() - start
+
+async def run_concurrent(add, documents):
+    semaphore = asyncio.Semaphore(IPFS_MAX_CONCURRENCY)
+
+    async def limited(data):
+        async with semaphore:
+            return await add(data)
+
+    start = time.perf_counter()
+    cids = await asyncio.gather(*(limited(data) for data in documents))
+    return cids, time.perf_counter() - start
+
+def report(label, count, seconds):
+    print(f"{label:<28} {seconds:>7.2f}s  {seconds / count * 1000:>7.2f}ms/request  {count / seconds:>8,.0f} requests/s")
+
+async def run(count):
+    documents = generate_documents(count)
+    # Warm the pooled client's connection and health check outside the timing
+    await ipfs.add_str(documents[0])
+
+    try:
+        before_cids, before_seq = await run_sequential(add_connect_per_request, documents)
+        after_cids, after_seq = await run_sequential(add_pooled, documents)
+        report("before, sequential", count, before_seq)
+        report("after, sequential", count, after_seq)
+
+        _, before_conc = await run_concurrent(add_connect_per_request, documents)
+        _, after_conc = await run_concurrent(add_pooled, documents)
+        report("before, concurrent", count, before_conc)
+        report("after, concurrent", count, after_conc)
+    finally:
+        await ipfs.close()
+
+    if before_cids != after_cids:
+        print("FAILED: both clients should produce the same CIDs")
+        sys.exit(1)
+
+    overhead_ms = (before_seq - after_seq) / count * 1000
+    print(f"SUCCESS: pooled client saves {overhead_ms:.2f}ms per request ({before_seq / after_seq:.1f}x sequential, {before_conc / after_conc:.1f}x concurrent)")
+
+if __name__ == "__main__":
+    print("Benchmarking IPFS client overhead")
+    print("=" * 50)
+
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else REQUEST_COUNT))
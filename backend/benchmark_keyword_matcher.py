@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the risk lexicon keyword matcher
+Scales a weighted lexicon from 10 to 1,000 terms and compares KeywordMatcher
+against one substring scan per term, checking both give the same scores.
+Usage: python benchmark_keyword_matcher.py [description_count]
+"""
+
+import sys
+import time
+import random
+
+from main import KeywordMatcher, DEFAULT_RISK_LEXICON
+
+DESCRIPTION_COUNT = 20_000
+LEXICON_SIZES = [10, 100, 1_000]
+SEED = 7
+
+WORDS = [
+    "urgent", "payment", "stable", "supplier", "cash", "flow", "goods", "order",
+    "premium", "quality", "crisis", "logistics", "contract", "reliable", "invoice",
+    "shipment", "delay", "emergency", "restock", "established", "immediate", "net",
+]
+
+def build_lexicon(size, rng):
+    """Default lexicon padded with random one to three word phrases"""
+    lexicon = dict(DEFAULT_RISK_LEXICON)
+    while len(lexicon) < size:
+        phrase = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+        lexicon.setdefault(phrase, rng.randint(-3, 5))
+    return lexicon
+
+def naive_score(lexicon, description):
+    desc_lower = description.lower()
+    return sum(weight for term, weight in lexicon.items() if term in desc_lower)
+
+def run(count):
+    rng = random.Random(SEED)
+    descriptions = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))) for _ in range(count)]
+
+    for size in LEXICON_SIZES:
+        lexicon = build_lexicon(size, rng)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(lexicon)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher_scores = [matcher.score(d) for d in descriptions]
+        matcher_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        naive_scores = [naive_score(matcher.lexicon, d) for d in descriptions]
+        naive_seconds = time.perf_counter() - start
+
+        if matcher_scores != naive_scores:
+            print(f"FAILED: scores differ with {size} terms")
+            sys.exit(1)
+
+        print(
+            f"{len(lexicon):>5} terms: build {build_seconds * 1000:.1f}ms, "
+            f"matcher {matcher_seconds:.2f}s, per-term scan {naive_seconds:.2f}s"
+        )
+
+    print("SUCCESS: scores identical at every lexicon size")
+
+if __name__ == "__main__":
+    print("Benchmarking risk lexicon matcher")
+    print("=" * 50)
+
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else DESCRIPTION_COUNT)
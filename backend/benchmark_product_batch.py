@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark for batch product creation
+Creates the same number of synthetic products through N single
+POST /api/products calls and through POST /api/products/batch, and reports
+products per second for each. The batch path should be at least 20x faster.
+Minting runs in the background mint queue for both paths, so this measures
+the API side: IPFS uploads, Mongo writes and mint job enqueueing.
+Start the API first (python main.py), then:
+Usage: API_URL=http://localhost:8001 python benchmark_product_batch.py [product_count]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import httpx
+
+from main import MAX_PRODUCT_BATCH
+
+API_URL = os.getenv("API_URL", "http://localhost:8001").rstrip("/")
+PRODUCT_COUNT = 1000
+SINGLE_CONCURRENCY = 10  # Parallel single creates, like several line terminals
+TARGET_SPEEDUP = 20
+
+def generate_products(count, label):
+    # A per-run prefix keeps serial numbers unique across runs
+    run_id = os.urandom(4).hex()
+    return [{
+        "name": f"Product {i}",
+        "description": "Benchmark product",
+        "serial_number": f"SN-{label}-{run_id}-{i:06d}",
+        "batch_id": f"BENCH-{run_id}",
+        "manufacturing_date": "2025-01-01T00:00"
+    } for i in range(count)]
+
+async def create_single(client, products):
+    semaphore = asyncio.Semaphore(SINGLE_CONCURRENCY)
+
+    async def create(product):
+        async with semaphore:
+            response = await client.post("/api/products", json=product)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(create(p) for p in products))
+    return time.perf_counter() - start
+
+async def create_batch(client, products):
+    start = time.perf_counter()
+    for offset in range(0, len(products), MAX_PRODUCT_BATCH):
+        response = await client.post("/api/products/batch", json={"products": products[offset:offset + MAX_PRODUCT_BATCH]})
+        response.raise_for_status()
+        if not all(result["success"] for result in response.json()["results"]):
+            print("FAILED: the batch endpoint reported failed items")
+            sys.exit(1)
+    return time.perf_counter() - start
+
+async def run(count):
+    async with httpx.AsyncClient(base_url=API_URL, timeout=httpx.Timeout(600)) as client:
+        single_seconds = await create_single(client, generate_products(count, "single"))
+        print(f"single creates: {single_seconds:.2f}s ({count / single_seconds:,.0f} products/s)")
+
+        batch_seconds = await create_batch(client, generate_products(count, "batch"))
+        print(f"batch create:   {batch_seconds:.2f}s ({count / batch_seconds:,.0f} products/s)")
+
+    speedup = single_seconds / batch_seconds
+    if speedup < TARGET_SPEEDUP:
+        print(f"FAILED: {speedup:.1f}x speedup, target is {TARGET_SPEEDUP}x")
+        sys.exit(1)
+    print(f"SUCCESS: {speedup:.1f}x speedup")
+
+if __name__ == "__main__":
+    print("Benchmarking batch product creation")
+    print("=" * 50)
+
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else PRODUCT_COUNT))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark for bulk invoice risk scoring
+Scores a synthetic invoice book with calculate_risk_scores and compares it
+against calling calculate_risk_score once per invoice, checking that both
+give identical results under the same "now" snapshot.
+Usage: python benchmark_risk_scoring.py [invoice_count]
+"""
+
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+from main import calculate_risk_score, calculate_risk_scores
+
+INVOICE_COUNT = 1_000_000
+BUYER_COUNT = 5_000
+SEED = 42
+
+DESCRIPTIONS = [
+    "Urgent payment needed for cash flow",
+    "Stable long-term supplier, premium quality goods",
+    "Emergency restock after supply crisis",
+    "Established and reliable logistics contract",
+    "Quarterly raw material order",
+    "Immediate settlement requested",
+]
+
+def generate_invoices(count):
+    """Build columnar invoice data with realistic repetition of buyers and dates"""
+    rng = random.Random(SEED)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    buyers = [f"Buyer {i}" for i in range(BUYER_COUNT)]
+
+    amounts = [round(rng.uniform(0.1, 120), 2) for _ in range(count)]
+    due_dates = [
+        (today + timedelta(days=rng.randint(-10, 365))).date().isoformat() if rng.random() > 0.01 else "not-a-date"
+        for _ in range(count)
+    ]
+    invoice_buyers = [rng.choice(buyers) for _ in range(count)]
+    descriptions = [rng.choice(DESCRIPTIONS) for _ in range(count)]
+    return amounts, due_dates, invoice_buyers, descriptions
+
+def run(count):
+    print(f"Generating {count} invoices...")
+    amounts, due_dates, buyers, descriptions = generate_invoices(count)
+    now = datetime.utcnow()
+
+    start = time.perf_counter()
+    batch_scores = calculate_risk_scores(amounts, due_dates, buyers, descriptions, now)
+    batch_seconds = time.perf_counter() - start
+    print(f"calculate_risk_scores: {batch_seconds:.2f}s ({count / batch_seconds:,.0f} invoices/s)")
+
+    start = time.perf_counter()
+    scalar_scores = [
+        calculate_risk_score(amounts[i], buyers[i], due_dates[i], descriptions[i], now)
+        for i in range(count)
+    ]
+    scalar_seconds = time.perf_counter() - start
+    print(f"calculate_risk_score loop: {scalar_seconds:.2f}s ({count / scalar_seconds:,.0f} invoices/s)")
+
+    mismatches = sum(1 for a, b in zip(batch_scores.tolist(), scalar_scores) if a != b)
+    if mismatches:
+        print(f"FAILED: {mismatches} scores differ")
+        sys.exit(1)
+
+    print(f"SUCCESS: scores identical, {scalar_seconds / batch_seconds:.1f}x speedup")
+
+if __name__ == "__main__":
+    print("Benchmarking bulk risk scoring")
+    print("=" * 50)
+
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else INVOICE_COUNT)
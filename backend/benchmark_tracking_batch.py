@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark for batched tracking event ingestion
+Sends the same burst of scan events for a set of products through single
+POST /api/tracking_events calls and through POST /api/tracking_events/batch,
+against a running API, and reports events per second for each. The batch
+path should ingest at least 10x more events per second.
+Start the API first (python main.py), then:
+Usage: API_URL=http://localhost:8001 python benchmark_tracking_batch.py [event_count]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import httpx
+
+from main import MAX_TRACKING_BATCH
+
+API_URL = os.getenv("API_URL", "http://localhost:8001").rstrip("/")
+EVENT_COUNT = 5000
+PRODUCT_COUNT = 50
+SINGLE_CONCURRENCY = 10  # Parallel single calls, like several handhelds syncing
+TARGET_SPEEDUP = 10
+ACTIONS = ["shipped", "received"]
+
+async def create_products(client, count):
+    run_id = os.urandom(4).hex()
+    response = await client.post("/api/products/batch", json={"products": [{
+        "name": f"Product {i}",
+        "description": "Benchmark product",
+        "serial_number": f"SN-{run_id}-{i:06d}",
+        "batch_id": f"BENCH-{run_id}",
+        "manufacturing_date": "2025-01-01T00:00"
+    } for i in range(count)]})
+    response.raise_for_status()
+    return [result["product_id"] for result in response.json()["results"]]
+
+def generate_events(product_ids, count):
+    return [{
+        "product_id": product_ids[i % len(product_ids)],
+        "action": ACTIONS[(i // len(product_ids)) % len(ACTIONS)],
+        "actor": "Benchmark Logistics",
+        "role": "Distributor",
+        "location": f"Hub {i % 7}"
+    } for i in range(count)]
+
+async def ingest_single(client, events):
+    semaphore = asyncio.Semaphore(SINGLE_CONCURRENCY)
+
+    async def send(event):
+        async with semaphore:
+            response = await client.post("/api/tracking_events", json=event)
+            response.raise_for_status()
+
+    # Events of one product must arrive in order, so each product is one sequence
+    per_product = {}
+    for event in events:
+        per_product.setdefault(event["product_id"], []).append(event)
+
+    async def send_in_order(product_events):
+        for event in product_events:
+            await send(event)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send_in_order(product_events) for product_events in per_product.values()))
+    return time.perf_counter() - start
+
+async def ingest_batch(client, events):
+    start = time.perf_counter()
+    for offset in range(0, len(events), MAX_TRACKING_BATCH):
+        response = await client.post("/api/tracking_events/batch", json={"events": events[offset:offset + MAX_TRACKING_BATCH]})
+        response.raise_for_status()
+        if not all(result["success"] for result in response.json()["results"]):
+            print("FAILED: the batch endpoint reported failed events")
+            sys.exit(1)
+    return time.perf_counter() - start
+
+async def run(count):
+    async with httpx.AsyncClient(base_url=API_URL, timeout=httpx.Timeout(600)) as client:
+        single_seconds = await ingest_single(client, generate_events(await create_products(client, PRODUCT_COUNT), count))
+        print(f"single events: {single_seconds:.2f}s ({count / single_seconds:,.0f} events/s)")
+
+        batch_seconds = await ingest_batch(client, generate_events(await create_products(client, PRODUCT_COUNT), count))
+        print(f"batch events:  {batch_seconds:.2f}s ({count / batch_seconds:,.0f} events/s)")
+
+    speedup = single_seconds / batch_seconds
+    if speedup < TARGET_SPEEDUP:
+        print(f"FAILED: {speedup:.1f}x speedup, target is {TARGET_SPEEDUP}x")
+        sys.exit(1)
+    print(f"SUCCESS: {speedup:.1f}x speedup")
+
+if __name__ == "__main__":
+    print("Benchmarking tracking event ingestion")
+    print("=" * 50)
+
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else EVENT_COUNT))
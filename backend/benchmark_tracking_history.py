@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark for tracking history write amplification
+Replays EVENT_COUNT tracking events against one product document in two
+shapes and measures the BSON size of the document after every update, which
+is what the storage engine rewrites per event:
+  - unbounded: every event $pushed onto tracking_history (the old layout)
+  - bounded: the last TRACKING_HISTORY_LIMIT events plus counters, built with
+    tracking_summary_update as the API does
+Updates are applied in memory, so no database is needed.
+Usage: python benchmark_tracking_history.py [events_per_product]
+"""
+
+import sys
+import bson
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from main import (
+    TRACKING_HISTORY_LIMIT,
+    ProductCreate,
+    build_product_document,
+    build_product_metadata,
+    tracking_summary_entry,
+    tracking_summary_update,
+)
+
+EVENT_COUNT = 1000
+MAX_DOCUMENT_BYTES = 16 * 1024 * 1024
+ACTIONS = ["shipped", "received", "shipped", "received", "sold"]
+
+def apply_update(doc, update):
+    """Apply the $set / $push ($each, $slice) / $inc operators the tracking update uses"""
+    for field, value in update.get("$set", {}).items():
+        doc[field] = value
+    for field, push in update.get("$push", {}).items():
+        items = doc.setdefault(field, [])
+        items.extend(push["$each"] if isinstance(push, dict) and "$each" in push else [push])
+        if isinstance(push, dict) and "$slice" in push:
+            del items[:max(0, len(items) + push["$slice"])]
+    for path, amount in update.get("$inc", {}).items():
+        target = doc
+        *parents, leaf = path.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = target.get(leaf, 0) + amount
+
+def generate_events(count):
+    start = datetime(2025, 1, 1)
+    return [(str(ObjectId()), {
+        "action": ACTIONS[i % len(ACTIONS)],
+        "location": f"Warehouse {i % 50}",
+        "timestamp": start + timedelta(minutes=i)
+    }) for i in range(count)]
+
+def new_product():
+    metadata = build_product_metadata(ProductCreate(
+        name="Benchmark product", description="Write amplification benchmark",
+        serial_number="SN-000001", batch_id="BATCH-1", manufacturing_date="2025-01-01T00:00"
+    ))
+    doc = build_product_document(metadata, "bafy" + "0" * 42, "0" * 64, "0" * 130, None)
+    doc["_id"] = ObjectId()
+    return doc
+
+def unbounded_update(event_id, event_data):
+    return {
+        "$set": {"current_location": event_data["location"], "last_updated": event_data["timestamp"], "status": event_data["action"]},
+        "$push": {"tracking_history": tracking_summary_entry(event_id, event_data["action"], event_data["timestamp"])}
+    }
+
+def replay(label, doc, events, build_update):
+    written = 0
+    for event_id, event_data in events:
+        apply_update(doc, build_update(event_id, event_data))
+        written += len(bson.encode(doc))
+
+    final_size = len(bson.encode(doc))
+    print(f"{label:<10} final {final_size:>9,} B  written {written:>13,} B  {written / len(events):>9,.0f} B/event")
+    return doc, written
+
+def run(count):
+    events = generate_events(count)
+    event_bytes = sum(
+        len(bson.encode(tracking_summary_entry(event_id, data["action"], data["timestamp"]))) for event_id, data in events
+    )
+    initial_size = len(bson.encode(new_product()))
+
+    unbounded_doc, unbounded = replay("unbounded", new_product(), events, unbounded_update)
+    bounded_doc, bounded = replay("bounded", new_product(), events, lambda event_id, data: tracking_summary_update([(event_id, data)]))
+
+    print(f"Write amplification (bytes rewritten / event bytes): unbounded {unbounded / event_bytes:.1f}x, bounded {bounded / event_bytes:.1f}x")
+    per_event_growth = (len(bson.encode(unbounded_doc)) - initial_size) / count
+    print(f"Unbounded documents reach 16 MB after ~{MAX_DOCUMENT_BYTES / per_event_growth:,.0f} events")
+
+    if len(bounded_doc["tracking_history"]) > TRACKING_HISTORY_LIMIT or bounded_doc["tracking_event_count"] != count + 1:
+        print("FAILED: the bounded summary is not capped or lost events")
+        sys.exit(1)
+    print(f"SUCCESS: {unbounded / bounded:.1f}x fewer bytes written at {count} events per product")
+
+if __name__ == "__main__":
+    print("Benchmarking tracking history write amplification")
+    print("=" * 50)
+
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else EVENT_COUNT)
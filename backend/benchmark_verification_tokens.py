@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for verification token checks
+Measures verifies per second on one core for:
+  - re-signing: the old path, signing the message again with the private key
+    and comparing signatures
+  - stored token: constant-time comparison with the token stored at creation
+  - recovery: recovering the signer address from the presented signature,
+    used for documents without a stored token
+Uses a throwaway key, so no chain or database is needed.
+Usage: python benchmark_verification_tokens.py [verify_count]
+"""
+
+import sys
+import time
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from main import recover_token_signer, tokens_match, verification_message_hash
+
+VERIFY_COUNT = 2000
+
+def generate_products(count, private_key):
+    products = []
+    for i in range(count):
+        product = {
+            "serial_number": f"SN-{i:06d}",
+            "batch_id": f"BATCH-{i // 100}",
+            "ipfs_cid": f"bafy{i:042d}",
+            "metadata_hash": f"{i:064x}"
+        }
+        product["verification_token"] = sign_token(product, private_key)
+        products.append(product)
+    return products
+
+def sign_token(product, private_key):
+    message_hash = verification_message_hash(
+        product["serial_number"], product["batch_id"], product["ipfs_cid"], product["metadata_hash"]
+    )
+    return Account.sign_message(encode_defunct(message_hash), private_key).signature.hex()
+
+def measure(label, check, products):
+    start = time.perf_counter()
+    results = [check(product) for product in products]
+    seconds = time.perf_counter() - start
+    if not all(results):
+        print(f"FAILED: {label} rejected a valid token")
+        sys.exit(1)
+    print(f"{label:<14} {seconds:>7.3f}s  {len(products) / seconds:>12,.0f} verifies/s")
+    return seconds
+
+def run(count):
+    account = Account.create()
+    print(f"Signing {count} tokens...")
+    products = generate_products(count, account.key)
+
+    resign = measure("re-signing", lambda p: sign_token(p, account.key) == p["verification_token"], products)
+    stored = measure("stored token", lambda p: tokens_match(p["verification_token"], p["verification_token"]), products)
+    recovery = measure("recovery", lambda p: recover_token_signer(p, p["verification_token"]) == account.address, products)
+
+    # A token signed for another product must not recover to the signer
+    forged = {**products[0], "verification_token": products[1]["verification_token"]}
+    if recover_token_signer(products[0], forged["verification_token"]) == account.address:
+        print("FAILED: recovery accepted a token signed for another product")
+        sys.exit(1)
+
+    # Recovery avoids the private key rather than CPU; its speed relative to
+    # signing depends on the secp256k1 backend (coincurve vs pure Python)
+    print(f"SUCCESS: stored token {resign / stored:,.0f}x re-signing throughput, recovery {resign / recovery:.2f}x")
+
+if __name__ == "__main__":
+    print("Benchmarking verification token checks")
+    print("=" * 50)
+
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else VERIFY_COUNT)
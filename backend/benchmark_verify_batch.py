@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for pallet verification
+Verifies the same pallet of minted products with one POST /api/verify/batch
+call and with one POST /api/verify call per item, against a running API,
+and reports items per second for each. Verification caches are warmed by a
+first pass, so both paths are measured with the same cache state.
+Start the API first (python main.py), then:
+Usage: API_URL=http://localhost:8001 python benchmark_verify_batch.py [pallet_size]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import httpx
+
+API_URL = os.getenv("API_URL", "http://localhost:8001").rstrip("/")
+PALLET_SIZE = 500
+SINGLE_CONCURRENCY = 10  # Parallel single calls, like a few scanners at once
+MINT_WAIT_SECONDS = 300
+
+async def create_pallet(client, size):
+    """Mint a pallet of products and return their verification requests"""
+    run_id = os.urandom(4).hex()
+    response = await client.post("/api/products/batch", json={
+        "products": [{
+            "name": f"Product {i}",
+            "description": "Benchmark product",
+            "serial_number": f"SN-{run_id}-{i:06d}",
+            "batch_id": f"PALLET-{run_id}",
+            "manufacturing_date": "2025-01-01T00:00"
+        } for i in range(size)],
+        "commit_mode": "mint"
+    })
+    response.raise_for_status()
+    pending = {r["product_id"]: r["verification_token"] for r in response.json()["results"]}
+
+    items = []
+    deadline = time.monotonic() + MINT_WAIT_SECONDS
+    while pending:
+        if time.monotonic() > deadline:
+            print(f"FAILED: {len(pending)} products were not minted in {MINT_WAIT_SECONDS}s")
+            sys.exit(1)
+        for product_id, verification_token in list(pending.items()):
+            status = (await client.get(f"/api/products/{product_id}/mint_status")).json()
+            if status["mint_status"] == "failed":
+                print(f"FAILED: mint failed for {product_id}: {status['error']}")
+                sys.exit(1)
+            if status["mint_status"] == "minted":
+                items.append({"token_id": status["nft_token_id"], "verification_token": verification_token})
+                del pending[product_id]
+        await asyncio.sleep(1)
+    return items
+
+async def verify_single(client, items):
+    semaphore = asyncio.Semaphore(SINGLE_CONCURRENCY)
+
+    async def verify(item):
+        async with semaphore:
+            return (await client.post("/api/verify", json=item)).json()
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify(item) for item in items))
+    return results, time.perf_counter() - start
+
+async def verify_batch(client, items):
+    start = time.perf_counter()
+    response = await client.post("/api/verify/batch", json={"items": items})
+    response.raise_for_status()
+    return response.json()["results"], time.perf_counter() - start
+
+async def run(size):
+    async with httpx.AsyncClient(base_url=API_URL, timeout=httpx.Timeout(600)) as client:
+        items = await create_pallet(client, size)
+        print(f"Minted a pallet of {len(items)} products")
+        await verify_batch(client, items)
+
+        single_results, single_seconds = await verify_single(client, items)
+        print(f"single calls: {single_seconds:.2f}s ({size / single_seconds:,.0f} items/s)")
+        batch_results, batch_seconds = await verify_batch(client, items)
+        print(f"batch call:   {batch_seconds:.2f}s ({size / batch_seconds:,.0f} items/s)")
+
+    single_authentic = [r["authentic"] for r in single_results]
+    batch_authentic = [r["authentic"] for r in batch_results]
+    if single_authentic != batch_authentic or not all(batch_authentic):
+        print("FAILED: both paths should report every item as authentic")
+        sys.exit(1)
+    print(f"SUCCESS: {single_seconds / batch_seconds:.1f}x speedup for a {size}-item pallet")
+
+if __name__ == "__main__":
+    print("Benchmarking pallet verification")
+    print("=" * 50)
+
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else PALLET_SIZE))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for /api/verify latency while mints are in flight
+Runs concurrent /api/verify calls against a running API twice: once idle and
+once while new products are created continuously, so the mint worker keeps
+sending transactions and waiting on receipts. Blockchain I/O is async, so
+verify p99 should stay flat (within MAX_P99_RATIO of the idle run).
+Start the API first (python main.py), then:
+Usage: API_URL=http://localhost:8001 python benchmark_verify_latency.py [seconds_per_phase]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import httpx
+
+API_URL = os.getenv("API_URL", "http://localhost:8001").rstrip("/")
+PHASE_SECONDS = 20
+VERIFY_CONCURRENCY = 20
+VERIFY_PRODUCTS = 50
+MINT_CONCURRENCY = 5
+MAX_P99_RATIO = 2.0
+MINT_WAIT_SECONDS = 300
+
+def product_payload(label, i):
+    return {
+        "name": f"Product {i}",
+        "description": "Benchmark product",
+        "serial_number": f"SN-{label}-{i:06d}",
+        "batch_id": f"BENCH-{label}",
+        "manufacturing_date": "2025-01-01T00:00"
+    }
+
+async def create_minted_products(client, run_id):
+    """Products to verify; waits until the mint worker has given each a token ID"""
+    response = await client.post("/api/products/batch", json={
+        "products": [product_payload(f"verify-{run_id}", i) for i in range(VERIFY_PRODUCTS)],
+        "commit_mode": "mint"
+    })
+    response.raise_for_status()
+    results = response.json()["results"]
+
+    deadline = time.monotonic() + MINT_WAIT_SECONDS
+    minted = {}
+    while len(minted) < len(results):
+        if time.monotonic() > deadline:
+            print(f"FAILED: only {len(minted)}/{len(results)} products were minted in {MINT_WAIT_SECONDS}s")
+            sys.exit(1)
+        for result in results:
+            if result["product_id"] in minted:
+                continue
+            status = (await client.get(f"/api/products/{result['product_id']}/mint_status")).json()
+            if status["mint_status"] == "failed":
+                print(f"FAILED: mint failed for {result['product_id']}: {status['error']}")
+                sys.exit(1)
+            if status["mint_status"] == "minted":
+                minted[result["product_id"]] = {
+                    "token_id": status["nft_token_id"],
+                    "verification_token": result["verification_token"]
+                }
+        await asyncio.sleep(1)
+    return list(minted.values())
+
+async def verify_load(client, items, seconds):
+    latencies = []
+    deadline = time.monotonic() + seconds
+
+    async def worker(offset):
+        i = offset
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = await client.post("/api/verify", json=items[i % len(items)])
+            latencies.append(time.perf_counter() - start)
+            if not response.json().get("authentic"):
+                print(f"FAILED: verification did not pass: {response.json()}")
+                sys.exit(1)
+            i += VERIFY_CONCURRENCY
+
+    await asyncio.gather(*(worker(offset) for offset in range(VERIFY_CONCURRENCY)))
+    return sorted(latencies)
+
+async def mint_load(client, run_id, stop):
+    """Keep the mint queue busy until stop is set"""
+    created = 0
+
+    async def worker(offset):
+        nonlocal created
+        i = offset
+        while not stop.is_set():
+            response = await client.post("/api/products", json={**product_payload(f"load-{run_id}", i), "commit_mode": "mint"})
+            response.raise_for_status()
+            created += 1
+            i += MINT_CONCURRENCY
+
+    await asyncio.gather(*(worker(offset) for offset in range(MINT_CONCURRENCY)))
+    return created
+
+def percentile(latencies, p):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+def report(phase, latencies, seconds):
+    print(
+        f"{phase:<12} {len(latencies) / seconds:>8,.0f} verifies/s  "
+        f"p50 {percentile(latencies, 0.50):>7.1f}ms  p99 {percentile(latencies, 0.99):>7.1f}ms"
+    )
+
+async def run(seconds):
+    run_id = os.urandom(4).hex()
+    async with httpx.AsyncClient(base_url=API_URL, timeout=httpx.Timeout(60)) as client:
+        items = await create_minted_products(client, run_id)
+        print(f"Minted {len(items)} products to verify")
+
+        idle = await verify_load(client, items, seconds)
+        report("idle", idle, seconds)
+
+        stop = asyncio.Event()
+        mints = asyncio.create_task(mint_load(client, run_id, stop))
+        loaded = await verify_load(client, items, seconds)
+        stop.set()
+        created = await mints
+        report("minting", loaded, seconds)
+        print(f"Products queued for minting during the run: {created}")
+
+    ratio = percentile(loaded, 0.99) / percentile(idle, 0.99)
+    if ratio > MAX_P99_RATIO:
+        print(f"FAILED: p99 rose {ratio:.2f}x while minting (limit {MAX_P99_RATIO}x)")
+        sys.exit(1)
+    print(f"SUCCESS: p99 ratio {ratio:.2f}x while minting")
+
+if __name__ == "__main__":
+    print("Benchmarking /api/verify latency during mints")
+    print("=" * 50)
+
+    asyncio.run(run(float(sys.argv[1]) if len(sys.argv) > 1 else PHASE_SECONDS))
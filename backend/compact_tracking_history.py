@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Migration script for product tracking summaries
+Rebuilds each product's tracking_history as a bounded summary (the last
+TRACKING_HISTORY_LIMIT events plus counters) from tracking_events, which is
+the source of truth for supply chain history.
+Run with --dry-run to only report how many documents would change.
+"""
+
+import sys
+from pymongo import MongoClient, UpdateOne
+
+# Configuration and field-name sanitising are shared with the API
+from main import MONGODB_URL, DATABASE_NAME, TRACKING_HISTORY_LIMIT, sanitize_action
+
+BULK_SIZE = 500
+
+def build_summary(events_collection, product_id):
+    """Compute the bounded summary for one product from its tracking events"""
+    counts = {}
+    total = 0
+    for row in events_collection.aggregate([
+        {"$match": {"product_id": product_id}},
+        {"$group": {"_id": "$action", "count": {"$sum": 1}}}
+    ]):
+        counts[sanitize_action(row["_id"])] = row["count"]
+        total += row["count"]
+
+    recent = list(
+        events_collection.find({"product_id": product_id}, {"action": 1, "timestamp": 1})
+        .sort("timestamp", -1)
+        .limit(TRACKING_HISTORY_LIMIT)
+    )
+    recent.reverse()
+
+    return {
+        "tracking_history": [
+            {"event_id": str(e["_id"]), "action": e["action"], "timestamp": e["timestamp"]}
+            for e in recent
+        ],
+        "tracking_event_count": total,
+        "tracking_action_counts": counts
+    }
+
+def compact(dry_run=False):
+    """Compact every product whose summary is unbounded or missing counters"""
+    client = MongoClient(MONGODB_URL)
+    db = client[DATABASE_NAME]
+    products = db["products"]
+    events = db["tracking_events"]
+
+    query = {"$or": [
+        {"$expr": {"$gt": [{"$size": {"$ifNull": ["$tracking_history", []]}}, TRACKING_HISTORY_LIMIT]}},
+        {"tracking_event_count": {"$exists": False}}
+    ]}
+
+    print(f"Products to compact: {products.count_documents(query)}")
+    if dry_run:
+        return
+
+    operations = []
+    compacted = 0
+    for product in products.find(query, {"_id": 1}):
+        summary = build_summary(events, str(product["_id"]))
+        operations.append(UpdateOne({"_id": product["_id"]}, {"$set": summary}))
+
+        if len(operations) >= BULK_SIZE:
+            products.bulk_write(operations, ordered=False)
+            compacted += len(operations)
+            operations = []
+            print(f"Compacted {compacted} products...")
+
+    if operations:
+        products.bulk_write(operations, ordered=False)
+        compacted += len(operations)
+
+    print(f"SUCCESS: Compacted {compacted} products")
+
+if __name__ == "__main__":
+    print("Compacting product tracking history")
+    print("=" * 50)
+
+    compact(dry_run="--dry-run" in sys.argv)
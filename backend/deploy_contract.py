@@ -118,7 +118,7 @@ def deploy_contract():
 
     # Send transaction
     print("Sending transaction...")
-    tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+    tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
     print(f"Transaction hash: {tx_hash.hex()}")
 
     # Wait for transaction receipt
@@ -1,17 +1,32 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, EmailStr, Field
 from motor.motor_asyncio import AsyncIOMotorClient
-from jose import jwt
-from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from jose import JWTError, jwt
+from datetime import datetime, timedelta, timezone
+from typing import Literal
 from dotenv import load_dotenv
 import hashlib
+import hmac
+import base64
 import os
 import json
 import secrets
-from bson import ObjectId
-import ipfshttpclient
-from web3 import Web3
+import asyncio
+import uuid
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from bson import ObjectId, json_util
+import httpx
+import numpy as np
+from web3 import AsyncWeb3
+from web3.exceptions import TransactionNotFound
 from eth_account import Account
 from eth_account.messages import encode_defunct
 
@@ -39,6 +54,129 @@ products_collection = db["products"]
 invoices_collection = db["invoices"]
 invoices_funded_collection = db["invoices_funded"]
 tracking_events_collection = db["tracking_events"]
+stats_rollups_collection = db["stats_rollups"]
+stats_rollup_members_collection = db["stats_rollup_members"]
+analytics_invoice_risk_collection = db["analytics_invoice_risk"]
+analytics_events_hourly_collection = db["analytics_events_hourly"]
+analytics_products_per_batch_collection = db["analytics_products_per_batch"]
+analytics_meta_collection = db["analytics_meta"]
+buyer_profiles_collection = db["buyer_profiles"]
+invoice_fundings_collection = db["invoice_fundings"]
+merkle_batches_collection = db["merkle_batches"]
+onchain_products_collection = db["onchain_products"]
+indexer_checkpoints_collection = db["indexer_checkpoints"]
+
+# ================= INDEXES =================
+# Declared indexes for every hot query; reconciled against the live
+# collections on startup.
+REQUIRED_INDEXES = [
+    (users_collection, [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ]),
+    (products_collection, [
+        # Sparse: products waiting in the mint queue have no token ID yet
+        IndexModel([("nft_token_id", ASCENDING)], name="nft_token_id_unique", unique=True, sparse=True),
+        IndexModel([("serial_number", ASCENDING)], name="serial_number"),
+        IndexModel([("batch_id", ASCENDING), ("serial_number", ASCENDING)], name="batch_id_serial_number"),
+        IndexModel([("mint_status", ASCENDING)], name="mint_status"),
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        # Incremental products_per_batch refreshes look up recently minted products
+        IndexModel([("minted_at", ASCENDING)], name="minted_at", sparse=True),
+        IndexModel(
+            [("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="pending_anchor",
+            partialFilterExpression={"anchor_status": "pending"}
+        ),
+        IndexModel([("anchor_batch_id", ASCENDING)], name="anchor_batch_id", sparse=True),
+    ]),
+    (tracking_events_collection, [
+        # Keyset pagination walks (timestamp, _id), optionally within one product/action/role
+        IndexModel([("product_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], name="product_id_timestamp"),
+        IndexModel([("timestamp", DESCENDING), ("_id", DESCENDING)], name="timestamp_desc"),
+        IndexModel([("action", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="action_timestamp"),
+        IndexModel([("role", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], name="role_timestamp"),
+        IndexModel(
+            [("snapshot_next_attempt_at", ASCENDING)],
+            name="pending_snapshots",
+            partialFilterExpression={"snapshot_status": "pending"}
+        ),
+    ]),
+    (stats_rollup_members_collection, [
+        # Weekly distinct-count markers expire once their period is no longer read
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]),
+    (analytics_products_per_batch_collection, [
+        IndexModel([("product_count", DESCENDING)], name="product_count_desc"),
+    ]),
+    (invoice_fundings_collection, [
+        IndexModel([("investor_id", ASCENDING), ("funded_at", DESCENDING), ("_id", DESCENDING)], name="investor_funded_at"),
+        IndexModel([("invoice_id", ASCENDING)], name="invoice_id"),
+    ]),
+    (invoices_collection, [
+        # Marketplace listing: keyset pagination on (sort field, _id), optionally for one buyer
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_desc"),
+        IndexModel([("risk_score", ASCENDING), ("_id", ASCENDING)], name="risk_score_id"),
+        IndexModel([("amount", ASCENDING), ("_id", ASCENDING)], name="amount_id"),
+        IndexModel([("due_at", ASCENDING), ("_id", ASCENDING)], name="due_at_id"),
+        IndexModel([("buyer", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="buyer_created_at"),
+        IndexModel(
+            [("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="pending_anchor",
+            partialFilterExpression={"anchor_status": "pending"}
+        ),
+        IndexModel([("anchor_batch_id", ASCENDING)], name="anchor_batch_id", sparse=True),
+    ]),
+    (onchain_products_collection, [
+        # Reorg rewinds delete everything above a block
+        IndexModel([("block_number", ASCENDING)], name="block_number"),
+    ]),
+    (merkle_batches_collection, [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+    ]),
+]
+
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+def index_matches(existing: dict, declared: dict) -> bool:
+    if [tuple(k) for k in existing["key"]] != list(declared["key"].items()):
+        return False
+    return all(existing.get(option) == declared.get(option) for option in INDEX_OPTIONS)
+
+async def ensure_indexes():
+    """Create missing indexes and rebuild ones whose definition changed."""
+    total = sum(len(models) for _, models in REQUIRED_INDEXES)
+    done = 0
+    for collection, models in REQUIRED_INDEXES:
+        existing = await collection.index_information()
+        for model in models:
+            declared = model.document
+            name = declared["name"]
+            done += 1
+            label = f"{collection.name}.{name} ({done}/{total})"
+
+            if name in existing and index_matches(existing[name], declared):
+                print(f"Index {label}: ok")
+                continue
+
+            try:
+                if name in existing:
+                    print(f"Index {label}: definition changed, rebuilding")
+                    await collection.drop_index(name)
+                else:
+                    print(f"Index {label}: building")
+                started = time.monotonic()
+                await collection.create_indexes([model])
+                print(f"Index {label}: built in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                print(f"Index {label}: build failed: {e}")
+
+index_bootstrap_task: asyncio.Task | None = None
+
+@app.on_event("startup")
+async def start_index_bootstrap():
+    global index_bootstrap_task
+    # Builds run in the background so large collections don't delay startup
+    index_bootstrap_task = asyncio.create_task(ensure_indexes())
 
 # ================= JWT CONFIG =================
 SECRET_KEY = os.getenv("SECRET_KEY", "change-this-secret")
@@ -50,8 +188,8 @@ INFURA_URL = os.getenv("INFURA_URL", "https://polygon-mumbai.infura.io/v3/YOUR_I
 PRODUCT_NFT_ADDRESS = os.getenv("PRODUCT_NFT_ADDRESS", "0xYourProductNFTAddress")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY", "your-private-key-here")
 
-# Initialize Web3
-w3 = Web3(Web3.HTTPProvider(INFURA_URL))
+# Initialize Web3 with an async provider so RPC calls never block the event loop
+w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(INFURA_URL))
 
 # Product NFT Contract ABI (simplified)
 PRODUCT_NFT_ABI = [
@@ -70,12 +208,173 @@ PRODUCT_NFT_ABI = [
         "outputs": [{"type": "uint256"}],
         "stateMutability": "nonpayable",
         "type": "function"
+    },
+    {
+        "inputs": [
+            {"name": "to", "type": "address"},
+            {
+                "components": [
+                    {"name": "name", "type": "string"},
+                    {"name": "description", "type": "string"},
+                    {"name": "serialNumber", "type": "string"},
+                    {"name": "batchId", "type": "string"},
+                    {"name": "manufacturingDate", "type": "string"},
+                    {"name": "ipfsCid", "type": "string"},
+                    {"name": "metadataHash", "type": "bytes32"}
+                ],
+                "name": "items",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "mintBatch",
+        "outputs": [{"name": "tokenIds", "type": "uint256[]"}],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "tokenId", "type": "uint256"}],
+        "name": "getProduct",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "name", "type": "string"},
+                    {"name": "description", "type": "string"},
+                    {"name": "serialNumber", "type": "string"},
+                    {"name": "batchId", "type": "string"},
+                    {"name": "manufacturingDate", "type": "string"},
+                    {"name": "ipfsCid", "type": "string"},
+                    {"name": "metadataHash", "type": "bytes32"},
+                    {"name": "createdAt", "type": "uint256"}
+                ],
+                "type": "tuple"
+            }
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "tokenId", "type": "uint256"},
+            {"indexed": True, "name": "to", "type": "address"},
+            {"indexed": False, "name": "ipfsCid", "type": "string"},
+            {"indexed": False, "name": "metadataHash", "type": "bytes32"}
+        ],
+        "name": "ProductMinted",
+        "type": "event"
+    },
+    {
+        "inputs": [
+            {"name": "root", "type": "bytes32"},
+            {"name": "leafCount", "type": "uint256"}
+        ],
+        "name": "commitRoot",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "", "type": "bytes32"}],
+        "name": "merkleRoots",
+        "outputs": [
+            {"name": "leafCount", "type": "uint256"},
+            {"name": "committedAt", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "root", "type": "bytes32"},
+            {"indexed": False, "name": "leafCount", "type": "uint256"},
+            {"indexed": False, "name": "committedAt", "type": "uint256"}
+        ],
+        "name": "RootCommitted",
+        "type": "event"
     }
 ]
 
 # ================= IPFS CONFIG =================
 IPFS_HOST = os.getenv("IPFS_HOST", "localhost")
 IPFS_PORT = int(os.getenv("IPFS_PORT", 5001))
+IPFS_MAX_CONNECTIONS = int(os.getenv("IPFS_MAX_CONNECTIONS", 20))
+IPFS_MAX_CONCURRENCY = int(os.getenv("IPFS_MAX_CONCURRENCY", 10))
+IPFS_TIMEOUT = float(os.getenv("IPFS_TIMEOUT", 10))
+IPFS_HEALTH_TTL = float(os.getenv("IPFS_HEALTH_TTL", 30))
+
+class IPFSUnavailable(Exception):
+    pass
+
+class IPFSClient:
+    """
+    Long-lived async client for the IPFS HTTP API.
+    Connections are pooled and reused across requests, the number of in-flight
+    calls is capped, and daemon health is checked at most once per
+    IPFS_HEALTH_TTL seconds instead of on every request.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.base_url = f"http://{host}:{port}"
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore = asyncio.Semaphore(IPFS_MAX_CONCURRENCY)
+        self._healthy = False
+        self._checked_at = 0.0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(IPFS_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=IPFS_MAX_CONNECTIONS,
+                    max_keepalive_connections=IPFS_MAX_CONNECTIONS
+                )
+            )
+        return self._client
+
+    async def is_healthy(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if loop.time() - self._checked_at < IPFS_HEALTH_TTL:
+            return self._healthy
+
+        self._checked_at = loop.time()
+        try:
+            response = await self._get_client().post("/api/v0/version")
+            self._healthy = response.status_code == 200
+        except httpx.HTTPError:
+            self._healthy = False
+        return self._healthy
+
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        if not await self.is_healthy():
+            raise IPFSUnavailable(f"IPFS daemon at {self.base_url} is unavailable")
+
+        async with self._semaphore:
+            try:
+                response = await self._get_client().post(path, **kwargs)
+                response.raise_for_status()
+                return response
+            except httpx.TransportError:
+                # Force a fresh health check before the next call
+                self._healthy = False
+                self._checked_at = asyncio.get_running_loop().time()
+                raise
+
+    async def add_str(self, data: str) -> str:
+        response = await self._post("/api/v0/add", files={"file": ("data", data.encode())})
+        return response.json()["Hash"]
+
+    async def cat(self, cid: str) -> bytes:
+        response = await self._post("/api/v0/cat", params={"arg": cid})
+        return response.content
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+ipfs = IPFSClient(IPFS_HOST, IPFS_PORT)
 
 # ================= MODELS =================
 class UserRegister(BaseModel):
@@ -97,11 +396,21 @@ class ProductCreate(BaseModel):
     serial_number: str
     batch_id: str
     manufacturing_date: str
+    commit_mode: Literal["mint", "anchored"] | None = None  # Defaults to PRODUCT_COMMIT_MODE
+
+class ProductBatchCreate(BaseModel):
+    products: list[ProductCreate]
+    commit_mode: Literal["mint", "anchored"] | None = None
 
 class VerificationRequest(BaseModel):
-    token_id: int
+    # Minted products are looked up by token ID, anchored products by product ID
+    token_id: int | None = None
+    product_id: str | None = None
     verification_token: str
 
+class VerificationBatchRequest(BaseModel):
+    items: list[VerificationRequest]
+
 class InvoiceCreate(BaseModel):
     amount: float
     buyer: str
@@ -113,12 +422,20 @@ class InvoiceCreate(BaseModel):
     class Config:
         populate_by_name = True
 
-class InvoicesFunded(BaseModel):
-    total_ivested: float
-    active_investments: int
-    returns: float
-    available_balance: float
-    status: str
+class InvoiceScoreBatch(BaseModel):
+    # Columnar input: the i-th entry of each list describes one invoice
+    amounts: list[float]
+    due_dates: list[str]
+    buyers: list[str]
+    descriptions: list[str]
+    now: datetime | None = None
+
+class InvoiceFundingCreate(BaseModel):
+    amount: float = Field(..., gt=0)
+    tx_hash: str | None = None
+
+class InvoiceRepayment(BaseModel):
+    amount: float = Field(..., ge=0)
 
 class TrackingEventCreate(BaseModel):
     product_id: str
@@ -128,7 +445,10 @@ class TrackingEventCreate(BaseModel):
     location: str
     notes: str = ""
     tx_hash: str = ""
-    
+
+class TrackingEventBatchCreate(BaseModel):
+    events: list[TrackingEventCreate]
+
 
 # ================= HELPERS =================
 def hash_password(password: str) -> str:
@@ -144,6 +464,84 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Reads without a bearer token share one anonymous investor view; funding and
+# settling require a token (require_investor_id)
+ANONYMOUS_INVESTOR = "anonymous"
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_investor_id(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> str:
+    if credentials is None:
+        return ANONYMOUS_INVESTOR
+    try:
+        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Token has no subject")
+    return payload["sub"]
+
+async def require_investor_id(credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme)) -> str:
+    """Like get_investor_id, but for writes, which are never made anonymously"""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return await get_investor_id(credentials)
+
+# ================= PAGINATION =================
+# Keyset (cursor) pagination: the cursor carries the sort key values of the
+# last returned document, so each page is an index range scan instead of a skip.
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+# Cursor values go straight into query clauses, so anything else (a dict
+# carrying "$where", "$ne", ...) is rejected rather than treated as a value
+CURSOR_VALUE_TYPES = (str, int, float, bool, type(None), ObjectId, datetime)
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or not all(isinstance(value, CURSOR_VALUE_TYPES) for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_filter(sort: list[tuple[str, int]], values: list) -> dict:
+    """Match documents strictly after `values` in the given sort order."""
+    if len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: value for (prev_field, _), value in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+def build_projection(fields: str | None, excluded: tuple[str, ...], sort: list[tuple[str, int]]) -> dict | None:
+    if fields:
+        projection = {field.strip(): 1 for field in fields.split(",") if field.strip()}
+        # Sort keys are needed to build the next cursor
+        projection.update({field: 1 for field, _ in sort})
+        return projection
+    return {field: 0 for field in excluded} or None
+
+async def fetch_page(collection, query: dict, sort: list[tuple[str, int]], limit: int,
+                     cursor: str | None = None, projection: dict | None = None) -> tuple[list[dict], str | None]:
+    if cursor:
+        after = keyset_filter(sort, decode_cursor(cursor))
+        query = {"$and": [query, after]} if query else after
+
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor([docs[-1].get(field) for field, _ in sort])
+    return docs, next_cursor
+
+async def stream_ndjson(cursor):
+    async for doc in cursor:
+        doc["_id"] = str(doc["_id"])
+        yield json.dumps(jsonable_encoder(doc)) + "\n"
+
 # ================= AUTH ROUTES =================
 @app.post("/api/register", response_model=Token)
 async def register(user: UserRegister):
@@ -169,16 +567,354 @@ async def login(user: UserLogin):
     token = create_access_token({"sub": user.email})
     return {"access_token": token, "token_type": "bearer"}
 
+# ================= NONCE MANAGER =================
+NONCE_ERROR_MARKERS = (
+    "nonce too low",
+    "nonce too high",
+    "already known",
+    "replacement transaction underpriced",
+)
+
+def is_nonce_error(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(marker in message for marker in NONCE_ERROR_MARKERS)
+
+class NonceManager:
+    """
+    In-process nonce allocator for the signer account.
+    Seeds from the chain once, then hands out nonces locally so transactions
+    can be submitted back-to-back without a get_transaction_count per call.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._next_nonce: int | None = None
+        self._lock = asyncio.Lock()
+
+    async def _sync(self):
+        self._next_nonce = await w3.eth.get_transaction_count(self.address, "pending")
+
+    async def allocate(self) -> int:
+        async with self._lock:
+            if self._next_nonce is None:
+                await self._sync()
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+
+    async def release(self, nonce: int, error: Exception):
+        """Return a nonce whose transaction was never accepted by the node."""
+        async with self._lock:
+            if self._next_nonce == nonce + 1 and not is_nonce_error(error):
+                # Nothing was handed out after it, so it can simply be reused
+                self._next_nonce = nonce
+            else:
+                # Later nonces are already out (a gap) or the node disagrees
+                # with our view of the account: resync from the chain
+                await self._sync()
+
+    async def resync(self):
+        async with self._lock:
+            await self._sync()
+
+    async def is_consumed(self, nonce: int) -> bool:
+        """True if a mined transaction already used this nonce."""
+        return await w3.eth.get_transaction_count(self.address, "latest") > nonce
+
+nonce_manager: NonceManager | None = None
+
+def get_nonce_manager() -> NonceManager:
+    global nonce_manager
+    if nonce_manager is None:
+        nonce_manager = NonceManager(Account.from_key(PRIVATE_KEY).address)
+    return nonce_manager
+
+async def send_signed_transaction(function_call, gas: int) -> tuple[str, int]:
+    """Build, sign and send a contract call using a locally allocated nonce."""
+    manager = get_nonce_manager()
+    gas_price = await w3.eth.gas_price
+
+    for attempt in range(3):
+        nonce = await manager.allocate()
+        try:
+            tx = await function_call.build_transaction({
+                'from': manager.address,
+                'nonce': nonce,
+                'gas': gas,
+                'gasPrice': gas_price
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
+            tx_hash = await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            return tx_hash.hex(), nonce
+        except Exception as e:
+            await manager.release(nonce, e)
+            if not is_nonce_error(e) or attempt == 2:
+                raise
+
+# ================= MINT QUEUE =================
+# Products are stored with mint_status "pending_mint" and minted by a background
+# worker, so POST /api/products never waits on block confirmations.
+# Lifecycle: pending_mint -> submitted -> minted | failed
+# A job is a list of product IDs sharing one mint_job_id: a single product is
+# minted with mintProduct, a batch chunk with one mintBatch transaction.
+# The worker only submits transactions; receipts are tracked by separate tasks
+# so several mints can be in flight at once.
+MINT_WORKERS = int(os.getenv("MINT_WORKERS", 1))
+MINT_RECEIPT_TIMEOUT = int(os.getenv("MINT_RECEIPT_TIMEOUT", 300))
+MINT_RECEIPT_RETRY_INTERVAL = float(os.getenv("MINT_RECEIPT_RETRY_INTERVAL", 15))
+MINT_BATCH_SIZE = int(os.getenv("MINT_BATCH_SIZE", 50))
+MINT_GAS_PER_ITEM = int(os.getenv("MINT_GAS_PER_ITEM", 400000))
+
+mint_queue: asyncio.Queue = asyncio.Queue()
+mint_worker_tasks: list[asyncio.Task] = []
+mint_receipt_tasks: set[asyncio.Task] = set()
+
+def get_product_contract():
+    return w3.eth.contract(address=PRODUCT_NFT_ADDRESS, abi=PRODUCT_NFT_ABI)
+
+def build_qr_code(nft_token_id, verification_token: str) -> str:
+    return json.dumps({
+        "tokenId": nft_token_id,
+        "verificationToken": verification_token
+    })
+
+def build_anchored_qr_code(product_id: str, verification_token: str) -> str:
+    return json.dumps({
+        "productId": product_id,
+        "verificationToken": verification_token
+    })
+
+def product_mint_args(product: dict) -> tuple:
+    return (
+        product["product_name"],
+        product["description"],
+        product["serial_number"],
+        product["batch_id"],
+        product["manufacturing_date"],
+        product["ipfs_cid"],
+        bytes.fromhex(product["metadata_hash"])
+    )
+
+async def submit_mint_transaction(products: list[dict]) -> tuple[str, int]:
+    contract = get_product_contract()
+    to = get_nonce_manager().address
+
+    if len(products) == 1:
+        function_call = contract.functions.mintProduct(to, *product_mint_args(products[0]))
+        return await send_signed_transaction(function_call, 500000)
+
+    function_call = contract.functions.mintBatch(to, [product_mint_args(p) for p in products])
+    return await send_signed_transaction(function_call, MINT_GAS_PER_ITEM * len(products))
+
+def decode_minted_token_ids(receipt) -> list[int]:
+    events = get_product_contract().events.ProductMinted().process_receipt(receipt)
+    return [event["args"]["tokenId"] for event in events]
+
+async def mark_mint_failed(product_ids: list[str], error: Exception):
+    print(f"NFT minting failed for products {product_ids}: {error}")
+    await products_collection.update_many(
+        {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}},
+        {"$set": {"mint_status": "failed", "mint_error": str(error)}}
+    )
+
+async def mark_minted(products: list[dict], token_ids: list[int], tx_hash: str | None):
+    minted_at = datetime.utcnow()
+    await products_collection.bulk_write([
+        UpdateOne(
+            {"_id": product["_id"], "mint_status": {"$ne": "minted"}},
+            {"$set": {
+                "mint_status": "minted",
+                "nft_token_id": token_id,
+                "qr_code": build_qr_code(token_id, product["verification_token"]),
+                "minted_at": minted_at
+            }}
+        )
+        for product, token_id in zip(products, token_ids)
+    ], ordered=False)
+
+    if tx_hash:
+        await tracking_events_collection.update_many(
+            {"product_id": {"$in": [str(p["_id"]) for p in products]}, "action": "manufactured"},
+            {"$set": {"tx_hash": tx_hash}}
+        )
+
+async def find_mined_receipt(tx_hash: str):
+    """Receipt of tx_hash if it has been mined, otherwise None."""
+    try:
+        return await w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+
+async def resolve_mint_nonce(tx_hash: str, nonce: int | None) -> int | None:
+    """Nonce of a mint transaction; jobs submitted before nonces were recorded read it from the node."""
+    if nonce is not None:
+        return nonce
+    try:
+        return (await w3.eth.get_transaction(tx_hash))["nonce"]
+    except TransactionNotFound:
+        return None
+
+async def wait_for_mint_receipt(tx_hash: str, nonce: int | None):
+    """
+    Receipt of a mint transaction, or None once its nonce is provably used by
+    a different transaction. A transaction that is merely slow can still be
+    mined, so it is waited on again rather than given up on.
+    """
+    while True:
+        try:
+            return await w3.eth.wait_for_transaction_receipt(tx_hash, timeout=MINT_RECEIPT_TIMEOUT)
+        except Exception as e:
+            error = e
+
+        try:
+            nonce = await resolve_mint_nonce(tx_hash, nonce)
+            if nonce is not None and await get_nonce_manager().is_consumed(nonce):
+                # Check for our own receipt first: the transaction may have
+                # confirmed just after the wait timed out, and treating it as
+                # replaced would mint the products twice
+                return await find_mined_receipt(tx_hash)
+        except Exception as lookup_error:
+            error = lookup_error
+        print(f"Mint transaction {tx_hash} not mined yet ({error}), still waiting")
+        await asyncio.sleep(MINT_RECEIPT_RETRY_INTERVAL)
+
+async def track_mint_receipt(products: list[dict], tx_hash: str, nonce: int | None):
+    product_ids = [str(p["_id"]) for p in products]
+    # Products stay "submitted" while the transaction is pending
+    receipt = await wait_for_mint_receipt(tx_hash, nonce)
+    if receipt is None:
+        # A different transaction used the nonce: ours was replaced or
+        # dropped, so send the mint again with a fresh nonce
+        print(f"Mint transaction {tx_hash} was replaced, resubmitting products {product_ids}")
+        await get_nonce_manager().resync()
+        await products_collection.update_many(
+            {"_id": {"$in": [p["_id"] for p in products]}},
+            {"$set": {"mint_status": "pending_mint"}, "$unset": {"mint_tx_hash": "", "mint_nonce": ""}}
+        )
+        await mint_queue.put(product_ids)
+        return
+
+    try:
+        if receipt["status"] != 1:
+            raise RuntimeError(f"Mint transaction {tx_hash} reverted")
+
+        # ProductMinted events are emitted in the same order as the batch items
+        token_ids = decode_minted_token_ids(receipt)
+        if len(token_ids) != len(products):
+            raise RuntimeError(f"Expected {len(products)} ProductMinted events in transaction {tx_hash}, got {len(token_ids)}")
+    except Exception as e:
+        await mark_mint_failed(product_ids, e)
+        return
+
+    await mark_minted(products, token_ids, tx_hash)
+
+def start_receipt_tracking(products: list[dict], tx_hash: str, nonce: int | None):
+    task = asyncio.create_task(track_mint_receipt(products, tx_hash, nonce))
+    mint_receipt_tasks.add(task)
+    task.add_done_callback(mint_receipt_tasks.discard)
+
+async def process_mint_job(product_ids: list[str]):
+    by_id = {}
+    async for product in products_collection.find({
+        "_id": {"$in": [ObjectId(pid) for pid in product_ids]},
+        "mint_status": {"$in": ["pending_mint", "submitted"]}
+    }):
+        by_id[str(product["_id"])] = product
+    # Keep the submission order so token IDs line up with the emitted events
+    products = [by_id[pid] for pid in product_ids if pid in by_id]
+    if not products:
+        return
+
+    try:
+        chain_ready = PRIVATE_KEY != "your-private-key-here" and await w3.is_connected()
+    except Exception as e:
+        await mark_mint_failed(product_ids, e)
+        return
+
+    if not chain_ready:
+        # Fallback to mock if blockchain not configured
+        print("Blockchain not configured, using mock NFT IDs")
+        for attempt in range(5):
+            try:
+                await mark_minted(products, [secrets.randbelow(1000000) for _ in products], None)
+                break
+            except BulkWriteError:
+                # A random mock ID collided with the unique nft_token_id index;
+                # products already minted are skipped on the retry
+                if attempt == 4:
+                    raise
+        return
+
+    # A job resumed after a restart may already have its transaction in flight
+    tx_hash = products[0].get("mint_tx_hash")
+    nonce = products[0].get("mint_nonce")
+    if not tx_hash:
+        try:
+            tx_hash, nonce = await submit_mint_transaction(products)
+        except Exception as e:
+            await mark_mint_failed(product_ids, e)
+            return
+
+        await products_collection.update_many(
+            {"_id": {"$in": [p["_id"] for p in products]}},
+            {"$set": {"mint_status": "submitted", "mint_tx_hash": tx_hash, "mint_nonce": nonce}}
+        )
+
+    start_receipt_tracking(products, tx_hash, nonce)
+
+async def enqueue_mint_jobs(product_ids: list[str], mint_job_ids: list[str]):
+    jobs: dict[str, list[str]] = {}
+    for product_id, job_id in zip(product_ids, mint_job_ids):
+        jobs.setdefault(job_id, []).append(product_id)
+    for job in jobs.values():
+        await mint_queue.put(job)
+
+async def mint_worker():
+    while True:
+        product_ids = await mint_queue.get()
+        try:
+            await process_mint_job(product_ids)
+        except Exception as e:
+            print(f"Mint worker error for products {product_ids}: {e}")
+        finally:
+            mint_queue.task_done()
+
+@app.on_event("startup")
+async def start_mint_workers():
+    # Re-enqueue jobs left unfinished by a previous process
+    product_ids, mint_job_ids = [], []
+    async for product in products_collection.find(
+        {"mint_status": {"$in": ["pending_mint", "submitted"]}}, {"_id": 1, "mint_job_id": 1}
+    ).sort("_id", 1):
+        product_ids.append(str(product["_id"]))
+        mint_job_ids.append(product.get("mint_job_id") or str(product["_id"]))
+    await enqueue_mint_jobs(product_ids, mint_job_ids)
+
+    for _ in range(MINT_WORKERS):
+        mint_worker_tasks.append(asyncio.create_task(mint_worker()))
+
+@app.on_event("shutdown")
+async def stop_mint_workers():
+    for task in [*mint_worker_tasks, *mint_receipt_tasks]:
+        task.cancel()
+    mint_worker_tasks.clear()
+
+@app.on_event("shutdown")
+async def close_ipfs_client():
+    await ipfs.close()
+
 # ================= PRODUCT ROUTES =================
-@app.post("/api/products")
-async def create_product(product: ProductCreate):
+MAX_PRODUCT_BATCH = int(os.getenv("MAX_PRODUCT_BATCH", 10000))
+# "mint": one NFT per product; "anchored": metadata hashes committed in Merkle batches
+PRODUCT_COMMIT_MODE = os.getenv("PRODUCT_COMMIT_MODE", "mint")
+
+def build_product_metadata(product: ProductCreate) -> dict:
     try:
         formatted_date = datetime.fromisoformat(product.manufacturing_date).strftime("%d-%m-%y")
     except:
         formatted_date = product.manufacturing_date
 
-    # Prepare metadata for IPFS
-    metadata = {
+    return {
         "name": product.name,
         "description": product.description,
         "serial_number": product.serial_number,
@@ -188,374 +924,1615 @@ async def create_product(product: ProductCreate):
         "type": "product"
     }
 
-    # Upload to IPFS
-    try:
-        ipfs_client = ipfshttpclient.connect(f"/ip4/{IPFS_HOST}/tcp/{IPFS_PORT}/http")
-        metadata_json = json.dumps(metadata, sort_keys=True)
-        result = ipfs_client.add_str(metadata_json)
-        cid = result
-    except Exception as e:
-        # Fallback to mock if IPFS not available
-        print(f"IPFS upload failed: {e}, using mock")
-        metadata_json = json.dumps(metadata, sort_keys=True)
-        cid = hashlib.sha256(metadata_json.encode()).hexdigest()[:46]
+async def upload_metadata_batch(metadata_jsons: list[str]) -> list[str]:
+    """Upload metadata documents concurrently through the shared IPFS client, falling back to mock CIDs."""
+    async def upload(metadata_json: str) -> str:
+        try:
+            return await ipfs.add_str(metadata_json)
+        except Exception:
+            return hashlib.sha256(metadata_json.encode()).hexdigest()[:46]
 
-    # Create hash of metadata for verification
-    metadata_hash = hashlib.sha256(metadata_json.encode()).hexdigest()
+    return await asyncio.gather(*(upload(m) for m in metadata_jsons))
 
-    # Mint NFT on blockchain
-    nft_token_id = None
-    try:
-        if w3.is_connected() and PRIVATE_KEY != "your-private-key-here":
-            contract = w3.eth.contract(address=PRODUCT_NFT_ADDRESS, abi=PRODUCT_NFT_ABI)
-            account = Account.from_key(PRIVATE_KEY)
-
-            # Build transaction
-            tx = contract.functions.mintProduct(
-                account.address,  # to
-                product.name,
-                product.description,
-                product.serial_number,
-                product.batch_id,
-                formatted_date,
-                cid,
-                bytes.fromhex(metadata_hash)
-            ).build_transaction({
-                'from': account.address,
-                'nonce': w3.eth.get_transaction_count(account.address),
-                'gas': 500000,
-                'gasPrice': w3.eth.gas_price
-            })
+def verification_message_hash(serial_number: str, batch_id: str, cid: str, metadata_hash: str) -> bytes:
+    message = f"{serial_number}:{batch_id}:{cid}:{metadata_hash}"
+    return hashlib.sha256(message.encode()).digest()
 
-            # Sign and send transaction
-            signed_tx = w3.eth.account.sign_transaction(tx, PRIVATE_KEY)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+def create_verification_token(serial_number: str, batch_id: str, cid: str, metadata_hash: str) -> str:
+    message_hash = verification_message_hash(serial_number, batch_id, cid, metadata_hash)
+    return Account.sign_message(encode_defunct(message_hash), PRIVATE_KEY).signature.hex() if PRIVATE_KEY != "your-private-key-here" else secrets.token_hex(32)
 
-            # Wait for transaction receipt
-            receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+def tokens_match(presented: str, expected: str | None) -> bool:
+    if not expected:
+        return False
+    try:
+        return hmac.compare_digest(presented, expected)
+    except TypeError:
+        # compare_digest rejects non-ASCII strings
+        return False
+
+def recover_token_signer(product: dict, verification_token: str) -> str | None:
+    message_hash = verification_message_hash(
+        product["serial_number"], product["batch_id"], product["ipfs_cid"], product["metadata_hash"]
+    )
+    try:
+        return Account.recover_message(encode_defunct(message_hash), signature=verification_token)
+    except Exception:
+        return None
 
-            # Get token ID from event logs (simplified - in real implementation parse logs)
-            nft_token_id = receipt['logs'][0]['topics'][3]  # This is approximate
+def check_verification_token(product: dict, verification_token: str) -> bool:
+    """
+    Check a presented verification token without touching the private key.
+    Products store the token signed at creation, so the common path is a
+    constant-time comparison. Documents without a stored token fall back to
+    recovering the signer from the signature.
+    """
+    if product.get("verification_token"):
+        return tokens_match(verification_token, product["verification_token"])
+
+    if PRIVATE_KEY == "your-private-key-here":
+        return False
+    return recover_token_signer(product, verification_token) == get_nonce_manager().address
+
+async def check_verification_tokens_batch(items: list[tuple[dict, str]]) -> list[bool]:
+    """Bulk version of check_verification_token; signer recoveries run off the event loop."""
+    results = [None] * len(items)
+    needs_recovery = []
+    for i, (product, verification_token) in enumerate(items):
+        if product.get("verification_token"):
+            results[i] = tokens_match(verification_token, product["verification_token"])
+        elif PRIVATE_KEY == "your-private-key-here":
+            results[i] = False
         else:
-            # Fallback to mock if blockchain not configured
-            print("Blockchain not configured, using mock NFT ID")
-            nft_token_id = secrets.randbelow(1000000)
-    except Exception as e:
-        print(f"NFT minting failed: {e}, using mock")
-        nft_token_id = secrets.randbelow(1000000)
+            needs_recovery.append(i)
 
-    # Create cryptographic verification token
-    message = f"{product.serial_number}:{product.batch_id}:{cid}:{metadata_hash}"
-    message_hash = hashlib.sha256(message.encode()).digest()
-    verification_token = Account.sign_message(encode_defunct(message_hash), PRIVATE_KEY).signature.hex() if PRIVATE_KEY != "your-private-key-here" else secrets.token_hex(32)
+    if needs_recovery:
+        signer = get_nonce_manager().address
+        recovered = await asyncio.to_thread(lambda: [recover_token_signer(*items[i]) for i in needs_recovery])
+        for i, address in zip(needs_recovery, recovered):
+            results[i] = address == signer
 
-    # Generate QR code data containing tokenId and verification token
-    qr_data = {
-        "tokenId": nft_token_id,
-        "verificationToken": verification_token
-    }
-    qr_code_json = json.dumps(qr_data)
+    return results
 
+def build_product_document(metadata: dict, cid: str, metadata_hash: str, verification_token: str,
+                           mint_job_id: str | None, commit_mode: str = "mint") -> dict:
+    created_at = datetime.utcnow()
+    # ID of the initial "manufactured" event, so the summary can reference it
+    manufactured_event_id = ObjectId()
     product_data = {
-        "product_name": product.name,
-        "description": product.description,
-        "serial_number": product.serial_number,
-        "batch_id": product.batch_id,
-        "manufacturing_date": formatted_date,
+        "product_name": metadata["name"],
+        "description": metadata["description"],
+        "serial_number": metadata["serial_number"],
+        "batch_id": metadata["batch_id"],
+        "manufacturing_date": metadata["manufacturing_date"],
         "ipfs_cid": cid,
         "metadata_hash": metadata_hash,
-        "qr_code": qr_code_json,  # Store JSON data for QR code
+        "qr_code": None,  # Filled in by the mint worker once the NFT is minted
         "verification_token": verification_token,
-        "nft_token_id": nft_token_id,
-        "created_at": datetime.utcnow()
+        "mint_status": "pending_mint",
+        "mint_job_id": mint_job_id,
+        "created_at": created_at,
+        "tracking_history": [tracking_summary_entry(str(manufactured_event_id), "manufactured", created_at)],
+        "tracking_event_count": 1,
+        "tracking_action_counts": {"manufactured": 1}
     }
 
-    result = await products_collection.insert_one(product_data)
-
-    # Create initial "manufactured" tracking event
-    tracking_event = {
-        "product_id": str(result.inserted_id),
+    if commit_mode == "anchored":
+        # No NFT: the metadata hash is committed in a Merkle batch instead, and
+        # the QR code identifies the product by ID from the start
+        product_data["_id"] = ObjectId()
+        product_data["commit_mode"] = "anchored"
+        product_data["mint_status"] = "not_minted"
+        product_data["anchor_status"] = "pending"
+        product_data["qr_code"] = build_anchored_qr_code(str(product_data["_id"]), verification_token)
+    return product_data
+
+def build_manufactured_event(product_id: str, product_data: dict) -> dict:
+    return {
+        "_id": ObjectId(product_data["tracking_history"][0]["event_id"]),
+        "product_id": product_id,
+        "batch_id": product_data["batch_id"],
         "action": "manufactured",
         "actor": "Manufacturer",  # Could be made dynamic
         "role": "Manufacturer",
         "location": "Manufacturing Facility",  # Could be made dynamic
-        "notes": f"Product manufactured with serial number {product.serial_number}",
-        "tx_hash": "",  # Could add NFT minting tx hash here
-        "timestamp": datetime.utcnow(),
+        "notes": f"Product manufactured with serial number {product_data['serial_number']}",
+        "tx_hash": "",  # Set by the mint worker once the NFT is minted
+        "timestamp": product_data["created_at"],
         "previous_cid": None,
-        "new_cid": cid,
-        "metadata_hash": metadata_hash
+        "new_cid": product_data["ipfs_cid"],
+        "metadata_hash": product_data["metadata_hash"]
     }
 
-    await tracking_events_collection.insert_one(tracking_event)
+@app.post("/api/products")
+async def create_product(product: ProductCreate):
+    # Prepare metadata for IPFS
+    metadata = build_product_metadata(product)
+    metadata_json = json.dumps(metadata, sort_keys=True)
+
+    # Upload to IPFS
+    try:
+        cid = await ipfs.add_str(metadata_json)
+    except Exception as e:
+        # Fallback to mock if IPFS not available
+        print(f"IPFS upload failed: {e}, using mock")
+        cid = hashlib.sha256(metadata_json.encode()).hexdigest()[:46]
+
+    # Create hash of metadata for verification
+    metadata_hash = hashlib.sha256(metadata_json.encode()).hexdigest()
+
+    # Create cryptographic verification token
+    verification_token = create_verification_token(product.serial_number, product.batch_id, cid, metadata_hash)
+
+    # NFT minting happens in the background mint worker; the QR code is
+    # generated once the token ID is known. Anchored products skip the mint
+    # and are committed by the product anchor worker instead.
+    commit_mode = product.commit_mode or PRODUCT_COMMIT_MODE
+    mint_job_id = uuid.uuid4().hex if commit_mode == "mint" else None
+    product_data = build_product_document(metadata, cid, metadata_hash, verification_token, mint_job_id, commit_mode)
+
+    result = await products_collection.insert_one(product_data)
+    product_id = str(result.inserted_id)
+
+    # Create initial "manufactured" tracking event
+    await tracking_events_collection.insert_one(build_manufactured_event(product_id, product_data))
+
+    if commit_mode == "mint":
+        await enqueue_mint_jobs([product_id], [mint_job_id])
+    else:
+        product_anchor.wakeup.set()
 
     return {
         "success": True,
-        "product_id": str(result.inserted_id),
+        "product_id": product_id,
         "ipfs_cid": cid,
-        "nft_token_id": nft_token_id,
+        "nft_token_id": None,
         "metadata_hash": metadata_hash,
         "qr_code": product_data["qr_code"],
-        "verification_token": verification_token
+        "verification_token": verification_token,
+        "commit_mode": commit_mode,
+        "mint_job_id": mint_job_id,
+        "mint_status": product_data["mint_status"],
+        "anchor_status": product_data.get("anchor_status")
     }
 
+@app.post("/api/products/batch")
+async def create_products_batch(batch: ProductBatchCreate):
+    if not batch.products:
+        raise HTTPException(status_code=400, detail="No products provided")
+    if len(batch.products) > MAX_PRODUCT_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {MAX_PRODUCT_BATCH} products")
+
+    metadatas = [build_product_metadata(p) for p in batch.products]
+    metadata_jsons = [json.dumps(m, sort_keys=True) for m in metadatas]
+
+    # One IPFS pass, pipelined over the pooled client
+    cids = await upload_metadata_batch(metadata_jsons)
+    metadata_hashes = [hashlib.sha256(m.encode()).hexdigest() for m in metadata_jsons]
+
+    # Signing is CPU-bound, so keep it off the event loop as well
+    verification_tokens = await asyncio.to_thread(lambda: [
+        create_verification_token(p.serial_number, p.batch_id, cid, metadata_hash)
+        for p, cid, metadata_hash in zip(batch.products, cids, metadata_hashes)
+    ])
+
+    # Products are minted in chunks, one mintBatch transaction per chunk;
+    # anchored batches need no mint jobs at all
+    commit_mode = batch.commit_mode or PRODUCT_COMMIT_MODE
+    mint_job_ids = [None] * len(batch.products)
+    if commit_mode == "mint":
+        mint_job_ids = []
+        for start in range(0, len(batch.products), MINT_BATCH_SIZE):
+            job_id = uuid.uuid4().hex
+            mint_job_ids.extend([job_id] * len(batch.products[start:start + MINT_BATCH_SIZE]))
+
+    product_docs = [
+        build_product_document(metadata, cid, metadata_hash, token, job_id, commit_mode)
+        for metadata, cid, metadata_hash, token, job_id in zip(metadatas, cids, metadata_hashes, verification_tokens, mint_job_ids)
+    ]
+
+    result = await products_collection.insert_many(product_docs, ordered=True)
+    product_ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+
+    await tracking_events_collection.insert_many([
+        build_manufactured_event(product_id, product_data)
+        for product_id, product_data in zip(product_ids, product_docs)
+    ], ordered=False)
+
+    if commit_mode == "mint":
+        await enqueue_mint_jobs(product_ids, mint_job_ids)
+    else:
+        product_anchor.wakeup.set()
+
+    return {
+        "success": True,
+        "count": len(product_ids),
+        "commit_mode": commit_mode,
+        "results": [
+            {
+                "index": i,
+                "success": True,
+                "product_id": product_id,
+                "serial_number": product_data["serial_number"],
+                "ipfs_cid": product_data["ipfs_cid"],
+                "metadata_hash": product_data["metadata_hash"],
+                "verification_token": product_data["verification_token"],
+                "qr_code": product_data["qr_code"],
+                "mint_job_id": product_data["mint_job_id"],
+                "mint_status": product_data["mint_status"],
+                "anchor_status": product_data.get("anchor_status")
+            }
+            for i, (product_id, product_data) in enumerate(zip(product_ids, product_docs))
+        ]
+    }
+
+@app.get("/api/products/{product_id}/mint_status")
+async def get_mint_status(product_id: str):
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    product = await products_collection.find_one(
+        {"_id": ObjectId(product_id)},
+        {"mint_status": 1, "mint_job_id": 1, "mint_tx_hash": 1, "mint_error": 1, "nft_token_id": 1, "qr_code": 1}
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    return {
+        "product_id": product_id,
+        "mint_job_id": product.get("mint_job_id"),
+        # Products created before the mint queue existed were minted inline
+        "mint_status": product.get("mint_status", "minted"),
+        "nft_token_id": product.get("nft_token_id"),
+        "tx_hash": product.get("mint_tx_hash"),
+        "qr_code": product.get("qr_code"),
+        "error": product.get("mint_error")
+    }
+
+# Heavy fields skipped by list views unless explicitly requested via `fields`
+PRODUCT_LIST_EXCLUDED_FIELDS = ("tracking_history", "qr_code", "anchor_proof")
+PRODUCTS_PAGE_SIZE = int(os.getenv("PRODUCTS_PAGE_SIZE", 100))
+MAX_PRODUCTS_PAGE_SIZE = int(os.getenv("MAX_PRODUCTS_PAGE_SIZE", 1000))
+
 @app.get("/api/products")
-async def get_products():
-    products = []
-    async for p in products_collection.find():
+async def get_products(
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    fields: str | None = None,
+    order: Literal["asc", "desc"] = "asc",
+    format: Literal["json", "ndjson"] = "json",
+    include_total: bool = False
+):
+    # _id is monotonic in creation time, so it doubles as the created_at order
+    sort = [("_id", ASCENDING if order == "asc" else DESCENDING)]
+    projection = build_projection(fields, PRODUCT_LIST_EXCLUDED_FIELDS, sort)
+
+    if format == "ndjson":
+        # Export mode: stream the whole (remaining) collection without buffering it
+        query = keyset_filter(sort, decode_cursor(cursor)) if cursor else {}
+        find_cursor = products_collection.find(query, projection).sort(sort)
+        if limit:
+            find_cursor = find_cursor.limit(limit)
+        return StreamingResponse(stream_ndjson(find_cursor), media_type="application/x-ndjson")
+
+    page_size = min(limit or PRODUCTS_PAGE_SIZE, MAX_PRODUCTS_PAGE_SIZE)
+    products, next_cursor = await fetch_page(products_collection, {}, sort, page_size, cursor, projection)
+    for p in products:
         p["_id"] = str(p["_id"])
-        products.append(p)
-    return {"products": products}
+
+    response = {"products": products, "next_cursor": next_cursor}
+    if include_total:
+        response["total"] = await products_collection.estimated_document_count()
+    return response
+
+# ================= VERIFICATION CACHE =================
+# On-chain records, IPFS content and metadata hashes never change for a given
+# token ID / CID, so they are cached for a long TTL. Supply chain history is
+# mutable and is invalidated whenever a tracking event is written.
+VERIFY_CACHE_SIZE = int(os.getenv("VERIFY_CACHE_SIZE", 10000))
+VERIFY_CACHE_TTL = float(os.getenv("VERIFY_CACHE_TTL", 3600))
+VERIFY_HISTORY_TTL = float(os.getenv("VERIFY_HISTORY_TTL", 60))
+MAX_VERIFY_BATCH = int(os.getenv("MAX_VERIFY_BATCH", 1000))
+VERIFY_BATCH_CONCURRENCY = int(os.getenv("VERIFY_BATCH_CONCURRENCY", 20))
+
+class TTLCache:
+    """Bounded in-memory cache with per-entry TTL and LRU eviction."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+onchain_product_cache = TTLCache(VERIFY_CACHE_SIZE, VERIFY_CACHE_TTL)  # token_id -> on-chain record
+ipfs_metadata_cache = TTLCache(VERIFY_CACHE_SIZE, VERIFY_CACHE_TTL)  # cid -> parsed metadata
+metadata_hash_cache = TTLCache(VERIFY_CACHE_SIZE, VERIFY_CACHE_TTL)  # cid -> sha256 of canonical metadata
+history_cache = TTLCache(VERIFY_CACHE_SIZE, VERIFY_HISTORY_TTL)  # product_id -> supply chain history
+committed_root_cache = TTLCache(VERIFY_CACHE_SIZE, VERIFY_CACHE_TTL)  # anchor root -> on-chain committedAt
+
+def indexed_onchain_product(doc: dict) -> dict:
+    return {
+        "ipfsCid": doc["ipfs_cid"],
+        "metadataHash": bytes.fromhex(doc["metadata_hash"]),
+        "blockNumber": doc["block_number"],
+        "source": "indexer"
+    }
+
+async def prefetch_onchain_products(token_ids: list[int]):
+    """Warm onchain_product_cache from the indexer with one query"""
+    missing = [token_id for token_id in token_ids if onchain_product_cache.get(token_id) is None]
+    if missing:
+        async for doc in onchain_products_collection.find({"_id": {"$in": missing}}):
+            onchain_product_cache.set(doc["_id"], indexed_onchain_product(doc))
+
+async def is_anchor_root_committed(root: str) -> bool:
+    """Read merkleRoots(root) on-chain; only commitments are cached, as they never change"""
+    if committed_root_cache.get(root) is not None:
+        return True
+    _, committed_at = await get_product_contract().functions.merkleRoots(bytes.fromhex(root)).call()
+    if committed_at > 0:
+        committed_root_cache.set(root, committed_at)
+    return committed_at > 0
+
+async def prefetch_committed_roots(roots: list[str]):
+    """Check each distinct anchor root once, so a pallet from one batch costs one call"""
+    if anchoring_configured():
+        await asyncio.gather(*(is_anchor_root_committed(root) for root in set(roots)), return_exceptions=True)
+
+async def fetch_blockchain_product(token_id: int, product: dict, chain_ready: bool | None = None):
+    cached = onchain_product_cache.get(token_id)
+    if cached is not None:
+        return cached
+
+    # Confirmed mints are read from the local index; only tokens the indexer
+    # hasn't reached yet cost an RPC call
+    indexed = await onchain_products_collection.find_one({"_id": token_id})
+    if indexed:
+        blockchain_product = indexed_onchain_product(indexed)
+        onchain_product_cache.set(token_id, blockchain_product)
+        return blockchain_product
+
+    if chain_ready is None:
+        chain_ready = PRODUCT_NFT_ADDRESS != "0xYourProductNFTAddress" and await w3.is_connected()
+
+    if chain_ready:
+        blockchain_product = await get_product_contract().functions.getProduct(token_id).call()
+    else:
+        # Mock blockchain data
+        blockchain_product = {
+            "name": product["product_name"],
+            "description": product["description"],
+            "serialNumber": product["serial_number"],
+            "batchId": product["batch_id"],
+            "manufacturingDate": product["manufacturing_date"],
+            "ipfsCid": product["ipfs_cid"],
+            "metadataHash": bytes.fromhex(product["metadata_hash"]),
+            "createdAt": int(product["created_at"].timestamp()),
+            "mock": True
+        }
+
+    onchain_product_cache.set(token_id, blockchain_product)
+    return blockchain_product
+
+async def fetch_ipfs_metadata(product: dict, blockchain_product) -> tuple[str, dict]:
+    # Handle both dict (mock or indexed) and tuple (real blockchain) formats
+    ipfs_cid = blockchain_product["ipfsCid"] if isinstance(blockchain_product, dict) else blockchain_product[5]
+
+    cached = ipfs_metadata_cache.get(ipfs_cid)
+    if cached is not None:
+        return ipfs_cid, cached
+
+    if IPFS_HOST != "localhost" or IPFS_PORT != 5001:  # Assuming configured
+        ipfs_data = await ipfs.cat(ipfs_cid)
+        ipfs_metadata = json.loads(ipfs_data.decode())
+    else:
+        # Mock IPFS - recreate metadata
+        ipfs_metadata = {
+            "name": product["product_name"],
+            "description": product["description"],
+            "serial_number": product["serial_number"],
+            "batch_id": product["batch_id"],
+            "manufacturing_date": product["manufacturing_date"],
+            "timestamp": product["created_at"].isoformat(),
+            "type": "product"
+        }
+
+    ipfs_metadata_cache.set(ipfs_cid, ipfs_metadata)
+    return ipfs_cid, ipfs_metadata
+
+def compute_metadata_hash(ipfs_cid: str, ipfs_metadata: dict) -> str:
+    computed_hash = metadata_hash_cache.get(ipfs_cid)
+    if computed_hash is None:
+        metadata_json = json.dumps(ipfs_metadata, sort_keys=True)
+        computed_hash = hashlib.sha256(metadata_json.encode()).hexdigest()
+        metadata_hash_cache.set(ipfs_cid, computed_hash)
+    return computed_hash
+
+def format_history_event(event: dict) -> dict:
+    return {
+        "action": event["action"],
+        "actor_role": event["role"],
+        "location": event["location"],
+        "timestamp": event["timestamp"].isoformat(),
+        "notes": event["notes"]
+    }
+
+async def fetch_supply_chain_history(product_id: str) -> list[dict]:
+    cached = history_cache.get(product_id)
+    if cached is not None:
+        return cached
+
+    supply_chain_history = []
+    async for event in tracking_events_collection.find({"product_id": product_id}).sort("timestamp", 1):
+        supply_chain_history.append(format_history_event(event))
+
+    history_cache.set(product_id, supply_chain_history)
+    return supply_chain_history
+
+async def fetch_supply_chain_histories(product_ids: list[str]) -> dict[str, list[dict]]:
+    histories = {}
+    missing = []
+    for product_id in product_ids:
+        cached = history_cache.get(product_id)
+        if cached is not None:
+            histories[product_id] = cached
+        else:
+            missing.append(product_id)
+
+    if missing:
+        for product_id in missing:
+            histories[product_id] = []
+        pipeline = [
+            {"$match": {"product_id": {"$in": missing}}},
+            {"$sort": {"product_id": 1, "timestamp": 1}},
+            {"$group": {"_id": "$product_id", "events": {"$push": "$$ROOT"}}}
+        ]
+        async for group in tracking_events_collection.aggregate(pipeline):
+            histories[group["_id"]] = [format_history_event(event) for event in group["events"]]
+        for product_id in missing:
+            history_cache.set(product_id, histories[product_id])
+
+    return histories
+
+@app.get("/api/verify/cache_stats")
+async def get_verification_cache_stats():
+    return {
+        "onchain_products": onchain_product_cache.stats(),
+        "ipfs_metadata": ipfs_metadata_cache.stats(),
+        "metadata_hashes": metadata_hash_cache.stats(),
+        "supply_chain_history": history_cache.stats()
+    }
+
+class VerificationFailure(Exception):
+    def __init__(self, verify_status: str, message: str):
+        super().__init__(message)
+        self.status = verify_status
+        self.message = message
+
+def verification_failure(verify_status: str, message: str) -> dict:
+    return {
+        "authentic": False,
+        "status": verify_status,
+        "message": message
+    }
+
+def is_hash_authentic(blockchain_product, computed_hash: str) -> bool:
+    # Compare hashes - handle both dict and tuple formats
+    if isinstance(blockchain_product, dict):
+        if blockchain_product.get("mock"):
+            # For mock blockchain, assume authentic since IPFS is also mock
+            return True
+        on_chain_hash = blockchain_product["metadataHash"]
+    else:
+        on_chain_hash = blockchain_product[6]
+    on_chain_hash = bytes(on_chain_hash).hex() if isinstance(on_chain_hash, bytes) else on_chain_hash
+    return computed_hash == on_chain_hash
+
+async def check_anchored_authenticity(product: dict) -> bool:
+    """Prove the metadata hash is a leaf under the product's Merkle root instead of reading the token"""
+    if product.get("anchor_status", "pending") == "pending":
+        raise VerificationFailure("pending", "Product has not been committed to a Merkle batch yet")
+
+    if IPFS_HOST != "localhost" or IPFS_PORT != 5001:  # Assuming configured
+        try:
+            ipfs_cid, ipfs_metadata = await fetch_ipfs_metadata(product, {"ipfsCid": product["ipfs_cid"]})
+        except Exception as e:
+            print(f"IPFS fetch failed: {e}")
+            raise VerificationFailure("tampered", "Failed to fetch IPFS metadata")
+        computed_hash = compute_metadata_hash(ipfs_cid, ipfs_metadata)
+    else:
+        # Mock IPFS: nothing to re-hash, so prove the stored record instead
+        computed_hash = product["metadata_hash"]
+
+    leaf = product_anchor.leaf({**product, "metadata_hash": computed_hash})
+    proof = [bytes.fromhex(node) for node in product["anchor_proof"]]
+    if not verify_merkle_proof(leaf, proof, bytes.fromhex(product["anchor_root"])):
+        return False
+
+    # The stored root is only trusted once the contract has it; anchor_status
+    # in Mongo is bookkeeping for the worker, not proof of commitment
+    if anchoring_configured():
+        try:
+            committed = await is_anchor_root_committed(product["anchor_root"])
+        except Exception as e:
+            print(f"Merkle root lookup failed: {e}")
+            raise VerificationFailure("invalid", "Failed to fetch blockchain data")
+        if not committed:
+            raise VerificationFailure("pending", "Merkle root is awaiting on-chain commitment")
+    return True
+
+async def check_product_authenticity(token_id: int | None, product: dict, chain_ready: bool | None = None) -> bool:
+    if product.get("commit_mode") == "anchored":
+        return await check_anchored_authenticity(product)
+
+    # Products looked up by product_id carry their own token ID
+    if token_id is None:
+        token_id = product.get("nft_token_id")
+    if token_id is None:
+        raise VerificationFailure("pending", "Product has not been minted yet")
+
+    # Fetch NFT metadata from blockchain
+    try:
+        blockchain_product = await fetch_blockchain_product(token_id, product, chain_ready)
+    except Exception as e:
+        print(f"Blockchain fetch failed: {e}")
+        raise VerificationFailure("invalid", "Failed to fetch blockchain data")
+
+    # Fetch IPFS metadata
+    try:
+        ipfs_cid, ipfs_metadata = await fetch_ipfs_metadata(product, blockchain_product)
+    except Exception as e:
+        print(f"IPFS fetch failed: {e}")
+        raise VerificationFailure("tampered", "Failed to fetch IPFS metadata")
+
+    # Compute hash of IPFS metadata
+    computed_hash = compute_metadata_hash(ipfs_cid, ipfs_metadata)
+    return is_hash_authentic(blockchain_product, computed_hash)
+
+def build_verification_result(product: dict, token_id: int | None, authentic: bool, supply_chain_history: list[dict]) -> dict:
+    if token_id is None:
+        token_id = product.get("nft_token_id")
+    result = {
+        "authentic": authentic,
+        "status": "genuine" if authentic else "tampered",
+        "product": {
+            "id": str(product["_id"]),
+            "name": product["product_name"],
+            "serial_number": product["serial_number"],
+            "batch_id": product["batch_id"],
+            "status": product.get("status", "manufactured"),
+            "nft_token_id": str(token_id) if token_id is not None else None
+        },
+        "supply_chain_history": supply_chain_history,
+        "message": "Product verified successfully" if authentic else "Product metadata has been tampered with"
+    }
+    if product.get("commit_mode") == "anchored":
+        result["anchor"] = {
+            "status": product["anchor_status"],
+            "root": product["anchor_root"],
+            "batch_id": str(product["anchor_batch_id"])
+        }
+    return result
+
+async def find_product_for_verification(request: VerificationRequest) -> dict | None:
+    if request.product_id:
+        if not ObjectId.is_valid(request.product_id):
+            return None
+        return await products_collection.find_one({"_id": ObjectId(request.product_id)}, {"tracking_history": 0})
+    if request.token_id is None:
+        return None
+    return await products_collection.find_one({"nft_token_id": request.token_id}, {"tracking_history": 0})
+
+def verification_key(item: VerificationRequest) -> tuple:
+    return ("product", item.product_id) if item.product_id else ("token", item.token_id)
 
 @app.post("/api/verify")
 async def verify_product(request: VerificationRequest):
     try:
-        # Find product by NFT token ID
-        product = await products_collection.find_one({"nft_token_id": request.token_id})
+        # Find product by NFT token ID, or by product ID for anchored products
+        product = await find_product_for_verification(request)
         if not product:
-            return {
-                "authentic": False,
-                "status": "invalid",
-                "message": "Product not found or invalid token ID"
-            }
+            return verification_failure("invalid", "Product not found or invalid token ID")
 
         # Validate verification token
-        message = f"{product['serial_number']}:{product['batch_id']}:{product['ipfs_cid']}:{product['metadata_hash']}"
-        message_hash = hashlib.sha256(message.encode()).digest()
-
         try:
-            # Verify signature if private key is configured
-            if PRIVATE_KEY != "your-private-key-here":
-                expected_signature = Account.sign_message(encode_defunct(message_hash), PRIVATE_KEY).signature.hex()
-                if request.verification_token != expected_signature:
-                    return {
-                        "authentic": False,
-                        "status": "invalid",
-                        "message": "Invalid verification token"
-                    }
-            else:
-                # Fallback for mock - check if token matches stored
-                if request.verification_token != product.get("verification_token"):
-                    return {
-                        "authentic": False,
-                        "status": "invalid",
-                        "message": "Invalid verification token"
-                    }
+            if not check_verification_token(product, request.verification_token):
+                return verification_failure("invalid", "Invalid verification token")
         except Exception as e:
-            return {
-                "authentic": False,
-                "status": "invalid",
-                "message": f"Token validation failed: {str(e)}"
-            }
+            return verification_failure("invalid", f"Token validation failed: {str(e)}")
 
-        # Fetch NFT metadata from blockchain
-        blockchain_product = None
         try:
-            if w3.is_connected() and PRODUCT_NFT_ADDRESS != "0xYourProductNFTAddress":
-                contract = w3.eth.contract(address=PRODUCT_NFT_ADDRESS, abi=PRODUCT_NFT_ABI)
-                blockchain_product = contract.functions.getProduct(request.token_id).call()
-            else:
-                # Mock blockchain data
-                blockchain_product = {
-                    "name": product["product_name"],
-                    "description": product["description"],
-                    "serialNumber": product["serial_number"],
-                    "batchId": product["batch_id"],
-                    "manufacturingDate": product["manufacturing_date"],
-                    "ipfsCid": product["ipfs_cid"],
-                    "metadataHash": bytes.fromhex(product["metadata_hash"]),
-                    "createdAt": int(product["created_at"].timestamp())
-                }
-        except Exception as e:
-            print(f"Blockchain fetch failed: {e}")
-            return {
-                "authentic": False,
-                "status": "invalid",
-                "message": "Failed to fetch blockchain data"
-            }
+            authentic = await check_product_authenticity(request.token_id, product)
+        except VerificationFailure as e:
+            return verification_failure(e.status, e.message)
 
-        # Fetch IPFS metadata
-        ipfs_metadata = None
-        try:
-            if IPFS_HOST != "localhost" or IPFS_PORT != 5001:  # Assuming configured
-                ipfs_client = ipfshttpclient.connect(f"/ip4/{IPFS_HOST}/tcp/{IPFS_PORT}/http")
-                # Handle both dict (mock) and tuple (real blockchain) formats
-                ipfs_cid = blockchain_product["ipfsCid"] if isinstance(blockchain_product, dict) else blockchain_product[5]
-                ipfs_data = ipfs_client.cat(ipfs_cid)
-                ipfs_metadata = json.loads(ipfs_data.decode())
-            else:
-                # Mock IPFS - recreate metadata
-                ipfs_metadata = {
-                    "name": product["product_name"],
-                    "description": product["description"],
-                    "serial_number": product["serial_number"],
-                    "batch_id": product["batch_id"],
-                    "manufacturing_date": product["manufacturing_date"],
-                    "timestamp": product["created_at"].isoformat(),
-                    "type": "product"
-                }
-        except Exception as e:
-            print(f"IPFS fetch failed: {e}")
-            return {
-                "authentic": False,
-                "status": "tampered",
-                "message": "Failed to fetch IPFS metadata"
-            }
+        # Fetch supply chain history
+        supply_chain_history = await fetch_supply_chain_history(str(product["_id"]))
 
-        # Compute hash of IPFS metadata
-        metadata_json = json.dumps(ipfs_metadata, sort_keys=True)
-        computed_hash = hashlib.sha256(metadata_json.encode()).hexdigest()
+        return build_verification_result(product, request.token_id, authentic, supply_chain_history)
 
-        # Compare hashes - handle both dict and tuple formats
-        if isinstance(blockchain_product, dict):
-            # For mock blockchain, assume authentic since IPFS is also mock
-            authentic = True
+    except Exception as e:
+        return verification_failure("invalid", f"Verification failed: {str(e)}")
+
+@app.post("/api/verify/batch")
+async def verify_products_batch(batch: VerificationBatchRequest):
+    if len(batch.items) > MAX_VERIFY_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {MAX_VERIFY_BATCH} items")
+
+    # Resolve every product with a single query
+    token_ids = list({item.token_id for item in batch.items if not item.product_id and item.token_id is not None})
+    product_oids = list({ObjectId(item.product_id) for item in batch.items if item.product_id and ObjectId.is_valid(item.product_id)})
+    products_by_key = {}
+    async for product in products_collection.find(
+        {"$or": [{"nft_token_id": {"$in": token_ids}}, {"_id": {"$in": product_oids}}]}, {"tracking_history": 0}
+    ):
+        if product.get("nft_token_id") is not None:
+            products_by_key[("token", product["nft_token_id"])] = product
+        products_by_key[("product", str(product["_id"]))] = product
+
+    found = [
+        (i, products_by_key[verification_key(item)])
+        for i, item in enumerate(batch.items) if verification_key(item) in products_by_key
+    ]
+    token_checks = await check_verification_tokens_batch(
+        [(product, batch.items[i].verification_token) for i, product in found]
+    )
+    valid = {i: product for (i, product), ok in zip(found, token_checks) if ok}
+
+    # Indexed on-chain records for the whole pallet come from one query
+    await prefetch_onchain_products([
+        product["nft_token_id"] for product in valid.values()
+        if product.get("commit_mode") != "anchored" and product.get("nft_token_id") is not None
+    ])
+    await prefetch_committed_roots([
+        product["anchor_root"] for product in valid.values()
+        if product.get("commit_mode") == "anchored" and product.get("anchor_root")
+    ])
+
+    # Check chain availability once for the whole pallet, then fetch on-chain
+    # records and IPFS metadata concurrently over the pooled clients
+    try:
+        chain_ready = PRODUCT_NFT_ADDRESS != "0xYourProductNFTAddress" and await w3.is_connected()
+    except Exception:
+        chain_ready = False
+    semaphore = asyncio.Semaphore(VERIFY_BATCH_CONCURRENCY)
+
+    async def authenticate(i: int, product: dict):
+        async with semaphore:
+            try:
+                return await check_product_authenticity(batch.items[i].token_id, product, chain_ready)
+            except VerificationFailure as e:
+                return e
+
+    outcomes = dict(zip(valid, await asyncio.gather(*(authenticate(i, p) for i, p in valid.items()))))
+
+    # Load all histories with one aggregation
+    histories = await fetch_supply_chain_histories([
+        str(valid[i]["_id"]) for i, outcome in outcomes.items() if not isinstance(outcome, VerificationFailure)
+    ])
+
+    results = []
+    for i, item in enumerate(batch.items):
+        product = products_by_key.get(verification_key(item))
+        if not product:
+            result = verification_failure("invalid", "Product not found or invalid token ID")
+        elif i not in valid:
+            result = verification_failure("invalid", "Invalid verification token")
+        elif isinstance(outcomes[i], VerificationFailure):
+            result = verification_failure(outcomes[i].status, outcomes[i].message)
         else:
-            on_chain_hash = blockchain_product[6].hex() if isinstance(blockchain_product[6], bytes) else blockchain_product[6]
-            authentic = computed_hash == on_chain_hash
+            result = build_verification_result(product, item.token_id, outcomes[i], histories.get(str(product["_id"]), []))
+        results.append({"index": i, "token_id": item.token_id, "product_id": item.product_id, **result})
 
-        status = "genuine" if authentic else "tampered"
+    return {
+        "count": len(results),
+        "authentic": sum(1 for r in results if r["authentic"]),
+        "results": results
+    }
 
-        # Fetch supply chain history
-        supply_chain_history = []
-        async for event in tracking_events_collection.find({"product_id": str(product["_id"])}).sort("timestamp", 1):
-            supply_chain_history.append({
-                "action": event["action"],
-                "actor_role": event["role"],
-                "location": event["location"],
-                "timestamp": event["timestamp"].isoformat(),
-                "notes": event["notes"]
-            })
+# ================= CHAIN INDEXER =================
+# Tails ProductMinted logs into onchain_products, so verification reads
+# on-chain state from Mongo instead of calling getProduct. Blocks are only
+# indexed once they are INDEXER_CONFIRMATIONS deep. The checkpoint stores the
+# hash of the last indexed block; if the chain no longer has that block, a
+# reorg went deeper than the confirmation depth and the indexer rewinds.
+INDEXER_START_BLOCK = os.getenv("INDEXER_START_BLOCK")  # e.g. the contract's deployment block
+INDEXER_CHUNK_SIZE = int(os.getenv("INDEXER_CHUNK_SIZE", 2000))
+INDEXER_CONFIRMATIONS = int(os.getenv("INDEXER_CONFIRMATIONS", 12))
+INDEXER_REORG_REWIND = int(os.getenv("INDEXER_REORG_REWIND", 64))
+INDEXER_POLL_INTERVAL = float(os.getenv("INDEXER_POLL_INTERVAL", 15))
+PRODUCT_MINTED_CHECKPOINT = "product_minted"
+
+class ProductMintedIndexer:
+    def __init__(self):
+        self.chunk_size = INDEXER_CHUNK_SIZE
+        self.task: asyncio.Task | None = None
+
+    async def block_hash(self, block_number: int) -> str | None:
+        if block_number < 0:
+            return None
+        block = await w3.eth.get_block(block_number)
+        return block["hash"].hex()
+
+    async def save_checkpoint(self, block_number: int, block_hash: str | None):
+        await indexer_checkpoints_collection.update_one(
+            {"_id": PRODUCT_MINTED_CHECKPOINT},
+            {"$set": {"block_number": block_number, "block_hash": block_hash, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
 
-        return {
-            "authentic": authentic,
-            "status": status,
-            "product": {
-                "id": str(product["_id"]),
-                "name": product["product_name"],
-                "serial_number": product["serial_number"],
-                "batch_id": product["batch_id"],
-                "status": product.get("status", "manufactured"),
-                "nft_token_id": str(request.token_id)
-            },
-            "supply_chain_history": supply_chain_history,
-            "message": "Product verified successfully" if authentic else "Product metadata has been tampered with"
-        }
+    async def load_checkpoint(self, safe_head: int) -> dict:
+        checkpoint = await indexer_checkpoints_collection.find_one({"_id": PRODUCT_MINTED_CHECKPOINT})
+        if checkpoint:
+            return checkpoint
+
+        # Without a configured start block only new mints are indexed; older
+        # tokens keep falling back to RPC
+        start = int(INDEXER_START_BLOCK) if INDEXER_START_BLOCK else safe_head
+        checkpoint = {"block_number": start - 1, "block_hash": await self.block_hash(start - 1)}
+        await self.save_checkpoint(checkpoint["block_number"], checkpoint["block_hash"])
+        return checkpoint
+
+    async def rewind(self, checkpoint: dict) -> dict:
+        block_number = max(checkpoint["block_number"] - INDEXER_REORG_REWIND, int(INDEXER_START_BLOCK or 0) - 1)
+        print(f"ProductMinted indexer: block {checkpoint['block_number']} was reorged out, rewinding to {block_number}")
+
+        async for doc in onchain_products_collection.find({"block_number": {"$gt": block_number}}, {"_id": 1}):
+            onchain_product_cache.invalidate(doc["_id"])
+        await onchain_products_collection.delete_many({"block_number": {"$gt": block_number}})
+
+        checkpoint = {"block_number": block_number, "block_hash": await self.block_hash(block_number)}
+        await self.save_checkpoint(checkpoint["block_number"], checkpoint["block_hash"])
+        return checkpoint
+
+    async def fetch_logs(self, from_block: int, to_block: int) -> list:
+        event = get_product_contract().events.ProductMinted()
+        logs = await w3.eth.get_logs({
+            "address": PRODUCT_NFT_ADDRESS,
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [w3.keccak(text="ProductMinted(uint256,address,string,bytes32)")]
+        })
+        return [event.process_log(log) for log in logs if not log.get("removed")]
+
+    async def index_next_range(self) -> bool:
+        """Index one chunk; returns True once caught up with the confirmed head"""
+        safe_head = await w3.eth.block_number - INDEXER_CONFIRMATIONS
+        checkpoint = await self.load_checkpoint(safe_head)
+
+        if checkpoint["block_hash"] and await self.block_hash(checkpoint["block_number"]) != checkpoint["block_hash"]:
+            checkpoint = await self.rewind(checkpoint)
+
+        from_block = checkpoint["block_number"] + 1
+        if from_block > safe_head:
+            return True
+        to_block = min(from_block + self.chunk_size - 1, safe_head)
 
-    except Exception as e:
+        try:
+            events = await self.fetch_logs(from_block, to_block)
+        except Exception as e:
+            if self.chunk_size == 1:
+                raise
+            # Providers cap eth_getLogs by range or result count: retry smaller
+            self.chunk_size = max(1, self.chunk_size // 2)
+            print(f"ProductMinted indexer: getLogs {from_block}-{to_block} failed ({e}), chunk size now {self.chunk_size}")
+            return False
+
+        if events:
+            indexed_at = datetime.utcnow()
+            await onchain_products_collection.bulk_write([
+                UpdateOne(
+                    {"_id": event["args"]["tokenId"]},
+                    {"$set": {
+                        "to": event["args"]["to"],
+                        "ipfs_cid": event["args"]["ipfsCid"],
+                        "metadata_hash": bytes(event["args"]["metadataHash"]).hex(),
+                        "block_number": event["blockNumber"],
+                        "block_hash": event["blockHash"].hex(),
+                        "tx_hash": event["transactionHash"].hex(),
+                        "log_index": event["logIndex"],
+                        "indexed_at": indexed_at
+                    }},
+                    upsert=True
+                )
+                for event in events
+            ], ordered=True)
+
+        await self.save_checkpoint(to_block, await self.block_hash(to_block))
+        self.chunk_size = min(self.chunk_size * 2, INDEXER_CHUNK_SIZE)
+        return to_block >= safe_head
+
+    async def run(self):
+        while True:
+            try:
+                caught_up = await self.index_next_range()
+            except Exception as e:
+                print(f"ProductMinted indexer error: {e}")
+                caught_up = True
+            if caught_up:
+                await asyncio.sleep(INDEXER_POLL_INTERVAL)
+
+    async def describe(self) -> dict:
+        checkpoint = await indexer_checkpoints_collection.find_one({"_id": PRODUCT_MINTED_CHECKPOINT}) or {}
+        try:
+            head = await w3.eth.block_number
+        except Exception:
+            head = None
+        indexed_block = checkpoint.get("block_number")
         return {
-            "authentic": False,
-            "status": "invalid",
-            "message": f"Verification failed: {str(e)}"
+            "running": self.task is not None and not self.task.done(),
+            "indexed_block": indexed_block,
+            "head_block": head,
+            "lag_blocks": head - indexed_block if head is not None and indexed_block is not None else None,
+            "confirmations": INDEXER_CONFIRMATIONS,
+            "chunk_size": self.chunk_size,
+            "indexed_products": await onchain_products_collection.estimated_document_count(),
+            "updated_at": checkpoint.get("updated_at")
         }
 
+product_minted_indexer = ProductMintedIndexer()
+
+@app.on_event("startup")
+async def start_product_minted_indexer():
+    if PRODUCT_NFT_ADDRESS == "0xYourProductNFTAddress":
+        # Nothing to index; verification uses mock on-chain data
+        return
+    product_minted_indexer.task = asyncio.create_task(product_minted_indexer.run())
+
+@app.on_event("shutdown")
+async def stop_product_minted_indexer():
+    if product_minted_indexer.task:
+        product_minted_indexer.task.cancel()
+
+@app.get("/api/indexer/status")
+async def get_indexer_status():
+    return await product_minted_indexer.describe()
+
 # ================= TRACKING ROUTES =================
+# tracking_events_collection is the source of truth for a product's history.
+# The product document only keeps a bounded summary: the last
+# TRACKING_HISTORY_LIMIT events plus counters, so it stops growing with
+# every event (see compact_tracking_history.py for migrating old documents).
+TRACKING_HISTORY_LIMIT = int(os.getenv("TRACKING_HISTORY_LIMIT", 20))
+MAX_TRACKING_BATCH = int(os.getenv("MAX_TRACKING_BATCH", 1000))
+TRACKING_PAGE_SIZE = int(os.getenv("TRACKING_PAGE_SIZE", 100))
+MAX_TRACKING_PAGE_SIZE = int(os.getenv("MAX_TRACKING_PAGE_SIZE", 1000))
+
+def tracking_summary_entry(event_id: str, action: str, timestamp: datetime) -> dict:
+    return {
+        "event_id": event_id,
+        "action": action,
+        "timestamp": timestamp
+    }
+
+def sanitize_action(action: str) -> str:
+    # Actions become field names, which may not contain '.' or start with '$'
+    return action.replace(".", "_").replace("$", "_")
+
+def action_counter_key(action: str) -> str:
+    return "tracking_action_counts." + sanitize_action(action)
+
+def tracking_summary_update(events: list[tuple[str, dict]]) -> dict:
+    """Product update for one or more events of the same product, in order."""
+    last_event = events[-1][1]
+    counters = {"tracking_event_count": len(events)}
+    for _, event_data in events:
+        key = action_counter_key(event_data["action"])
+        counters[key] = counters.get(key, 0) + 1
+
+    update_fields = {
+        "current_location": last_event["location"],
+        "last_updated": datetime.utcnow(),
+        "status": last_event["action"]
+    }
+    shipped = [event_data["timestamp"] for _, event_data in events if event_data["action"] == "shipped"]
+    if shipped:
+        update_fields["last_shipped_at"] = shipped[-1]
+
+    return {
+        "$set": update_fields,
+        "$push": {
+            "tracking_history": {
+                "$each": [
+                    tracking_summary_entry(event_id, event_data["action"], event_data["timestamp"])
+                    for event_id, event_data in events
+                ],
+                "$slice": -TRACKING_HISTORY_LIMIT
+            }
+        },
+        "$inc": counters
+    }
+
+def set_transit_time(event_data: dict, last_shipped_at: datetime | None):
+    # Transit time runs from the product's most recent shipment to its receipt
+    if event_data["action"] == "received" and last_shipped_at:
+        event_data["transit_seconds"] = (event_data["timestamp"] - last_shipped_at).total_seconds()
+
+def build_tracking_event(event: TrackingEventCreate, batch_id: str | None) -> dict:
+    # The IPFS snapshot is published later by the snapshot publisher, which
+    # fills in previous_cid, new_cid and metadata_hash
+    return {
+        "product_id": event.product_id,
+        "batch_id": batch_id,  # Denormalised so streams can filter by batch
+        "action": event.action,
+        "actor": event.actor,
+        "role": event.role,
+        "location": event.location,
+        "notes": event.notes,
+        "tx_hash": event.tx_hash,
+        "timestamp": datetime.utcnow(),
+        "previous_cid": None,
+        "new_cid": None,
+        "metadata_hash": None,
+        "snapshot_status": "pending",
+        "snapshot_attempts": 0,
+        "snapshot_next_attempt_at": datetime.utcnow()
+    }
+
 @app.post("/api/tracking_events")
 async def create_tracking_event(event: TrackingEventCreate):
     try:
         # Verify product exists
-        product = await products_collection.find_one({"_id": ObjectId(event.product_id)})
+        product = await products_collection.find_one({"_id": ObjectId(event.product_id)}, {"batch_id": 1, "last_shipped_at": 1})
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
 
-        # Create tracking event data
-        event_data = {
-            "product_id": event.product_id,
-            "action": event.action,
-            "actor": event.actor,
-            "role": event.role,
-            "location": event.location,
-            "notes": event.notes,
-            "tx_hash": event.tx_hash,
-            "timestamp": datetime.utcnow(),
-            "previous_cid": product.get("ipfs_cid")
-        }
-
-        # Create new metadata snapshot for IPFS
-        metadata = {
-            "product_id": event.product_id,
-            "serial_number": product["serial_number"],
-            "batch_id": product["batch_id"],
-            "action": event.action,
-            "actor": event.actor,
-            "role": event.role,
-            "location": event.location,
-            "notes": event.notes,
-            "timestamp": event_data["timestamp"].isoformat(),
-            "previous_cid": event_data["previous_cid"]
-        }
-
-        # Upload new metadata to IPFS
-        try:
-            ipfs_client = ipfshttpclient.connect(f"/ip4/{IPFS_HOST}/tcp/{IPFS_PORT}/http")
-            metadata_json = json.dumps(metadata, sort_keys=True)
-            result = ipfs_client.add_str(metadata_json)
-            new_cid = result
-        except Exception as e:
-            print(f"IPFS upload failed: {e}, using mock CID")
-            metadata_json = json.dumps(metadata, sort_keys=True)
-            new_cid = hashlib.sha256(metadata_json.encode()).hexdigest()[:46]
-
-        event_data["new_cid"] = new_cid
-        event_data["metadata_hash"] = hashlib.sha256(metadata_json.encode()).hexdigest()
+        event_data = build_tracking_event(event, product.get("batch_id"))
+        set_transit_time(event_data, product.get("last_shipped_at"))
 
         # Store tracking event
         result = await tracking_events_collection.insert_one(event_data)
+        history_cache.invalidate(event.product_id)
 
         # Update product with latest tracking info
         await products_collection.update_one(
             {"_id": ObjectId(event.product_id)},
-            {
-                "$set": {
-                    "current_location": event.location,
-                    "last_updated": datetime.utcnow(),
-                    "latest_cid": new_cid,
-                    "status": event.action
-                },
-                "$push": {
-                    "tracking_history": {
-                        "event_id": str(result.inserted_id),
-                        "action": event.action,
-                        "timestamp": event_data["timestamp"]
-                    }
-                }
-            }
+            tracking_summary_update([(str(result.inserted_id), event_data)])
         )
+        snapshot_publisher_wakeup.set()
+        tracking_event_hub.publish_ingested([event_data])
+        await record_tracking_rollups([event_data])
 
         return {
             "success": True,
             "event_id": str(result.inserted_id),
-            "new_cid": new_cid,
+            "new_cid": None,
+            "snapshot_status": "pending",
             "message": f"Tracking event '{event.action}' recorded successfully"
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create tracking event: {str(e)}")
 
+@app.post("/api/tracking_events/batch")
+async def create_tracking_events_batch(batch: TrackingEventBatchCreate):
+    if not batch.events:
+        raise HTTPException(status_code=400, detail="No tracking events provided")
+    if len(batch.events) > MAX_TRACKING_BATCH:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {MAX_TRACKING_BATCH} events")
+
+    results: list[dict | None] = [None] * len(batch.events)
+
+    # Validate every product ID with a single query
+    requested_ids = {e.product_id for e in batch.events if ObjectId.is_valid(e.product_id)}
+    product_batches = {}
+    last_shipped = {}
+    async for product in products_collection.find(
+        {"_id": {"$in": [ObjectId(pid) for pid in requested_ids]}}, {"batch_id": 1, "last_shipped_at": 1}
+    ):
+        product_batches[str(product["_id"])] = product.get("batch_id")
+        last_shipped[str(product["_id"])] = product.get("last_shipped_at")
+
+    # Group events per product, keeping submission order within each product;
+    # the publisher chains previous_cid in (timestamp, _id) order
+    per_product: dict[str, list[int]] = {}
+    built: dict[int, dict] = {}
+    for i, event in enumerate(batch.events):
+        if event.product_id not in product_batches:
+            results[i] = {"index": i, "success": False, "error": "Product not found"}
+            continue
+        event_data = build_tracking_event(event, product_batches[event.product_id])
+        event_data["_id"] = ObjectId()
+        set_transit_time(event_data, last_shipped[event.product_id])
+        if event_data["action"] == "shipped":
+            last_shipped[event.product_id] = event_data["timestamp"]
+        built[i] = event_data
+        per_product.setdefault(event.product_id, []).append(i)
+
+    if built:
+        await tracking_events_collection.insert_many([built[i] for i in sorted(built)], ordered=True)
+        await products_collection.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(product_id)},
+                tracking_summary_update([(str(built[i]["_id"]), built[i]) for i in indexes])
+            )
+            for product_id, indexes in per_product.items()
+        ], ordered=False)
+
+        for product_id in per_product:
+            history_cache.invalidate(product_id)
+        snapshot_publisher_wakeup.set()
+        tracking_event_hub.publish_ingested([built[i] for i in sorted(built)])
+        await record_tracking_rollups([built[i] for i in sorted(built)])
+
+    for i, event_data in built.items():
+        results[i] = {
+            "index": i,
+            "success": True,
+            "event_id": str(event_data["_id"]),
+            "snapshot_status": "pending"
+        }
+
+    return {
+        "success": all(r["success"] for r in results),
+        "recorded": len(built),
+        "results": results
+    }
+
+# ================= EVENT STREAM =================
+# Push feed of new tracking events over Server-Sent Events. A single watcher
+# tails a MongoDB change stream on tracking_events and fans inserts out to
+# subscribers; without a replica set (no change streams) the ingest endpoints
+# publish to the hub directly. Each subscriber has a bounded queue: a consumer
+# that falls behind is told to resync and disconnected instead of buffering
+# without limit. SSE ids are event _ids, so a reconnect with Last-Event-ID
+# catches up from Mongo before switching to live events.
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 500))
+STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", 15))
+STREAM_CATCHUP_LIMIT = int(os.getenv("STREAM_CATCHUP_LIMIT", 1000))
+STREAM_FILTER_FIELDS = ("product_id", "batch_id", "role")
+
+class StreamSubscriber:
+    def __init__(self, filters: dict):
+        self.filters = filters
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.lagged = False
+
+    def matches(self, event: dict) -> bool:
+        return all(event.get(field) == value for field, value in self.filters.items())
+
+class TrackingEventHub:
+    """In-process fan-out of tracking events to stream subscribers."""
+
+    def __init__(self):
+        self.subscribers: set[StreamSubscriber] = set()
+        self.change_stream_active = False
+        self.resume_token = None
+
+    def subscribe(self, filters: dict) -> StreamSubscriber:
+        subscriber = StreamSubscriber(filters)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StreamSubscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event: dict):
+        for subscriber in list(self.subscribers):
+            if subscriber.lagged or not subscriber.matches(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: stop feeding it, its stream will ask it to resync
+                subscriber.lagged = True
+
+    def publish_ingested(self, events: list[dict]):
+        # With an active change stream the watcher already sees these inserts
+        if not self.change_stream_active:
+            for event in events:
+                self.publish(event)
+
+tracking_event_hub = TrackingEventHub()
+tracking_event_watcher_task: asyncio.Task | None = None
+
+async def watch_tracking_events():
+    while True:
+        try:
+            async with tracking_events_collection.watch(
+                [{"$match": {"operationType": "insert"}}],
+                resume_after=tracking_event_hub.resume_token
+            ) as stream:
+                tracking_event_hub.change_stream_active = True
+                async for change in stream:
+                    tracking_event_hub.resume_token = stream.resume_token
+                    tracking_event_hub.publish(change["fullDocument"])
+        except OperationFailure as e:
+            # Standalone servers don't support change streams; fall back to
+            # publishing from the ingest endpoints
+            tracking_event_hub.change_stream_active = False
+            print(f"Change streams unavailable ({e}), using in-process event hub")
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Inserts made meanwhile are replayed from the resume token; without
+            # one nothing would replay them, so the ingest endpoints publish
+            # in-process until the stream is back
+            if tracking_event_hub.resume_token is None:
+                tracking_event_hub.change_stream_active = False
+            print(f"Tracking event change stream interrupted: {e}, resuming")
+            await asyncio.sleep(1)
+
+@app.on_event("startup")
+async def start_tracking_event_watcher():
+    global tracking_event_watcher_task
+    tracking_event_watcher_task = asyncio.create_task(watch_tracking_events())
+
+@app.on_event("shutdown")
+async def stop_tracking_event_watcher():
+    if tracking_event_watcher_task:
+        tracking_event_watcher_task.cancel()
+
+def format_sse(event: dict) -> str:
+    payload = jsonable_encoder({**event, "_id": str(event["_id"])})
+    return f"id: {event['_id']}\nevent: tracking_event\ndata: {json.dumps(payload)}\n\n"
+
+@app.get("/api/tracking_events/stream")
+async def stream_tracking_events(
+    request: Request,
+    product_id: str | None = None,
+    batch_id: str | None = None,
+    role: str | None = None,
+    last_event_id: str | None = None
+):
+    filters = {
+        field: value
+        for field, value in zip(STREAM_FILTER_FIELDS, (product_id, batch_id, role))
+        if value is not None
+    }
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    if resume_from and not ObjectId.is_valid(resume_from):
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+
+    async def event_stream():
+        # Subscribe before catching up so nothing inserted meanwhile is lost
+        subscriber = tracking_event_hub.subscribe(filters)
+        try:
+            last_sent = ObjectId(resume_from) if resume_from else None
+            if last_sent:
+                # One extra event tells whether the client is further behind than the limit
+                caught_up = 0
+                async for event in tracking_events_collection.find(
+                    {**filters, "_id": {"$gt": last_sent}}
+                ).sort("_id", ASCENDING).limit(STREAM_CATCHUP_LIMIT + 1):
+                    if caught_up == STREAM_CATCHUP_LIMIT:
+                        # Too far behind to replay: the client refetches history instead
+                        yield "event: resync\ndata: {}\n\n"
+                        return
+                    last_sent = event["_id"]
+                    caught_up += 1
+                    yield format_sse(event)
+
+            while not await request.is_disconnected():
+                if subscriber.lagged:
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if last_sent and event["_id"] <= last_sent:
+                    continue  # Already delivered during catch-up
+                yield format_sse(event)
+        finally:
+            tracking_event_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def tracking_events_query(product_id: str | None, since: datetime | None, until: datetime | None,
+                          action: str | None, role: str | None) -> dict:
+    query = {}
+    if product_id:
+        query["product_id"] = product_id
+    if action:
+        query["action"] = action
+    if role:
+        query["role"] = role
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    return query
+
+async def fetch_tracking_events_page(query: dict, order: str, cursor: str | None,
+                                     limit: int | None, fields: str | None) -> dict:
+    direction = ASCENDING if order == "asc" else DESCENDING
+    sort = [("timestamp", direction), ("_id", direction)]
+    page_size = min(limit or TRACKING_PAGE_SIZE, MAX_TRACKING_PAGE_SIZE)
+
+    events, next_cursor = await fetch_page(
+        tracking_events_collection, query, sort, page_size, cursor, build_projection(fields, (), sort)
+    )
+    for event in events:
+        event["_id"] = str(event["_id"])
+    return {"events": events, "next_cursor": next_cursor}
+
 @app.get("/api/tracking_events/{product_id}")
-async def get_product_tracking_events(product_id: str):
+async def get_product_tracking_events(
+    product_id: str,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    role: str | None = None,
+    fields: str | None = None,
+    order: Literal["asc", "desc"] = "asc"
+):
     try:
-        events = []
-        async for event in tracking_events_collection.find({"product_id": product_id}).sort("timestamp", 1):
-            event["_id"] = str(event["_id"])
-            events.append(event)
-        return {"events": events}
+        query = tracking_events_query(product_id, since, until, action, role)
+        return await fetch_tracking_events_page(query, order, cursor, limit, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch tracking events: {str(e)}")
 
 @app.get("/api/tracking_events")
-async def get_all_tracking_events():
+async def get_all_tracking_events(
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    action: str | None = None,
+    role: str | None = None,
+    fields: str | None = None,
+    order: Literal["asc", "desc"] = "desc"
+):
     try:
-        events = []
-        async for event in tracking_events_collection.find().sort("timestamp", -1).limit(100):
-            event["_id"] = str(event["_id"])
-            events.append(event)
-        return {"events": events}
+        query = tracking_events_query(None, since, until, action, role)
+        return await fetch_tracking_events_page(query, order, cursor, limit, fields)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch tracking events: {str(e)}")
 
+# ================= SNAPSHOT PUBLISHER =================
+# Tracking events are committed with snapshot_status "pending" and published
+# to IPFS in the background. The pending state lives in Mongo, so it survives
+# restarts. Each product's snapshots are published strictly in order, because
+# a snapshot's previous_cid is the CID of the one before it. A failed upload
+# is retried with exponential backoff and is never replaced by a mock CID.
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", 200))
+SNAPSHOT_CONCURRENCY = int(os.getenv("SNAPSHOT_CONCURRENCY", 10))
+SNAPSHOT_POLL_INTERVAL = float(os.getenv("SNAPSHOT_POLL_INTERVAL", 5))
+SNAPSHOT_BASE_BACKOFF = float(os.getenv("SNAPSHOT_BASE_BACKOFF", 2))
+SNAPSHOT_MAX_BACKOFF = float(os.getenv("SNAPSHOT_MAX_BACKOFF", 600))
+
+snapshot_publisher_wakeup = asyncio.Event()
+snapshot_publisher_task: asyncio.Task | None = None
+
+def build_snapshot_metadata(event: dict, product: dict, previous_cid: str | None) -> dict:
+    return {
+        "product_id": event["product_id"],
+        "serial_number": product["serial_number"],
+        "batch_id": product["batch_id"],
+        "action": event["action"],
+        "actor": event["actor"],
+        "role": event["role"],
+        "location": event["location"],
+        "notes": event["notes"],
+        "timestamp": event["timestamp"].isoformat(),
+        "previous_cid": previous_cid
+    }
+
+async def find_previous_snapshot(event: dict) -> dict | None:
+    return await tracking_events_collection.find_one(
+        {
+            "product_id": event["product_id"],
+            "$or": [
+                {"timestamp": {"$lt": event["timestamp"]}},
+                {"timestamp": event["timestamp"], "_id": {"$lt": event["_id"]}}
+            ]
+        },
+        {"new_cid": 1, "snapshot_status": 1, "snapshot_next_attempt_at": 1},
+        sort=[("timestamp", DESCENDING), ("_id", DESCENDING)]
+    )
+
+async def defer_product_snapshots(product_id: str, until: datetime, exclude_id: ObjectId | None = None):
+    """Hold a product's later pending events until its blocked snapshot is retried, so they aren't refetched meanwhile"""
+    query = {"product_id": product_id, "snapshot_status": "pending", "snapshot_next_attempt_at": {"$lt": until}}
+    if exclude_id is not None:
+        query["_id"] = {"$ne": exclude_id}
+    await tracking_events_collection.update_many(query, {"$set": {"snapshot_next_attempt_at": until}})
+
+async def schedule_snapshot_retry(event: dict, error: Exception):
+    attempts = event.get("snapshot_attempts", 0) + 1
+    backoff = min(SNAPSHOT_BASE_BACKOFF * 2 ** (attempts - 1), SNAPSHOT_MAX_BACKOFF)
+    next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+    print(f"Snapshot publish failed for event {event['_id']} (attempt {attempts}): {error}")
+    await tracking_events_collection.update_one(
+        {"_id": event["_id"]},
+        {"$set": {
+            "snapshot_attempts": attempts,
+            "snapshot_error": str(error),
+            "snapshot_next_attempt_at": next_attempt_at
+        }}
+    )
+    await defer_product_snapshots(event["product_id"], next_attempt_at, exclude_id=event["_id"])
+
+async def publish_product_snapshots(product_id: str, events: list[dict]) -> int:
+    """Publish a product's due snapshots in order; returns how many were published"""
+    product = await products_collection.find_one(
+        {"_id": ObjectId(product_id)}, {"serial_number": 1, "batch_id": 1, "ipfs_cid": 1}
+    )
+    if not product:
+        return 0
+
+    previous = await find_previous_snapshot(events[0])
+    if previous and previous.get("snapshot_status") == "pending":
+        # An earlier snapshot is still waiting (e.g. backing off); keep order
+        # and keep these events out of the next passes until it is due
+        until = max(
+            previous.get("snapshot_next_attempt_at") or datetime.utcnow(),
+            datetime.utcnow() + timedelta(seconds=SNAPSHOT_POLL_INTERVAL)
+        )
+        await defer_product_snapshots(product_id, until)
+        return 0
+    previous_cid = previous["new_cid"] if previous else product.get("ipfs_cid")
+    published = 0
+
+    for event in events:
+        metadata = build_snapshot_metadata(event, product, previous_cid)
+        metadata_json = json.dumps(metadata, sort_keys=True)
+        try:
+            new_cid = await ipfs.add_str(metadata_json)
+        except Exception as e:
+            # Later events of this product wait until this one is published
+            await schedule_snapshot_retry(event, e)
+            return published
+
+        await tracking_events_collection.update_one(
+            {"_id": event["_id"]},
+            {
+                "$set": {
+                    "snapshot_status": "published",
+                    "previous_cid": previous_cid,
+                    "new_cid": new_cid,
+                    "metadata_hash": hashlib.sha256(metadata_json.encode()).hexdigest(),
+                    "published_at": datetime.utcnow()
+                },
+                "$unset": {"snapshot_next_attempt_at": "", "snapshot_error": ""}
+            }
+        )
+        await products_collection.update_one({"_id": ObjectId(product_id)}, {"$set": {"latest_cid": new_cid}})
+        previous_cid = new_cid
+        published += 1
+
+    return published
+
+async def publish_pending_snapshots() -> int:
+    pending = await tracking_events_collection.find(
+        {"snapshot_status": "pending", "snapshot_next_attempt_at": {"$lte": datetime.utcnow()}}
+    ).sort([("timestamp", ASCENDING), ("_id", ASCENDING)]).limit(SNAPSHOT_BATCH_SIZE).to_list(length=SNAPSHOT_BATCH_SIZE)
+
+    per_product: dict[str, list[dict]] = {}
+    for event in pending:
+        per_product.setdefault(event["product_id"], []).append(event)
+
+    semaphore = asyncio.Semaphore(SNAPSHOT_CONCURRENCY)
+
+    async def publish(product_id: str, events: list[dict]) -> int:
+        async with semaphore:
+            try:
+                return await publish_product_snapshots(product_id, events)
+            except Exception as e:
+                print(f"Snapshot publisher error for product {product_id}: {e}")
+                return 0
+
+    counts = await asyncio.gather(*(publish(pid, events) for pid, events in per_product.items()))
+    return sum(counts)
+
+async def snapshot_publisher():
+    while True:
+        try:
+            published = await publish_pending_snapshots()
+        except Exception as e:
+            print(f"Snapshot publisher error: {e}")
+            published = 0
+
+        # Drain back-to-back only while whole batches are being published;
+        # otherwise wait for new events or the next poll (retries become due
+        # over time), so blocked events can't spin the loop
+        if published < SNAPSHOT_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(snapshot_publisher_wakeup.wait(), timeout=SNAPSHOT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        snapshot_publisher_wakeup.clear()
+
+@app.on_event("startup")
+async def start_snapshot_publisher():
+    global snapshot_publisher_task
+    snapshot_publisher_task = asyncio.create_task(snapshot_publisher())
+
+@app.on_event("shutdown")
+async def stop_snapshot_publisher():
+    if snapshot_publisher_task:
+        snapshot_publisher_task.cancel()
+
 # ================= RISK SCORING =================
-def calculate_risk_score(invoice_amount: float, buyer: str, due_date: str, description: str) -> int:
+RISK_KEYWORDS = ['urgent', 'cash flow', 'immediate', 'crisis', 'emergency']
+LOW_RISK_KEYWORDS = ['stable', 'reliable', 'established', 'premium', 'quality']
+
+# Weighted lexicon for description analysis. Overridden by a JSON object of
+# {"term": weight} at RISK_LEXICON_PATH, which is re-read when it changes.
+DEFAULT_RISK_LEXICON = {
+    **{keyword: 5 for keyword in RISK_KEYWORDS},
+    **{keyword: -2 for keyword in LOW_RISK_KEYWORDS}
+}
+RISK_LEXICON_PATH = os.getenv("RISK_LEXICON_PATH")
+RISK_LEXICON_CHECK_SECONDS = float(os.getenv("RISK_LEXICON_CHECK_SECONDS", 30))
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a weighted lexicon. score() walks the text once
+    and sums the weight of every distinct term that occurs as a substring, so
+    the cost does not grow with the number of terms.
+    """
+
+    def __init__(self, lexicon: dict[str, int]):
+        self.lexicon = {term.lower(): int(weight) for term, weight in lexicon.items() if term}
+        self.terms = list(self.lexicon)
+        self.weights = [self.lexicon[term] for term in self.terms]
+
+        # goto[state] maps a character to the next state; outputs[state] holds
+        # the ids of every term ending at that state, including via fail links
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.outputs: list[tuple[int, ...]] = [()]
+
+        for term_id, term in enumerate(self.terms):
+            state = 0
+            for char in term:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.outputs[state] += (term_id,)
+
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.outputs[child] += self.outputs[self.fail[child]]
+                queue.append(child)
+
+    def matches(self, text: str) -> set[int]:
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        found = set()
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found.update(outputs[state])
+        return found
+
+    def score(self, text: str) -> int:
+        return sum(self.weights[term_id] for term_id in self.matches(text))
+
+class RiskLexicon:
+    """Holds the active KeywordMatcher and swaps it when the lexicon file changes"""
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.matcher = KeywordMatcher(DEFAULT_RISK_LEXICON)
+        self.source = "default"
+        self.loaded_at = datetime.utcnow()
+        self.file_mtime: float | None = None
+        self.checked_at = 0.0
+        self.last_error: str | None = None
+
+    def reload(self) -> KeywordMatcher:
+        """Rebuild from the lexicon file; a bad file keeps the current matcher"""
+        if not self.path:
+            return self.matcher
+
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path) as f:
+            lexicon = json.load(f)
+        if not isinstance(lexicon, dict) or not lexicon:
+            raise ValueError("Risk lexicon must be a non-empty JSON object of term to weight")
+
+        self.matcher = KeywordMatcher(lexicon)
+        self.source = self.path
+        self.file_mtime = mtime
+        self.loaded_at = datetime.utcnow()
+        self.last_error = None
+        return self.matcher
+
+    def current(self) -> KeywordMatcher:
+        if self.path and time.monotonic() - self.checked_at >= RISK_LEXICON_CHECK_SECONDS:
+            self.checked_at = time.monotonic()
+            try:
+                if os.stat(self.path).st_mtime != self.file_mtime:
+                    self.reload()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Risk lexicon reload failed, keeping previous lexicon: {e}")
+        return self.matcher
+
+    def info(self) -> dict:
+        return {
+            "source": self.source,
+            "terms": len(self.matcher.terms),
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error
+        }
+
+risk_lexicon = RiskLexicon(RISK_LEXICON_PATH)
+
+# Bucket edges and points for the vectorised scorer; they mirror the if/elif
+# chains in calculate_risk_score (np.digitize puts x in bucket i when
+# edges[i-1] <= x < edges[i])
+AMOUNT_EDGES = [1, 10, 50]
+AMOUNT_POINTS = [5, 0, 10, 20]
+MATURITY_EDGES = [7, 30, 90]
+MATURITY_POINTS = [25, 15, 5, -5]
+INVALID_DUE_DATE_POINTS = 10
+RISK_SCORE_BATCH_LIMIT = int(os.getenv("RISK_SCORE_BATCH_LIMIT", 100000))
+
+def market_adjustment(now: datetime) -> int:
+    # In real implementation, this would use economic indicators
+    day_of_year = now.timetuple().tm_yday
+    market_factor = (day_of_year % 20) - 10  # -10 to +9
+    return market_factor // 2
+
+def simulated_buyer_risk(buyer_key: str) -> int:
+    """Stand-in creditworthiness (-10 to +10) derived from the lowercased buyer name"""
+    buyer_hash = hashlib.md5(buyer_key.encode()).hexdigest()
+    buyer_score = int(buyer_hash[:2], 16) - 128  # -128 to +127
+    return buyer_score // 12  # Convert to -10 to +10 range
+
+def calculate_risk_score(invoice_amount: float, buyer: str, due_date: str, description: str, now: datetime | None = None, buyer_risk: int | None = None) -> int:
     """
     Calculate dynamic risk score based on multiple factors:
     - Invoice amount (higher amounts = higher risk)
@@ -563,7 +2540,9 @@ def calculate_risk_score(invoice_amount: float, buyer: str, due_date: str, descr
     - Buyer creditworthiness (simulated)
     - Market conditions
     - Invoice description analysis
+    buyer_risk comes from the buyer credit service when the caller has it.
     """
+    now = now or datetime.utcnow()
     score = 50  # Base score
 
     # Factor 1: Invoice Amount (0-20 points)
@@ -579,7 +2558,7 @@ def calculate_risk_score(invoice_amount: float, buyer: str, due_date: str, descr
     # Factor 2: Time to Maturity (0-30 points)
     try:
         due_datetime = datetime.fromisoformat(due_date)
-        days_to_maturity = (due_datetime - datetime.utcnow()).days
+        days_to_maturity = (due_datetime - now).days
 
         if days_to_maturity < 7:
             score += 25  # Very short term = high risk
@@ -592,59 +2571,301 @@ def calculate_risk_score(invoice_amount: float, buyer: str, due_date: str, descr
     except:
         score += 10  # Invalid date = moderate risk
 
-    # Factor 3: Buyer Creditworthiness (simulated -10 to +10 points)
-    # In real implementation, this would query credit databases
-    buyer_hash = hashlib.md5(buyer.lower().encode()).hexdigest()
-    buyer_score = int(buyer_hash[:2], 16) - 128  # -128 to +127
-    buyer_risk = buyer_score // 12  # Convert to -10 to +10 range
+    # Factor 3: Buyer Creditworthiness (-10 to +10 points)
+    if buyer_risk is None:
+        buyer_risk = simulated_buyer_risk(buyer.lower())
     score += buyer_risk
 
     # Factor 4: Description Analysis (-5 to +10 points)
-    risk_keywords = ['urgent', 'cash flow', 'immediate', 'crisis', 'emergency']
-    low_risk_keywords = ['stable', 'reliable', 'established', 'premium', 'quality']
-
-    desc_lower = description.lower()
-    risk_matches = sum(1 for keyword in risk_keywords if keyword in desc_lower)
-    low_risk_matches = sum(1 for keyword in low_risk_keywords if keyword in desc_lower)
-
-    score += (risk_matches * 5) - (low_risk_matches * 2)
+    # Each lexicon term counts once, weighted (+5 risk, -2 low-risk by default)
+    score += risk_lexicon.current().score(description)
 
     # Factor 5: Market Conditions (simulated -5 to +5 points)
-    # In real implementation, this would use economic indicators
-    day_of_year = datetime.utcnow().timetuple().tm_yday
-    market_factor = (day_of_year % 20) - 10  # -10 to +9
-    score += market_factor // 2
+    score += market_adjustment(now)
 
     # Ensure score stays within 0-100 range
     return max(0, min(100, score))
 
+def days_to_maturity_or_none(due_date: str, now: datetime) -> float:
+    try:
+        return (datetime.fromisoformat(due_date) - now).days
+    except:
+        return np.nan
+
+def factorize(values) -> tuple[list, np.ndarray]:
+    """Distinct values in first-seen order plus each input's index into them"""
+    positions = {}
+    index = np.fromiter((positions.setdefault(v, len(positions)) for v in values), dtype=np.int64, count=len(values))
+    return list(positions), index
+
+def calculate_risk_scores(amounts, due_dates, buyers, descriptions, now: datetime | None = None, buyer_risks: dict[str, int] | None = None) -> np.ndarray:
+    """
+    Score many invoices at once; element i equals
+    calculate_risk_score(amounts[i], buyers[i], due_dates[i], descriptions[i], now).
+    buyer_risks maps lowercased buyer names to their credit risk points.
+    String work (date parsing, hashing, keyword scans) runs once per distinct
+    value and every factor is bucketed with array operations.
+    """
+    now = now or datetime.utcnow()
+    amounts = np.asarray(amounts, dtype=np.float64)
+    scores = np.full(len(amounts), 50, dtype=np.int64)
+
+    # Factor 1: Invoice Amount
+    scores += np.take(AMOUNT_POINTS, np.digitize(amounts, AMOUNT_EDGES))
+
+    # Factor 2: Time to Maturity, parsing each distinct due date once
+    unique_dates, date_index = factorize(due_dates)
+    days = np.array([days_to_maturity_or_none(d, now) for d in unique_dates], dtype=np.float64)
+    invalid = np.isnan(days)
+    date_points = np.where(
+        invalid,
+        INVALID_DUE_DATE_POINTS,
+        np.take(MATURITY_POINTS, np.digitize(np.where(invalid, 0, days), MATURITY_EDGES))
+    )
+    scores += date_points[date_index]
+
+    # Factor 3: Buyer Creditworthiness, resolved once per distinct buyer
+    unique_buyers, buyer_index = factorize([b.lower() for b in buyers])
+    buyer_risks = buyer_risks or {}
+    buyer_points = np.array(
+        [buyer_risks[b] if b in buyer_risks else simulated_buyer_risk(b) for b in unique_buyers],
+        dtype=np.int64
+    )
+    scores += buyer_points[buyer_index]
+
+    # Factor 4: Description Analysis, one automaton pass per distinct description
+    matcher = risk_lexicon.current()
+    unique_descs, desc_index = factorize([d.lower() for d in descriptions])
+    desc_points = np.array([matcher.score(d) for d in unique_descs], dtype=np.int64)
+    scores += desc_points[desc_index]
+
+    # Factor 5: Market Conditions, the same for every invoice under one "now"
+    scores += market_adjustment(now)
+
+    return np.clip(scores, 0, 100)
+
+# ================= BUYER CREDIT =================
+# Factor 3 of the risk score comes from a buyer credit provider. Profiles are
+# cached in memory (TTL + LRU), persisted in buyer_profiles, and concurrent
+# lookups of the same buyer share one provider call.
+BUYER_CREDIT_PROVIDER = os.getenv("BUYER_CREDIT_PROVIDER", "local")
+BUYER_PROFILE_CACHE_SIZE = int(os.getenv("BUYER_PROFILE_CACHE_SIZE", 10000))
+BUYER_PROFILE_CACHE_TTL = float(os.getenv("BUYER_PROFILE_CACHE_TTL", 3600))
+BUYER_PROFILE_MAX_AGE_HOURS = float(os.getenv("BUYER_PROFILE_MAX_AGE_HOURS", 24))
+
+class BuyerCreditProvider(ABC):
+    """Source of buyer credit profiles. Implementations return at least risk_points (-10 to +10)."""
+
+    name = "base"
+
+    @abstractmethod
+    async def fetch_profile(self, buyer_key: str) -> dict:
+        ...
+
+class LocalBuyerCreditProvider(BuyerCreditProvider):
+    """Deterministic stand-in until a credit bureau is wired up"""
+
+    name = "local"
+
+    async def fetch_profile(self, buyer_key: str) -> dict:
+        return {"risk_points": simulated_buyer_risk(buyer_key)}
+
+BUYER_CREDIT_PROVIDERS = {
+    "local": LocalBuyerCreditProvider,
+}
+
+class BuyerProfileService:
+    def __init__(self, provider: BuyerCreditProvider):
+        self.provider = provider
+        self.cache = TTLCache(BUYER_PROFILE_CACHE_SIZE, BUYER_PROFILE_CACHE_TTL)
+        self.pending: dict[str, asyncio.Future] = {}
+        self.provider_calls = 0
+
+    async def get_profile(self, buyer: str) -> dict:
+        return (await self.get_profiles([buyer]))[buyer.lower()]
+
+    async def get_profiles(self, buyers) -> dict[str, dict]:
+        """Profiles keyed by lowercased buyer name"""
+        profiles = {}
+        waiting = {}
+        missing = []
+        for key in {buyer.lower() for buyer in buyers}:
+            cached = self.cache.get(key)
+            if cached is not None:
+                profiles[key] = cached
+            elif key in self.pending:
+                waiting[key] = self.pending[key]
+            else:
+                self.pending[key] = asyncio.get_running_loop().create_future()
+                missing.append(key)
+
+        if missing:
+            try:
+                loaded = await self.load_profiles(missing)
+            except BaseException as e:
+                for key in missing:
+                    future = self.pending.pop(key)
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                        # Mark retrieved so waiter-less failures aren't logged as unhandled
+                        future.exception()
+                    else:
+                        future.cancel()
+                raise
+            for key in missing:
+                self.cache.set(key, loaded[key])
+                self.pending.pop(key).set_result(loaded[key])
+            profiles.update(loaded)
+
+        for key, future in waiting.items():
+            profiles[key] = await future
+        return profiles
+
+    async def load_profiles(self, keys: list[str]) -> dict[str, dict]:
+        fresh_after = datetime.utcnow() - timedelta(hours=BUYER_PROFILE_MAX_AGE_HOURS)
+        loaded = {}
+        async for doc in buyer_profiles_collection.find({
+            "_id": {"$in": keys},
+            "provider": self.provider.name,
+            "refreshed_at": {"$gte": fresh_after}
+        }):
+            loaded[doc.pop("_id")] = doc
+
+        stale = [key for key in keys if key not in loaded]
+        if stale:
+            self.provider_calls += len(stale)
+            fetched = await asyncio.gather(*[self.provider.fetch_profile(key) for key in stale])
+            operations = []
+            for key, profile in zip(stale, fetched):
+                profile = {**profile, "provider": self.provider.name, "refreshed_at": datetime.utcnow()}
+                loaded[key] = profile
+                operations.append(UpdateOne({"_id": key}, {"$set": profile}, upsert=True))
+            await buyer_profiles_collection.bulk_write(operations, ordered=False)
+
+        return loaded
+
+    async def get_buyer_risks(self, buyers) -> dict[str, int]:
+        profiles = await self.get_profiles(buyers)
+        return {key: int(profile["risk_points"]) for key, profile in profiles.items()}
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "provider_calls": self.provider_calls,
+            "pending": len(self.pending),
+            "cache": self.cache.stats()
+        }
+
+buyer_profile_service = BuyerProfileService(BUYER_CREDIT_PROVIDERS[BUYER_CREDIT_PROVIDER]())
+
+@app.get("/api/buyer_profiles/stats")
+async def get_buyer_profile_stats():
+    return buyer_profile_service.stats()
+
 # ================= INVOICE ROUTES =================
+# Inclusion proofs are served by GET /api/invoices/{id}/proof, not list views
+INVOICE_LIST_EXCLUDED_FIELDS = ("anchor_proof", "owner_id")
+INVOICES_PAGE_SIZE = int(os.getenv("INVOICES_PAGE_SIZE", 100))
+MAX_INVOICES_PAGE_SIZE = int(os.getenv("MAX_INVOICES_PAGE_SIZE", 1000))
+DUE_AT_BACKFILL_BATCH = 1000
+
+def parse_due_date(due_date: str) -> datetime | None:
+    """Due date as a datetime for range queries; accepts ISO input or the stored %d-%m-%y form"""
+    try:
+        due_at = datetime.fromisoformat(due_date)
+        return due_at.astimezone(timezone.utc).replace(tzinfo=None) if due_at.tzinfo else due_at
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.strptime(due_date, "%d-%m-%y")
+    except (TypeError, ValueError):
+        return None
+
+def invoices_query(min_risk: int | None, max_risk: int | None, min_amount: float | None, max_amount: float | None,
+                   due_after: datetime | None, due_before: datetime | None, buyer: str | None,
+                   sort: str = "created_at") -> dict:
+    query = {}
+    for field, low, high in (
+        ("risk_score", min_risk, max_risk),
+        ("amount", min_amount, max_amount),
+        ("due_at", due_after, due_before),
+    ):
+        if low is not None or high is not None:
+            query[field] = {}
+            if low is not None:
+                query[field]["$gte"] = low
+            if high is not None:
+                query[field]["$lte"] = high
+    if buyer:
+        query["buyer"] = buyer
+    if sort == "due_at":
+        # Keyset comparisons can't step past null, so unparseable due dates drop out of this order
+        query.setdefault("due_at", {})["$type"] = "date"
+    return query
+
+def invoice_sort_keys(sort: str, order: str | None) -> list[tuple[str, int]]:
+    # Newest first by default; every other sort defaults to ascending
+    direction = DESCENDING if (order or ("desc" if sort == "created_at" else "asc")) == "desc" else ASCENDING
+    return [(sort, direction), ("_id", direction)]
+
+async def backfill_invoice_due_at():
+    """Give invoices stored before due_at existed a parsed due date"""
+    updated = 0
+    while True:
+        invoices = await invoices_collection.find(
+            {"due_at": {"$exists": False}}, {"due_date": 1}
+        ).limit(DUE_AT_BACKFILL_BATCH).to_list(length=DUE_AT_BACKFILL_BATCH)
+        if not invoices:
+            break
+        await invoices_collection.bulk_write([
+            UpdateOne({"_id": inv["_id"]}, {"$set": {"due_at": parse_due_date(inv.get("due_date"))}})
+            for inv in invoices
+        ], ordered=False)
+        updated += len(invoices)
+    if updated:
+        print(f"Backfilled due_at on {updated} invoices")
+
+due_at_backfill_task: asyncio.Task | None = None
+
+@app.on_event("startup")
+async def start_due_at_backfill():
+    global due_at_backfill_task
+    due_at_backfill_task = asyncio.create_task(backfill_invoice_due_at())
+
 @app.post("/api/invoices_create")
-async def create_invoice(invoice: InvoiceCreate):
+async def create_invoice(invoice: InvoiceCreate, owner_id: str = Depends(get_investor_id)):
     try:
         formatted_due_date = datetime.fromisoformat(invoice.due_date).strftime("%d-%m-%y")
     except:
         formatted_due_date = invoice.due_date
 
     # Calculate dynamic risk score instead of using provided value
+    buyer_profile = await buyer_profile_service.get_profile(invoice.buyer)
     dynamic_risk_score = calculate_risk_score(
         invoice.amount,
         invoice.buyer,
         invoice.due_date,
-        invoice.description
+        invoice.description,
+        buyer_risk=buyer_profile["risk_points"]
     )
 
     invoice_data = {
         "amount": invoice.amount,
         "buyer": invoice.buyer,
         "due_date": formatted_due_date,
+        "due_at": parse_due_date(invoice.due_date),
         "description": invoice.description,
         "risk_score": dynamic_risk_score,  # Use calculated score
         "tx_hash": invoice.tx_hash,
-        "created_at": datetime.utcnow()
+        "created_at": datetime.utcnow(),
+        "anchor_status": "pending"
     }
+    if owner_id != ANONYMOUS_INVESTOR:
+        # Only the owner can record the buyer's repayment later
+        invoice_data["owner_id"] = owner_id
 
     result = await invoices_collection.insert_one(invoice_data)
+    invoice_anchor.wakeup.set()
     return {
         "success": True,
         "invoice_id": str(result.inserted_id),
@@ -652,76 +2873,859 @@ async def create_invoice(invoice: InvoiceCreate):
         "message": "Invoice stored successfully"
     }
 
+@app.post("/api/invoices/score_batch")
+async def score_invoices_batch(batch: InvoiceScoreBatch):
+    lengths = {len(batch.amounts), len(batch.due_dates), len(batch.buyers), len(batch.descriptions)}
+    if len(lengths) != 1:
+        raise HTTPException(status_code=400, detail="amounts, due_dates, buyers and descriptions must have the same length")
+    if len(batch.amounts) > RISK_SCORE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Batch cannot exceed {RISK_SCORE_BATCH_LIMIT} invoices")
+
+    now = batch.now or datetime.utcnow()
+    if now.tzinfo:
+        # Due dates are naive UTC, like calculate_risk_score's utcnow()
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    buyer_risks = await buyer_profile_service.get_buyer_risks(batch.buyers)
+    # Scoring is CPU-bound; keep it off the event loop
+    scores = await asyncio.to_thread(
+        calculate_risk_scores, batch.amounts, batch.due_dates, batch.buyers, batch.descriptions, now, buyer_risks
+    )
+    return {"risk_scores": scores.tolist(), "scored_at": now, "count": len(scores)}
+
+@app.get("/api/risk/lexicon")
+async def get_risk_lexicon():
+    risk_lexicon.current()
+    return risk_lexicon.info()
+
+@app.post("/api/risk/lexicon/reload")
+async def reload_risk_lexicon():
+    if not risk_lexicon.path:
+        raise HTTPException(status_code=400, detail="RISK_LEXICON_PATH is not configured")
+    try:
+        risk_lexicon.reload()
+    except Exception as e:
+        risk_lexicon.last_error = str(e)
+        raise HTTPException(status_code=400, detail=f"Invalid risk lexicon: {e}")
+    return risk_lexicon.info()
+
 @app.get("/api/get_invoices")
-async def get_invoices():
-    invoices = []
-    async for inv in invoices_collection.find():
+async def get_invoices(
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1),
+    min_risk: int | None = Query(None, ge=0, le=100),
+    max_risk: int | None = Query(None, ge=0, le=100),
+    min_amount: float | None = None,
+    max_amount: float | None = None,
+    due_after: datetime | None = None,
+    due_before: datetime | None = None,
+    buyer: str | None = None,
+    sort: Literal["created_at", "risk_score", "amount", "due_at"] = "created_at",
+    order: Literal["asc", "desc"] | None = None,
+    fields: str | None = None,
+    include_total: bool = False
+):
+    sort_keys = invoice_sort_keys(sort, order)
+    query = invoices_query(min_risk, max_risk, min_amount, max_amount, due_after, due_before, buyer, sort)
+
+    page_size = min(limit or INVOICES_PAGE_SIZE, MAX_INVOICES_PAGE_SIZE)
+    invoices, next_cursor = await fetch_page(
+        invoices_collection, query, sort_keys, page_size, cursor, build_projection(fields, INVOICE_LIST_EXCLUDED_FIELDS, sort_keys)
+    )
+    for inv in invoices:
         inv["_id"] = str(inv["_id"])
-        invoices.append(inv)
-    return {"invoices": invoices}
-
-@app.post("/api/invoices_funded")
-async def save_invoices_funded(data: InvoicesFunded):
-    await invoices_funded_collection.delete_many({})  # single investor for now
-
-    await invoices_funded_collection.insert_one({
-        "total_ivested": data.total_ivested,
-        "active_investments": data.active_investments,
-        "returns": data.returns,
-        "available_balance": data.available_balance,
-        "status": data.status,
-        "updated_at": datetime.utcnow()
-    })
 
-    return {"success": True}
+    response = {"invoices": invoices, "next_cursor": next_cursor}
+    if include_total:
+        response["total"] = (
+            await invoices_collection.count_documents(query) if query
+            else await invoices_collection.estimated_document_count()
+        )
+    return response
+
+# ================= MERKLE ANCHORING =================
+# Records are committed on-chain in batches: the anchor worker collects pending
+# documents over a size/time window, builds a Merkle tree of their canonical
+# hashes and submits only the root with commitRoot. Every document keeps its
+# leaf and inclusion proof, so proving membership is a few hashes, not an RPC.
+# Leaves and nodes are domain-separated sha256; sibling pairs are sorted
+# before hashing, so proofs are plain lists of sibling hashes.
+# Batch lifecycle: pending -> submitted -> anchored (back to pending if the
+# transaction never lands)
+ANCHOR_BATCH_SIZE = int(os.getenv("ANCHOR_BATCH_SIZE", 256))
+ANCHOR_INTERVAL_SECONDS = float(os.getenv("ANCHOR_INTERVAL_SECONDS", 60))
+ANCHOR_RECEIPT_TIMEOUT = int(os.getenv("ANCHOR_RECEIPT_TIMEOUT", 300))
+ANCHOR_GAS = int(os.getenv("ANCHOR_GAS", 120000))
+
+def merkle_leaf(data: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + data).digest()
+
+def merkle_parent(a: bytes, b: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + min(a, b) + max(a, b)).digest()
+
+def build_merkle_tree(leaves: list[bytes]) -> tuple[bytes, list[list[bytes]]]:
+    """Root and one inclusion proof per leaf. An unpaired node is promoted to the next level."""
+    proofs: list[list[bytes]] = [[] for _ in leaves]
+    positions = list(range(len(leaves)))  # index of each leaf's ancestor in the current level
+    level = list(leaves)
+    while len(level) > 1:
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append(level[sibling])
+        level = [
+            merkle_parent(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        positions = [position // 2 for position in positions]
+    return level[0], proofs
+
+def verify_merkle_proof(leaf: bytes, proof: list[bytes], root: bytes) -> bool:
+    node = leaf
+    for sibling in proof:
+        node = merkle_parent(node, sibling)
+    return node == root
+
+def canonical_invoice_bytes(invoice: dict) -> bytes:
+    return json.dumps({
+        "invoice_id": str(invoice["_id"]),
+        "amount": invoice["amount"],
+        "buyer": invoice["buyer"],
+        "due_date": invoice["due_date"],
+        "description": invoice["description"],
+        "risk_score": invoice["risk_score"],
+        "created_at": invoice["created_at"].isoformat()
+    }, sort_keys=True, separators=(",", ":")).encode()
+
+def canonical_product_bytes(product: dict) -> bytes:
+    return json.dumps({
+        "product_id": str(product["_id"]),
+        "serial_number": product["serial_number"],
+        "batch_id": product["batch_id"],
+        "ipfs_cid": product["ipfs_cid"],
+        "metadata_hash": product["metadata_hash"]
+    }, sort_keys=True, separators=(",", ":")).encode()
+
+def anchoring_configured() -> bool:
+    return PRIVATE_KEY != "your-private-key-here" and PRODUCT_NFT_ADDRESS != "0xYourProductNFTAddress"
+
+def anchor_fields(batch_id: str, root: bytes, leaf: bytes, index: int, proof: list[bytes]) -> dict:
+    """Per-document anchoring state; plain strings so list views serialise it as-is"""
+    return {
+        "anchor_status": "batched",
+        "anchor_batch_id": batch_id,
+        "anchor_root": root.hex(),
+        "anchor_leaf": leaf.hex(),
+        "anchor_leaf_index": index,
+        "anchor_proof": [node.hex() for node in proof]
+    }
 
-@app.get("/api/invoices_funded")
-async def get_invoices_funded():
-    record = await invoices_funded_collection.find_one()
-    if not record:
+class MerkleAnchor:
+    """Batches pending documents of one collection into on-chain Merkle roots"""
+
+    def __init__(self, kind: str, collection, canonical_bytes, backfill: bool = False):
+        self.kind = kind
+        self.collection = collection
+        self.canonical_bytes = canonical_bytes
+        # Queue documents stored before anchoring existed (invoices: all of them)
+        self.backfill = backfill
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.receipt_tasks: set[asyncio.Task] = set()
+
+    def leaf(self, doc: dict) -> bytes:
+        return merkle_leaf(self.canonical_bytes(doc))
+
+    async def create_batch(self) -> bool:
+        """Seal the next batch if the size or time window is reached"""
+        pending = await self.collection.find({"anchor_status": "pending"}).sort(
+            [("created_at", ASCENDING), ("_id", ASCENDING)]
+        ).limit(ANCHOR_BATCH_SIZE).to_list(length=ANCHOR_BATCH_SIZE)
+        if not pending:
+            return False
+        window_open = pending[0]["created_at"] > datetime.utcnow() - timedelta(seconds=ANCHOR_INTERVAL_SECONDS)
+        if len(pending) < ANCHOR_BATCH_SIZE and window_open:
+            return False
+
+        leaves = [self.leaf(doc) for doc in pending]
+        root, proofs = build_merkle_tree(leaves)
+        batch_id = ObjectId()
+        await merkle_batches_collection.insert_one({
+            "_id": batch_id,
+            "kind": self.kind,
+            "root": root.hex(),
+            "leaf_count": len(leaves),
+            "status": "pending",
+            "created_at": datetime.utcnow()
+        })
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": doc["_id"], "anchor_status": "pending"},
+                {"$set": anchor_fields(str(batch_id), root, leaf, index, proof)}
+            )
+            for index, (doc, leaf, proof) in enumerate(zip(pending, leaves, proofs))
+        ], ordered=False)
+        return len(pending) == ANCHOR_BATCH_SIZE
+
+    async def is_root_committed(self, root: bytes) -> bool:
+        return await is_anchor_root_committed(root.hex())
+
+    async def mark_anchored(self, batch: dict, receipt):
+        anchored_at = datetime.utcnow()
+        await merkle_batches_collection.update_one(
+            {"_id": batch["_id"]},
+            {"$set": {"status": "anchored", "block_number": receipt["blockNumber"] if receipt else None, "anchored_at": anchored_at}}
+        )
+        await self.collection.update_many(
+            {"anchor_batch_id": str(batch["_id"])},
+            {"$set": {"anchor_status": "anchored"}}
+        )
+        print(f"Anchored {self.kind} batch {batch['_id']} ({batch['leaf_count']} leaves)")
+
+    async def track_receipt(self, batch: dict, tx_hash: str):
+        root = bytes.fromhex(batch["root"])
+        receipt = None
+        try:
+            receipt = await w3.eth.wait_for_transaction_receipt(tx_hash, timeout=ANCHOR_RECEIPT_TIMEOUT)
+        except Exception as e:
+            print(f"Anchor transaction {tx_hash} not confirmed: {e}")
+
+        try:
+            if receipt and receipt["status"] == 1:
+                await self.mark_anchored(batch, receipt)
+            elif await self.is_root_committed(root):
+                # Reverted or replaced, but the root is on-chain already
+                await self.mark_anchored(batch, None)
+            else:
+                # Never landed: resubmit with a fresh nonce on the next pass
+                await get_nonce_manager().resync()
+                await merkle_batches_collection.update_one(
+                    {"_id": batch["_id"]},
+                    {"$set": {"status": "pending"}, "$unset": {"tx_hash": ""}}
+                )
+                self.wakeup.set()
+        except Exception as e:
+            print(f"Anchor receipt handling failed for batch {batch['_id']}: {e}")
+
+    def start_receipt_tracking(self, batch: dict, tx_hash: str):
+        task = asyncio.create_task(self.track_receipt(batch, tx_hash))
+        self.receipt_tasks.add(task)
+        task.add_done_callback(self.receipt_tasks.discard)
+
+    async def submit_pending_batches(self):
+        if not anchoring_configured():
+            # Proofs still verify against the stored root; submission waits for a configured chain
+            return
+        if not await w3.is_connected():
+            return
+
+        async for batch in merkle_batches_collection.find({"kind": self.kind, "status": "pending"}).sort("created_at", ASCENDING):
+            function_call = get_product_contract().functions.commitRoot(bytes.fromhex(batch["root"]), batch["leaf_count"])
+            try:
+                tx_hash, _ = await send_signed_transaction(function_call, ANCHOR_GAS)
+            except Exception as e:
+                print(f"Anchor submission failed for batch {batch['_id']}: {e}")
+                return
+            await merkle_batches_collection.update_one(
+                {"_id": batch["_id"]},
+                {"$set": {"status": "submitted", "tx_hash": tx_hash, "submitted_at": datetime.utcnow()}}
+            )
+            self.start_receipt_tracking(batch, tx_hash)
+
+    async def resume_submitted(self):
+        async for batch in merkle_batches_collection.find({"kind": self.kind, "status": "submitted"}):
+            self.start_receipt_tracking(batch, batch["tx_hash"])
+
+    async def run(self):
+        try:
+            if self.backfill:
+                await self.collection.update_many({"anchor_status": {"$exists": False}}, {"$set": {"anchor_status": "pending"}})
+            # Batch IDs were first stored as ObjectIds, which list views can't serialise
+            await self.collection.update_many(
+                {"anchor_batch_id": {"$type": "objectId"}},
+                [{"$set": {"anchor_batch_id": {"$toString": "$anchor_batch_id"}}}]
+            )
+            await self.resume_submitted()
+        except Exception as e:
+            print(f"Anchor worker ({self.kind}) could not resume: {e}")
+
+        while True:
+            full = False
+            try:
+                full = await self.create_batch()
+                await self.submit_pending_batches()
+            except Exception as e:
+                print(f"Anchor worker ({self.kind}) error: {e}")
+
+            # A full batch means more may be waiting; otherwise wait for new
+            # documents or for the time window of the oldest one to close
+            if not full:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=ANCHOR_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            self.wakeup.clear()
+
+    async def proof(self, doc: dict) -> dict:
+        if doc.get("anchor_status", "pending") == "pending":
+            return {"status": "pending", "proof": None}
+
+        batch = await merkle_batches_collection.find_one({"_id": ObjectId(doc["anchor_batch_id"])})
+        leaf = self.leaf(doc)
+        proof = [bytes.fromhex(node) for node in doc["anchor_proof"]]
+        root = bytes.fromhex(doc["anchor_root"])
         return {
-            "total_ivested": 0,
-            "active_investments": 0,
-            "returns": 0,
-            "available_balance": 10,
-            "status": "idle"
+            "status": doc["anchor_status"],
+            "leaf": leaf.hex(),
+            "leaf_index": doc["anchor_leaf_index"],
+            "proof": doc["anchor_proof"],
+            "root": doc["anchor_root"],
+            "batch_id": doc["anchor_batch_id"],
+            "leaf_count": batch["leaf_count"] if batch else None,
+            "tx_hash": batch.get("tx_hash") if batch else None,
+            "block_number": batch.get("block_number") if batch else None,
+            "contract_address": PRODUCT_NFT_ADDRESS,
+            # Recomputed from the current document, so any edit since batching fails here
+            "valid": leaf.hex() == doc["anchor_leaf"] and verify_merkle_proof(leaf, proof, root)
         }
 
-    record["_id"] = str(record["_id"])
-    return record
+invoice_anchor = MerkleAnchor("invoice", invoices_collection, canonical_invoice_bytes, backfill=True)
+product_anchor = MerkleAnchor("product", products_collection, canonical_product_bytes)
+MERKLE_ANCHORS = [invoice_anchor, product_anchor]
+
+@app.on_event("startup")
+async def start_merkle_anchors():
+    for anchor in MERKLE_ANCHORS:
+        anchor.task = asyncio.create_task(anchor.run())
+
+@app.on_event("shutdown")
+async def stop_merkle_anchors():
+    for anchor in MERKLE_ANCHORS:
+        if anchor.task:
+            anchor.task.cancel()
+
+@app.get("/api/invoices/{invoice_id}/proof")
+async def get_invoice_proof(invoice_id: str):
+    try:
+        oid = ObjectId(invoice_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid invoice ID")
+    invoice = await invoices_collection.find_one({"_id": oid})
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    return {"invoice_id": invoice_id, **await invoice_anchor.proof(invoice)}
+
+@app.get("/api/products/{product_id}/proof")
+async def get_product_proof(product_id: str):
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    product = await products_collection.find_one({"_id": ObjectId(product_id)}, {"tracking_history": 0})
+    if not product or product.get("commit_mode") != "anchored":
+        raise HTTPException(status_code=404, detail="Anchored product not found")
+    return {"product_id": product_id, **await product_anchor.proof(product)}
+
+# ================= PORTFOLIOS =================
+# One portfolio document per investor in invoices_funded, keyed on the JWT
+# subject. Each funding is its own record in invoice_fundings; the portfolio
+# only holds running totals, updated with $inc as fundings are created and
+# settled. Fundings are settled when the invoice owner records the buyer's
+# repayment, pro rata to the amounts funded. Balance and returns are derived
+# from those totals on read.
+INVESTOR_STARTING_BALANCE = float(os.getenv("INVESTOR_STARTING_BALANCE", 10))
+FUNDINGS_PAGE_SIZE = int(os.getenv("FUNDINGS_PAGE_SIZE", 100))
+
+def portfolio_view(portfolio: dict | None) -> dict:
+    portfolio = portfolio or {}
+    total_invested = portfolio.get("total_invested", 0)
+    settled_principal = portfolio.get("settled_principal", 0)
+    total_repaid = portfolio.get("total_repaid", 0)
+    active_investments = portfolio.get("active_investments", 0)
+    return {
+        "investor_id": portfolio.get("_id", ANONYMOUS_INVESTOR),
+        "total_ivested": total_invested,
+        "active_investments": active_investments,
+        # Realised return on settled fundings, as a percentage
+        "returns": round((total_repaid - settled_principal) / settled_principal * 100, 2) if settled_principal else 0,
+        "available_balance": INVESTOR_STARTING_BALANCE - total_invested + total_repaid,
+        "status": "active" if active_investments else ("settled" if settled_principal else "idle"),
+        "updated_at": portfolio.get("updated_at")
+    }
+
+async def get_invoice_or_404(invoice_id: str) -> dict:
+    try:
+        oid = ObjectId(invoice_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid invoice ID")
+    invoice = await invoices_collection.find_one({"_id": oid}, {"amount": 1, "owner_id": 1, "repaid_at": 1})
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    return invoice
+
+def funding_payouts(fundings: list[dict], repaid_amount: float) -> list[float]:
+    """Split an invoice's repayment across its fundings in proportion to the amounts funded"""
+    total_funded = sum(funding["amount"] for funding in fundings)
+    if not total_funded:
+        return [0.0] * len(fundings)
+    return [repaid_amount * funding["amount"] / total_funded for funding in fundings]
+
+async def settle_invoice_fundings(invoice_id: str, repaid_amount: float) -> int:
+    """Settle every active funding of a repaid invoice; payouts come from the recorded repayment only"""
+    fundings = await invoice_fundings_collection.find({"invoice_id": invoice_id, "status": "active"}).to_list(length=None)
+    now = datetime.utcnow()
+    settled = 0
+    for funding, payout in zip(fundings, funding_payouts(fundings, repaid_amount)):
+        # The status guard makes settlement idempotent: only one caller moves it out of active
+        result = await invoice_fundings_collection.update_one(
+            {"_id": funding["_id"], "status": "active"},
+            {"$set": {"status": "settled", "payout": payout, "settled_at": now}}
+        )
+        if not result.modified_count:
+            continue
+        await invoices_funded_collection.update_one(
+            {"_id": funding["investor_id"]},
+            {
+                "$inc": {"active_investments": -1, "settled_principal": funding["amount"], "total_repaid": payout},
+                "$set": {"updated_at": now}
+            },
+            upsert=True
+        )
+        settled += 1
+    return settled
+
+@app.post("/api/invoices/{invoice_id}/fund")
+async def fund_invoice(invoice_id: str, funding: InvoiceFundingCreate, investor_id: str = Depends(require_investor_id)):
+    invoice = await get_invoice_or_404(invoice_id)
+    if invoice.get("repaid_at"):
+        raise HTTPException(status_code=409, detail="Invoice has already been repaid")
+
+    now = datetime.utcnow()
+    result = await invoice_fundings_collection.insert_one({
+        "investor_id": investor_id,
+        "invoice_id": invoice_id,
+        "amount": funding.amount,
+        "tx_hash": funding.tx_hash,
+        "status": "active",
+        "funded_at": now
+    })
+    portfolio = await invoices_funded_collection.find_one_and_update(
+        {"_id": investor_id},
+        {"$inc": {"total_invested": funding.amount, "active_investments": 1}, "$set": {"updated_at": now}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+    return {"success": True, "funding_id": str(result.inserted_id), "portfolio": portfolio_view(portfolio)}
+
+@app.post("/api/invoices/{invoice_id}/repay")
+async def repay_invoice(invoice_id: str, repayment: InvoiceRepayment, owner_id: str = Depends(require_investor_id)):
+    """Record the buyer's repayment of an invoice and settle its fundings; only the invoice owner can do this"""
+    invoice = await get_invoice_or_404(invoice_id)
+    if invoice.get("owner_id") != owner_id:
+        raise HTTPException(status_code=403, detail="Only the invoice owner can record its repayment")
+
+    # Recorded once; fundings are settled from this amount, never from investor input
+    result = await invoices_collection.update_one(
+        {"_id": invoice["_id"], "repaid_at": {"$exists": False}},
+        {"$set": {"repaid_amount": repayment.amount, "repaid_at": datetime.utcnow()}}
+    )
+    if not result.modified_count:
+        raise HTTPException(status_code=409, detail="Invoice has already been repaid")
+
+    settled = await settle_invoice_fundings(invoice_id, repayment.amount)
+    return {"success": True, "invoice_id": invoice_id, "repaid_amount": repayment.amount, "settled_fundings": settled}
+
+@app.get("/api/invoices_funded")
+async def get_invoices_funded(investor_id: str = Depends(get_investor_id)):
+    portfolio = await invoices_funded_collection.find_one({"_id": investor_id})
+    view = portfolio_view(portfolio)
+    view["investor_id"] = investor_id
+    return view
+
+@app.get("/api/invoice_fundings")
+async def get_invoice_fundings(
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=1000),
+    funding_status: Literal["active", "settled"] | None = Query(None, alias="status"),
+    investor_id: str = Depends(get_investor_id)
+):
+    query = {"investor_id": investor_id}
+    if funding_status:
+        query["status"] = funding_status
+    sort = [("funded_at", DESCENDING), ("_id", DESCENDING)]
+    fundings, next_cursor = await fetch_page(invoice_fundings_collection, query, sort, limit or FUNDINGS_PAGE_SIZE, cursor)
+    for funding in fundings:
+        funding["_id"] = str(funding["_id"])
+    return {"fundings": fundings, "next_cursor": next_cursor}
+
+# ================= SUPPLY CHAIN STATS =================
+# Dashboard metrics are maintained incrementally in stats_rollups as tracking
+# events are ingested: one document per UTC day, per ISO week and one all-time
+# document. Distinct counts (products handled, locations) are tracked with
+# marker documents in stats_rollup_members, so each value is counted once per
+# period. Dashboard reads fetch a handful of rollup documents by _id.
+STATS_MEMBER_RETENTION_DAYS = 15
+
+def rollup_periods(timestamp: datetime) -> dict[str, str]:
+    return {
+        "day": f"day:{timestamp:%Y-%m-%d}",
+        "week": f"week:{timestamp:%G-W%V}",
+        "all": "all"
+    }
+
+def rollup_contributions(event: dict) -> tuple[dict, list[tuple[str, str]]]:
+    """Counter increments and distinct (kind, value) memberships for one event."""
+    counters = {}
+    distinct = []
+    action, role = event["action"], event["role"]
+
+    if action == "shipped":
+        counters["shipments"] = 1
+    if action == "received" and event.get("transit_seconds") is not None:
+        counters["transit_seconds"] = event["transit_seconds"]
+        counters["transit_count"] = 1
+
+    if role == "Distributor":
+        distinct.append(("distributor_products", event["product_id"]))
+        distinct.append(("distributor_locations", event["location"]))
+    elif role == "Retailer":
+        if action == "received":
+            counters["retailer_received"] = 1
+        elif action == "sold":
+            counters["retailer_sold"] = 1
+        distinct.append(("retailer_locations", event["location"]))
+
+    return counters, distinct
+
+async def insert_new_members(members: dict[str, dict]) -> set[str]:
+    """Insert distinct-count markers and return the IDs that were new."""
+    if not members:
+        return set()
+    docs = [{"_id": member_id, **fields} for member_id, fields in members.items()]
+    try:
+        await stats_rollup_members_collection.insert_many(docs, ordered=False)
+        return set(members)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != 11000 for error in errors):
+            raise
+        return set(members) - {docs[error["index"]]["_id"] for error in errors}
+
+async def record_tracking_rollups(events: list[dict]):
+    try:
+        increments: dict[str, dict] = {}
+        members: dict[str, dict] = {}
+        member_targets: dict[str, tuple[str, str]] = {}
+
+        def add(period: str, field: str, value):
+            increments.setdefault(period, {})
+            increments[period][field] = increments[period].get(field, 0) + value
+
+        for event in events:
+            counters, distinct = rollup_contributions(event)
+            periods = rollup_periods(event["timestamp"])
+            for period in periods.values():
+                for field, value in counters.items():
+                    add(period, field, value)
+
+            for kind, value in distinct:
+                week_marker = f"{periods['week']}|{kind}|{value}"
+                members[week_marker] = {"expires_at": event["timestamp"] + timedelta(days=STATS_MEMBER_RETENTION_DAYS)}
+                member_targets[week_marker] = (periods["week"], kind)
+
+                # First sighting ever also counts as "new" in the event's week
+                all_marker = f"all|{kind}|{value}"
+                members[all_marker] = {}
+                member_targets[all_marker] = ("all", kind)
+                member_targets[f"{all_marker}|new"] = (periods["week"], f"new_{kind}")
+
+        for member_id in await insert_new_members(members):
+            period, kind = member_targets[member_id]
+            add(period, kind, 1)
+            if period == "all":
+                add(*member_targets[f"{member_id}|new"], 1)
+
+        if increments:
+            now = datetime.utcnow()
+            await stats_rollups_collection.bulk_write([
+                UpdateOne({"_id": period}, {"$inc": fields, "$set": {"updated_at": now}}, upsert=True)
+                for period, fields in increments.items()
+            ], ordered=False)
+    except Exception as e:
+        # Stats are best-effort and must never fail event ingestion
+        print(f"Stats rollup update failed: {e}")
+
+async def load_rollups(now: datetime) -> dict[str, dict]:
+    current = rollup_periods(now)
+    previous = rollup_periods(now - timedelta(days=1))
+    previous_week = rollup_periods(now - timedelta(days=7))
+    keys = {
+        "all": "all",
+        "today": current["day"],
+        "yesterday": previous["day"],
+        "week": current["week"],
+        "last_week": previous_week["week"]
+    }
+
+    docs = {}
+    async for doc in stats_rollups_collection.find({"_id": {"$in": list(keys.values())}}):
+        docs[doc["_id"]] = doc
+    return {name: docs.get(key, {}) for name, key in keys.items()}
+
+def format_change(current: float, previous: float) -> str:
+    if not previous:
+        return "+100%" if current else "+0%"
+    return f"{round((current - previous) / previous * 100):+d}%"
+
+def format_count(value: int) -> str:
+    if value >= 1_000_000:
+        return f"{value / 1_000_000:.1f}M"
+    if value >= 1_000:
+        return f"{value / 1_000:.1f}K"
+    return str(value)
+
+def average_transit_days(rollup: dict) -> float | None:
+    if not rollup.get("transit_count"):
+        return None
+    return rollup["transit_seconds"] / rollup["transit_count"] / 86400
 
 @app.get("/api/distributor_stats")
 async def get_distributor_stats():
-    # Calculate stats based on products
-    products = await products_collection.count_documents({})
-    # For demo, return some calculated values
+    rollups = await load_rollups(datetime.utcnow())
+    total, week, last_week = rollups["all"], rollups["week"], rollups["last_week"]
+
+    avg_transit = average_transit_days(total)
+    week_transit = average_transit_days(week)
+    last_week_transit = average_transit_days(last_week)
+
     return {
-        "shipments": products,
-        "products_handled": products,
-        "avg_transit_time": "2.3 days",
-        "locations": 12,
-        "shipments_change": "+15%",
-        "products_handled_change": "+22%",
-        "avg_transit_time_change": "-8%",
-        "locations_change": "+2"
+        "shipments": total.get("shipments", 0),
+        "products_handled": total.get("distributor_products", 0),
+        "avg_transit_time": f"{avg_transit:.1f} days" if avg_transit is not None else "N/A",
+        "locations": total.get("distributor_locations", 0),
+        "shipments_change": format_change(week.get("shipments", 0), last_week.get("shipments", 0)),
+        "products_handled_change": format_change(week.get("distributor_products", 0), last_week.get("distributor_products", 0)),
+        "avg_transit_time_change": format_change(week_transit or 0, last_week_transit or 0),
+        "locations_change": f"+{week.get('new_distributor_locations', 0)}"
     }
 
 @app.get("/api/retailer_stats")
 async def get_retailer_stats():
-    # Calculate stats based on products
-    products = await products_collection.count_documents({})
-    # For demo, return some calculated values
+    rollups = await load_rollups(datetime.utcnow())
+    total, week, last_week = rollups["all"], rollups["week"], rollups["last_week"]
+
+    in_stock = max(0, total.get("retailer_received", 0) - total.get("retailer_sold", 0))
+    week_net = week.get("retailer_received", 0) - week.get("retailer_sold", 0)
+
+    return {
+        "in_stock": in_stock,
+        "sold_today": rollups["today"].get("retailer_sold", 0),
+        "store_locations": total.get("retailer_locations", 0),
+        # Each recorded sale is counted as one customer
+        "customers": format_count(total.get("retailer_sold", 0)),
+        "in_stock_change": format_change(in_stock, max(0, in_stock - week_net)),
+        "sold_today_change": format_change(rollups["today"].get("retailer_sold", 0), rollups["yesterday"].get("retailer_sold", 0)),
+        "store_locations_change": f"+{week.get('new_retailer_locations', 0)}",
+        "customers_change": format_change(week.get("retailer_sold", 0), last_week.get("retailer_sold", 0))
+    }
+
+
+# ================= ANALYTICS =================
+# Materialised views for dashboard analytics. A scheduled job runs aggregation
+# pipelines over the raw collections and $merges the results into summary
+# collections; GET /api/analytics/* only ever read those summaries.
+# Refreshes are incremental: each view keeps a watermark in analytics_meta and
+# only the buckets at or after it are recomputed.
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", 300))
+
+analytics_refresh_lock = asyncio.Lock()
+analytics_refresh_task: asyncio.Task | None = None
+
+def hour_start(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+async def refresh_invoice_risk(since: datetime | None):
+    # Daily buckets, so recompute whole days from the watermark's day
+    match = {"created_at": {"$gte": day_start(since)}} if since else {}
+    await invoices_collection.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                "bucket": {"$switch": {
+                    "branches": [
+                        {"case": {"$lt": ["$risk_score", 40]}, "then": "low"},
+                        {"case": {"$lt": ["$risk_score", 70]}, "then": "medium"}
+                    ],
+                    "default": "high"
+                }}
+            },
+            "invoices": {"$sum": 1},
+            "total_amount": {"$sum": "$amount"},
+            "avg_risk_score": {"$avg": "$risk_score"}
+        }},
+        {"$merge": {"into": analytics_invoice_risk_collection.name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]).to_list(length=None)
+
+async def refresh_events_hourly(since: datetime | None):
+    match = {"timestamp": {"$gte": hour_start(since)}} if since else {}
+    await tracking_events_collection.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "hour": {"$dateToString": {"format": "%Y-%m-%dT%H:00", "date": "$timestamp"}},
+                "action": "$action"
+            },
+            "events": {"$sum": 1},
+            "products": {"$addToSet": "$product_id"}
+        }},
+        {"$project": {"events": 1, "products": {"$size": "$products"}}},
+        {"$merge": {"into": analytics_events_hourly_collection.name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]).to_list(length=None)
+
+async def refresh_products_per_batch(since: datetime | None):
+    match = {}
+    if since:
+        # Only batches that received or minted products since the watermark's
+        # hour change; the overlap catches products written during the last run
+        since = hour_start(since)
+        batch_ids = await products_collection.distinct(
+            "batch_id", {"$or": [{"created_at": {"$gte": since}}, {"minted_at": {"$gte": since}}]}
+        )
+        if not batch_ids:
+            return
+        match = {"batch_id": {"$in": batch_ids}}
+
+    await products_collection.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$batch_id",
+            "product_count": {"$sum": 1},
+            "minted_count": {"$sum": {"$cond": [{"$eq": ["$mint_status", "minted"]}, 1, 0]}},
+            "first_created_at": {"$min": "$created_at"},
+            "last_created_at": {"$max": "$created_at"}
+        }},
+        {"$merge": {"into": analytics_products_per_batch_collection.name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]).to_list(length=None)
+
+ANALYTICS_VIEWS = {
+    "invoice_risk": refresh_invoice_risk,
+    "events_hourly": refresh_events_hourly,
+    "products_per_batch": refresh_products_per_batch,
+}
+
+async def refresh_analytics(views: list[str] | None = None, full: bool = False) -> dict:
+    async with analytics_refresh_lock:
+        results = {}
+        for view in views or list(ANALYTICS_VIEWS):
+            try:
+                meta = await analytics_meta_collection.find_one({"_id": view}) or {}
+                since = None if full else meta.get("watermark")
+                started = datetime.utcnow()
+                await ANALYTICS_VIEWS[view](since)
+
+                # Documents written during the run are picked up next time, since
+                # the next run starts from the bucket containing this watermark
+                duration_ms = int((datetime.utcnow() - started).total_seconds() * 1000)
+                await analytics_meta_collection.update_one(
+                    {"_id": view},
+                    {"$set": {"watermark": started, "refreshed_at": datetime.utcnow(), "duration_ms": duration_ms, "full": since is None}},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Analytics refresh of {view} failed: {e}")
+                results[view] = {"success": False, "error": str(e)}
+                continue
+            results[view] = {"success": True, "duration_ms": duration_ms, "incremental": since is not None}
+        return results
+
+async def analytics_scheduler():
+    while True:
+        try:
+            await refresh_analytics()
+        except Exception as e:
+            print(f"Analytics scheduler error: {e}")
+        await asyncio.sleep(ANALYTICS_REFRESH_SECONDS)
+
+@app.on_event("startup")
+async def start_analytics_scheduler():
+    global analytics_refresh_task
+    analytics_refresh_task = asyncio.create_task(analytics_scheduler())
+
+@app.on_event("shutdown")
+async def stop_analytics_scheduler():
+    if analytics_refresh_task:
+        analytics_refresh_task.cancel()
+
+async def analytics_freshness(view: str) -> dict:
+    meta = await analytics_meta_collection.find_one({"_id": view}) or {}
+    refreshed_at = meta.get("refreshed_at")
+    return {
+        "refreshed_at": refreshed_at,
+        "watermark": meta.get("watermark"),
+        "age_seconds": int((datetime.utcnow() - refreshed_at).total_seconds()) if refreshed_at else None,
+        "refresh_interval_seconds": ANALYTICS_REFRESH_SECONDS
+    }
+
+@app.get("/api/analytics/invoice_risk")
+async def get_invoice_risk_analytics(days: int = Query(30, ge=1, le=366)):
+    start_day = f"{datetime.utcnow() - timedelta(days=days - 1):%Y-%m-%d}"
+    distribution = {"low": 0, "medium": 0, "high": 0}
+    daily = {}
+    async for doc in analytics_invoice_risk_collection.find({"_id.day": {"$gte": start_day}}):
+        day, bucket = doc["_id"]["day"], doc["_id"]["bucket"]
+        distribution[bucket] += doc["invoices"]
+        daily.setdefault(day, {"day": day, "low": 0, "medium": 0, "high": 0, "total_amount": 0})
+        daily[day][bucket] += doc["invoices"]
+        daily[day]["total_amount"] += doc["total_amount"]
+
+    return {
+        "distribution": distribution,
+        "daily": [daily[day] for day in sorted(daily)],
+        "freshness": await analytics_freshness("invoice_risk")
+    }
+
+@app.get("/api/analytics/events_per_day")
+async def get_events_per_day_analytics(
+    days: int = Query(30, ge=1, le=366),
+    action: str | None = None,
+    granularity: Literal["day", "hour"] = "day"
+):
+    query = {"_id.hour": {"$gte": f"{datetime.utcnow() - timedelta(days=days - 1):%Y-%m-%d}"}}
+    if action:
+        query["_id.action"] = action
+
+    buckets = {}
+    async for doc in analytics_events_hourly_collection.find(query):
+        key = doc["_id"]["hour"] if granularity == "hour" else doc["_id"]["hour"][:10]
+        bucket = buckets.setdefault(key, {"period": key, "events": 0, "by_action": {}})
+        bucket["events"] += doc["events"]
+        bucket["by_action"][doc["_id"]["action"]] = bucket["by_action"].get(doc["_id"]["action"], 0) + doc["events"]
+
+    return {
+        "granularity": granularity,
+        "series": [buckets[key] for key in sorted(buckets)],
+        "freshness": await analytics_freshness("events_hourly")
+    }
+
+@app.get("/api/analytics/products_per_batch")
+async def get_products_per_batch_analytics(limit: int = Query(50, ge=1, le=1000)):
+    batches = []
+    async for doc in analytics_products_per_batch_collection.find().sort("product_count", DESCENDING).limit(limit):
+        doc["batch_id"] = doc.pop("_id")
+        batches.append(doc)
+
     return {
-        "in_stock": products,
-        "sold_today": 47,
-        "store_locations": 8,
-        "customers": "1.2K",
-        "in_stock_change": "+5%",
-        "sold_today_change": "+23%",
-        "store_locations_change": "+1",
-        "customers_change": "+18%"
+        "batches": batches,
+        "freshness": await analytics_freshness("products_per_batch")
     }
 
+@app.post("/api/analytics/refresh")
+async def refresh_analytics_now(view: str | None = None, full: bool = False):
+    if view and view not in ANALYTICS_VIEWS:
+        raise HTTPException(status_code=404, detail=f"Unknown analytics view '{view}'")
+    return {"views": await refresh_analytics([view] if view else None, full)}
 
 @app.get("/")
 async def root():
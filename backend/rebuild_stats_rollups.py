@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Migration script for supply chain stats rollups
+Rebuilds stats_rollups and stats_rollup_members from tracking_events, which
+is the source of truth. The API only increments rollups as new events are
+ingested, so events recorded before the rollups existed are missing from them.
+Stop event ingestion while this runs: the rollups are replaced wholesale.
+Run with --dry-run to only report what would be written.
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, InsertOne, MongoClient, UpdateOne
+
+from main import (
+    MONGODB_URL,
+    DATABASE_NAME,
+    STATS_MEMBER_RETENTION_DAYS,
+    rollup_contributions,
+    rollup_periods,
+)
+
+BULK_SIZE = 500
+
+def build_rollups(events_collection):
+    """Replay every tracking event in time order, the way record_tracking_rollups counts them"""
+    increments = {}
+    week_members = {}
+    all_members = set()
+
+    def add(period, field, value):
+        increments.setdefault(period, {})
+        increments[period][field] = increments[period].get(field, 0) + value
+
+    replayed = 0
+    projection = {"product_id": 1, "action": 1, "role": 1, "location": 1, "timestamp": 1, "transit_seconds": 1}
+    for event in events_collection.find({}, projection).sort([("timestamp", ASCENDING), ("_id", ASCENDING)]):
+        counters, distinct = rollup_contributions(event)
+        periods = rollup_periods(event["timestamp"])
+        for period in periods.values():
+            for field, value in counters.items():
+                add(period, field, value)
+
+        for kind, value in distinct:
+            week_marker = f"{periods['week']}|{kind}|{value}"
+            if week_marker not in week_members:
+                add(periods["week"], kind, 1)
+            week_members[week_marker] = event["timestamp"] + timedelta(days=STATS_MEMBER_RETENTION_DAYS)
+
+            # First sighting ever also counts as "new" in the event's week
+            all_marker = f"all|{kind}|{value}"
+            if all_marker not in all_members:
+                all_members.add(all_marker)
+                add("all", kind, 1)
+                add(periods["week"], f"new_{kind}", 1)
+
+        replayed += 1
+        if replayed % 10000 == 0:
+            print(f"Replayed {replayed} events...")
+
+    return replayed, increments, week_members, all_members
+
+def write_in_bulk(collection, operations):
+    for start in range(0, len(operations), BULK_SIZE):
+        collection.bulk_write(operations[start:start + BULK_SIZE], ordered=False)
+
+def rebuild(dry_run=False):
+    """Replace the rollups and distinct-count markers with ones computed from every event"""
+    client = MongoClient(MONGODB_URL)
+    db = client[DATABASE_NAME]
+    rollups = db["stats_rollups"]
+    members = db["stats_rollup_members"]
+
+    replayed, increments, week_members, all_members = build_rollups(db["tracking_events"])
+    # Expired week markers would be removed by the TTL index anyway
+    now = datetime.utcnow()
+    live_week_members = {marker: expires_at for marker, expires_at in week_members.items() if expires_at > now}
+
+    print(f"Events replayed: {replayed}")
+    print(f"Rollup documents: {len(increments)}")
+    print(f"Member markers: {len(live_week_members) + len(all_members)}")
+    if dry_run:
+        return
+
+    rollups.delete_many({})
+    members.delete_many({})
+    write_in_bulk(members, [
+        InsertOne({"_id": marker, "expires_at": expires_at}) for marker, expires_at in live_week_members.items()
+    ] + [InsertOne({"_id": marker}) for marker in all_members])
+    write_in_bulk(rollups, [
+        UpdateOne({"_id": period}, {"$set": {**fields, "updated_at": now}}, upsert=True)
+        for period, fields in increments.items()
+    ])
+
+    print(f"SUCCESS: Rebuilt {len(increments)} rollup documents from {replayed} events")
+
+if __name__ == "__main__":
+    print("Rebuilding supply chain stats rollups")
+    print("=" * 50)
+
+    rebuild(dry_run="--dry-run" in sys.argv)
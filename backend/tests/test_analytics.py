@@ -0,0 +1,25 @@
+import asyncio
+from datetime import datetime
+
+import main
+from main import refresh_products_per_batch
+
+class FakeProducts:
+    def __init__(self):
+        self.filters = []
+
+    async def distinct(self, field, query):
+        self.filters.append(query)
+        return []
+
+def test_products_per_batch_rescans_the_watermark_hour(monkeypatch):
+    products = FakeProducts()
+    monkeypatch.setattr(main, "products_collection", products)
+
+    # A product inserted at 10:14:59, while the last run was still going,
+    # must be picked up by the run that starts from the 10:15:00 watermark
+    asyncio.run(refresh_products_per_batch(datetime(2025, 3, 1, 10, 15)))
+    assert products.filters == [{"$or": [
+        {"created_at": {"$gte": datetime(2025, 3, 1, 10)}},
+        {"minted_at": {"$gte": datetime(2025, 3, 1, 10)}}
+    ]}]
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+import main
+from main import (
+    VerificationFailure,
+    anchor_fields,
+    build_merkle_tree,
+    canonical_invoice_bytes,
+    canonical_product_bytes,
+    check_anchored_authenticity,
+    check_product_authenticity,
+    merkle_leaf,
+    stream_ndjson,
+    verify_merkle_proof,
+)
+
+def make_invoice(i):
+    return {
+        "_id": ObjectId(),
+        "amount": 10 + i,
+        "buyer": f"Buyer {i}",
+        "due_date": "01-02-26",
+        "due_at": datetime(2026, 2, 1),
+        "description": "Quarterly order",
+        "risk_score": 40,
+        "tx_hash": None,
+        "created_at": datetime(2026, 1, 1, 12, 0, i),
+        "anchor_status": "pending"
+    }
+
+def batched_invoices(count):
+    invoices = [make_invoice(i) for i in range(count)]
+    leaves = [merkle_leaf(canonical_invoice_bytes(inv)) for inv in invoices]
+    root, proofs = build_merkle_tree(leaves)
+    batch_id = str(ObjectId())
+    for index, (inv, leaf, proof) in enumerate(zip(invoices, leaves, proofs)):
+        inv.update(anchor_fields(batch_id, root, leaf, index, proof))
+    return invoices, root
+
+def test_batched_invoice_serialises_like_get_invoices():
+    invoices, _ = batched_invoices(5)
+    for inv in invoices:
+        # get_invoices only stringifies _id before returning the documents
+        inv["_id"] = str(inv["_id"])
+        encoded = jsonable_encoder(inv)
+        assert isinstance(encoded["anchor_batch_id"], str)
+
+def test_stored_proofs_verify_against_root():
+    invoices, root = batched_invoices(7)
+    for inv in invoices:
+        leaf = merkle_leaf(canonical_invoice_bytes(inv))
+        proof = [bytes.fromhex(node) for node in inv["anchor_proof"]]
+        assert leaf.hex() == inv["anchor_leaf"]
+        assert verify_merkle_proof(leaf, proof, root)
+
+def test_edited_invoice_fails_proof():
+    invoices, root = batched_invoices(4)
+    tampered = {**invoices[2], "amount": 999}
+    leaf = merkle_leaf(canonical_invoice_bytes(tampered))
+    proof = [bytes.fromhex(node) for node in tampered["anchor_proof"]]
+    assert not verify_merkle_proof(leaf, proof, root)
+
+def anchored_products(count):
+    products = [{
+        "_id": ObjectId(),
+        "product_name": f"Product {i}",
+        "serial_number": f"SN-{i:04d}",
+        "batch_id": "BATCH-1",
+        "ipfs_cid": f"bafy{i:04d}",
+        "metadata_hash": f"{i:064x}",
+        "commit_mode": "anchored",
+        "anchor_status": "pending"
+    } for i in range(count)]
+    leaves = [merkle_leaf(canonical_product_bytes(p)) for p in products]
+    root, proofs = build_merkle_tree(leaves)
+    batch_id = str(ObjectId())
+    for index, (product, leaf, proof) in enumerate(zip(products, leaves, proofs)):
+        product.update(anchor_fields(batch_id, root, leaf, index, proof))
+        product["anchor_status"] = "anchored"
+    return products
+
+def test_anchored_products_stream_as_ndjson():
+    async def cursor():
+        for product in anchored_products(3):
+            yield product
+
+    async def collect():
+        return [line async for line in stream_ndjson(cursor())]
+
+    lines = asyncio.run(collect())
+    assert [json.loads(line)["anchor_status"] for line in lines] == ["anchored"] * 3
+
+def test_anchored_verification_checks_root_on_chain(monkeypatch):
+    product = anchored_products(4)[1]
+    monkeypatch.setattr(main, "anchoring_configured", lambda: True)
+
+    async def not_committed(root):
+        return False
+    monkeypatch.setattr(main, "is_anchor_root_committed", not_committed)
+    # anchor_status says "anchored", but the contract has never seen the root
+    with pytest.raises(VerificationFailure) as failure:
+        asyncio.run(check_anchored_authenticity(product))
+    assert failure.value.status == "pending"
+
+    async def committed(root):
+        return True
+    monkeypatch.setattr(main, "is_anchor_root_committed", committed)
+    assert asyncio.run(check_anchored_authenticity(product))
+
+def test_minted_product_verified_by_id_uses_its_token(monkeypatch):
+    seen = []
+
+    async def fake_fetch(token_id, product, chain_ready=None):
+        seen.append(token_id)
+        return {"ipfsCid": product["ipfs_cid"], "mock": True}
+
+    async def fake_metadata(product, blockchain_product):
+        return blockchain_product["ipfsCid"], {}
+
+    monkeypatch.setattr(main, "fetch_blockchain_product", fake_fetch)
+    monkeypatch.setattr(main, "fetch_ipfs_metadata", fake_metadata)
+    product = {"_id": ObjectId(), "nft_token_id": 42, "ipfs_cid": "bafy42"}
+    assert asyncio.run(check_product_authenticity(None, product))
+    assert seen == [42]
@@ -0,0 +1,34 @@
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from pymongo import DESCENDING
+
+from main import decode_cursor, encode_cursor, keyset_filter
+
+SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+def raw_cursor(values):
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def test_cursor_round_trips_sort_values():
+    values = [datetime(2025, 3, 1, 10, 15), ObjectId()]
+    assert decode_cursor(encode_cursor(values)) == values
+
+@pytest.mark.parametrize("values", [
+    [{"$ne": None}, "x"],
+    [datetime(2025, 3, 1), {"$where": "sleep(1000)"}],
+    [["a"], "x"],
+    {"created_at": 1},
+])
+def test_cursor_with_operator_values_is_rejected(values):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(raw_cursor(values))
+    assert error.value.status_code == 400
+
+def test_cursor_for_another_sort_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        keyset_filter(SORT, decode_cursor(raw_cursor(["only-one-value"])))
+    assert error.value.status_code == 400
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.testclient import TestClient
+
+import main
+from main import app, create_access_token, funding_payouts, require_investor_id
+
+def test_portfolio_writes_need_a_token():
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(require_investor_id(None))
+    assert error.value.status_code == 401
+
+def test_portfolio_writes_use_the_token_subject():
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": "investor@example.com"}))
+    assert asyncio.run(require_investor_id(credentials)) == "investor@example.com"
+
+def test_invalid_token_is_rejected():
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-token")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(require_investor_id(credentials))
+    assert error.value.status_code == 401
+
+def auth_headers(subject):
+    return {"Authorization": f"Bearer {create_access_token({'sub': subject})}"}
+
+def test_investor_cannot_settle_own_funding_with_inflated_payout(monkeypatch):
+    client = TestClient(app)
+    # The investor-driven settle endpoint is gone; payouts can't come from the request body
+    response = client.post(
+        f"/api/invoice_fundings/{ObjectId()}/settle", json={"payout": 1_000_000}, headers=auth_headers("investor@example.com")
+    )
+    assert response.status_code == 404
+
+    async def invoice_owned_by_msme(invoice_id):
+        return {"_id": ObjectId(invoice_id), "amount": 5, "owner_id": "msme@example.com"}
+    monkeypatch.setattr(main, "get_invoice_or_404", invoice_owned_by_msme)
+
+    # Recording the repayment is reserved for the invoice owner
+    response = client.post(
+        f"/api/invoices/{ObjectId()}/repay", json={"amount": 1_000_000}, headers=auth_headers("investor@example.com")
+    )
+    assert response.status_code == 403
+
+def test_payouts_split_the_recorded_repayment():
+    payouts = funding_payouts([{"amount": 1}, {"amount": 3}], 8)
+    assert payouts == [2, 6]
+    assert funding_payouts([], 8) == []
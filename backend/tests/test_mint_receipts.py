@@ -0,0 +1,47 @@
+import asyncio
+
+import main
+from main import wait_for_mint_receipt
+
+class FakeEth:
+    def __init__(self, receipts):
+        self.receipts = receipts
+        self.waits = 0
+
+    async def wait_for_transaction_receipt(self, tx_hash, timeout):
+        self.waits += 1
+        receipt = self.receipts.pop(0)
+        if receipt is None:
+            raise TimeoutError("not mined")
+        return receipt
+
+class FakeNonceManager:
+    def __init__(self, consumed):
+        self.consumed = consumed
+
+    async def is_consumed(self, nonce):
+        return self.consumed
+
+def patch_chain(monkeypatch, receipts, consumed, mined_receipt=None):
+    eth = FakeEth(receipts)
+    monkeypatch.setattr(main.w3, "eth", eth)
+    monkeypatch.setattr(main, "get_nonce_manager", lambda: FakeNonceManager(consumed))
+    monkeypatch.setattr(main, "MINT_RECEIPT_RETRY_INTERVAL", 0)
+
+    async def find_mined_receipt(tx_hash):
+        return mined_receipt
+    monkeypatch.setattr(main, "find_mined_receipt", find_mined_receipt)
+    return eth
+
+def test_pending_mint_keeps_waiting_instead_of_failing(monkeypatch):
+    eth = patch_chain(monkeypatch, [None, None, {"status": 1}], consumed=False)
+    assert asyncio.run(wait_for_mint_receipt("0xabc", 7)) == {"status": 1}
+    assert eth.waits == 3
+
+def test_late_confirmation_is_not_treated_as_replaced(monkeypatch):
+    patch_chain(monkeypatch, [None], consumed=True, mined_receipt={"status": 1})
+    assert asyncio.run(wait_for_mint_receipt("0xabc", 7)) == {"status": 1}
+
+def test_nonce_used_by_another_transaction_means_replaced(monkeypatch):
+    patch_chain(monkeypatch, [None], consumed=True, mined_receipt=None)
+    assert asyncio.run(wait_for_mint_receipt("0xabc", 7)) is None
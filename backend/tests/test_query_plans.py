@@ -0,0 +1,136 @@
+"""
+Checks that the hot login, verify, tracking and invoice listing queries are
+served by the indexes declared in REQUIRED_INDEXES. Each query is run through
+explain() on a scratch database holding only those indexes, and any COLLSCAN
+fails.
+Needs a MongoDB server at MONGODB_URL; skipped when none is reachable.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import PyMongoError
+
+from main import (
+    MONGODB_URL,
+    REQUIRED_INDEXES,
+    invoice_sort_keys,
+    invoices_collection,
+    invoices_query,
+    onchain_products_collection,
+    products_collection,
+    tracking_events_collection,
+    tracking_events_query,
+    users_collection,
+)
+
+PRODUCT_ID = ObjectId()
+
+@pytest.fixture(scope="module")
+def db():
+    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"No MongoDB server at {MONGODB_URL}")
+
+    name = f"verichain_explain_{uuid.uuid4().hex[:8]}"
+    database = client[name]
+    for collection, indexes in REQUIRED_INDEXES:
+        database[collection.name].create_indexes(indexes)
+
+    # A few documents, so plans are chosen over real collections
+    now = datetime.utcnow()
+    database[users_collection.name].insert_one({"email": "user@example.com"})
+    database[products_collection.name].insert_many([
+        {"_id": PRODUCT_ID, "nft_token_id": 1, "serial_number": "SN-1", "batch_id": "B-1", "created_at": now},
+        {"nft_token_id": 2, "serial_number": "SN-2", "batch_id": "B-1", "created_at": now},
+    ])
+    database[onchain_products_collection.name].insert_one({"_id": 1, "block_number": 10})
+    database[tracking_events_collection.name].insert_many([
+        {"product_id": str(PRODUCT_ID), "action": action, "role": "Distributor", "timestamp": now + timedelta(minutes=i)}
+        for i, action in enumerate(["manufactured", "shipped", "received"])
+    ])
+    database[invoices_collection.name].insert_many([
+        {"buyer": f"Buyer {i % 2}", "amount": 1000.0 * (i + 1), "risk_score": 20 * i,
+         "due_at": now + timedelta(days=30 * i), "created_at": now + timedelta(minutes=i)}
+        for i in range(4)
+    ])
+
+    yield database
+    client.drop_database(name)
+    client.close()
+
+def plan_stages(plan) -> list[str]:
+    """Every stage name in an explain plan, however deeply nested"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+def assert_indexed(collection, query: dict, sort: list[tuple[str, int]] | None = None):
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    winning_plan = cursor.explain()["queryPlanner"]["winningPlan"]
+    assert "COLLSCAN" not in plan_stages(winning_plan), f"{collection.name} {query} sort={sort} scans the collection"
+
+def test_login_query_uses_index(db):
+    assert_indexed(db[users_collection.name], {"email": "user@example.com"})
+
+@pytest.mark.parametrize("query", [
+    {"nft_token_id": 1},
+    {"_id": PRODUCT_ID},
+    # /api/verify/batch resolves a whole pallet with one $or query
+    {"$or": [{"nft_token_id": {"$in": [1, 2]}}, {"_id": {"$in": [PRODUCT_ID]}}]},
+])
+def test_verify_product_lookups_use_index(db, query):
+    assert_indexed(db[products_collection.name], query)
+
+def test_verify_onchain_lookup_uses_index(db):
+    assert_indexed(db[onchain_products_collection.name], {"_id": {"$in": [1, 2]}})
+
+def test_supply_chain_history_uses_index(db):
+    events = db[tracking_events_collection.name]
+    assert_indexed(events, {"product_id": str(PRODUCT_ID)}, [("timestamp", ASCENDING)])
+    assert_indexed(events, {"product_id": {"$in": [str(PRODUCT_ID)]}}, [("timestamp", ASCENDING)])
+
+@pytest.mark.parametrize("filters", [
+    {"product_id": str(PRODUCT_ID)},
+    {"product_id": str(PRODUCT_ID), "since": datetime(2026, 1, 1)},
+    {"action": "shipped"},
+    {"role": "Distributor"},
+    {"since": datetime(2026, 1, 1), "until": datetime(2027, 1, 1)},
+    {},
+])
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+def test_tracking_event_pages_use_index(db, filters, direction):
+    query = tracking_events_query(
+        filters.get("product_id"), filters.get("since"), filters.get("until"), filters.get("action"), filters.get("role")
+    )
+    assert_indexed(db[tracking_events_collection.name], query, [("timestamp", direction), ("_id", direction)])
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"buyer": "Buyer 1"},
+    {"min_risk": 20, "max_risk": 60},
+    {"min_amount": 1500.0, "max_amount": 3500.0},
+    {"due_after": datetime(2026, 1, 1), "due_before": datetime(2027, 1, 1)},
+])
+@pytest.mark.parametrize("sort", ["created_at", "risk_score", "amount", "due_at"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_invoice_list_pages_use_index(db, filters, sort, order):
+    query = invoices_query(
+        filters.get("min_risk"), filters.get("max_risk"), filters.get("min_amount"), filters.get("max_amount"),
+        filters.get("due_after"), filters.get("due_before"), filters.get("buyer"), sort
+    )
+    assert_indexed(db[invoices_collection.name], query, invoice_sort_keys(sort, order))
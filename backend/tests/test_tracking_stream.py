@@ -0,0 +1,81 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import main
+from main import stream_tracking_events, tracking_event_hub, watch_tracking_events
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class FakeEvents:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query):
+        return FakeCursor([doc for doc in self.docs if doc["_id"] > query["_id"]["$gt"]])
+
+class FakeRequest:
+    def __init__(self, headers):
+        self.headers = headers
+
+    async def is_disconnected(self):
+        return True
+
+async def collect(response):
+    return [chunk async for chunk in response.body_iterator]
+
+def test_reconnect_past_the_catchup_limit_asks_for_resync(monkeypatch):
+    first = ObjectId()
+    docs = [{"_id": ObjectId(), "product_id": "p1", "action": "shipped"} for _ in range(5)]
+    monkeypatch.setattr(main, "tracking_events_collection", FakeEvents(docs))
+    monkeypatch.setattr(main, "STREAM_CATCHUP_LIMIT", 3)
+
+    response = asyncio.run(stream_tracking_events(FakeRequest({"last-event-id": str(first)})))
+    chunks = asyncio.run(collect(response))
+    assert len(chunks) == 4
+    assert chunks[-1].startswith("event: resync")
+
+def test_reconnect_within_the_limit_replays_everything(monkeypatch):
+    first = ObjectId()
+    docs = [{"_id": ObjectId(), "product_id": "p1", "action": "shipped"} for _ in range(3)]
+    monkeypatch.setattr(main, "tracking_events_collection", FakeEvents(docs))
+    monkeypatch.setattr(main, "STREAM_CATCHUP_LIMIT", 3)
+
+    response = asyncio.run(stream_tracking_events(FakeRequest({"last-event-id": str(first)})))
+    chunks = asyncio.run(collect(response))
+    assert len(chunks) == 3
+    assert not any(chunk.startswith("event: resync") for chunk in chunks)
+
+def test_interrupted_change_stream_without_token_publishes_in_process(monkeypatch):
+    seen = []
+
+    class FlakyEvents:
+        def watch(self, pipeline, resume_after=None):
+            seen.append(tracking_event_hub.change_stream_active)
+            if len(seen) == 1:
+                raise RuntimeError("connection reset")
+            raise OperationFailure("stop")
+
+    monkeypatch.setattr(main, "tracking_events_collection", FlakyEvents())
+    monkeypatch.setattr(tracking_event_hub, "resume_token", None)
+    monkeypatch.setattr(tracking_event_hub, "change_stream_active", True)
+    asyncio.run(watch_tracking_events())
+    # While reconnecting, ingest endpoints had to publish themselves
+    assert seen == [True, False]
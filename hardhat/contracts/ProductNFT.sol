@@ -20,9 +20,26 @@ contract ProductNFT is ERC721, Ownable {
         uint256 createdAt;
     }
 
+    struct ProductInput {
+        string name;
+        string description;
+        string serialNumber;
+        string batchId;
+        string manufacturingDate;
+        string ipfsCid;
+        bytes32 metadataHash;
+    }
+
+    struct RootCommitment {
+        uint256 leafCount;
+        uint256 committedAt;
+    }
+
     mapping(uint256 => Product) public products;
+    mapping(bytes32 => RootCommitment) public merkleRoots;
 
     event ProductMinted(uint256 indexed tokenId, address indexed to, string ipfsCid, bytes32 metadataHash);
+    event RootCommitted(bytes32 indexed root, uint256 leafCount, uint256 committedAt);
 
     constructor() ERC721("VeriTrace Product NFT", "VPNFT") {}
 
@@ -57,6 +74,45 @@ contract ProductNFT is ERC721, Ownable {
         return tokenId;
     }
 
+    function mintBatch(address to, ProductInput[] calldata items) public onlyOwner returns (uint256[] memory tokenIds) {
+        tokenIds = new uint256[](items.length);
+
+        for (uint256 i = 0; i < items.length; i++) {
+            ProductInput calldata item = items[i];
+            uint256 tokenId = _tokenIdCounter.current();
+            _tokenIdCounter.increment();
+
+            _safeMint(to, tokenId);
+
+            products[tokenId] = Product({
+                name: item.name,
+                description: item.description,
+                serialNumber: item.serialNumber,
+                batchId: item.batchId,
+                manufacturingDate: item.manufacturingDate,
+                ipfsCid: item.ipfsCid,
+                metadataHash: item.metadataHash,
+                createdAt: block.timestamp
+            });
+
+            emit ProductMinted(tokenId, to, item.ipfsCid, item.metadataHash);
+
+            tokenIds[i] = tokenId;
+        }
+    }
+
+    function commitRoot(bytes32 root, uint256 leafCount) public onlyOwner {
+        require(leafCount > 0, "Empty batch");
+        require(merkleRoots[root].committedAt == 0, "Root already committed");
+
+        merkleRoots[root] = RootCommitment({
+            leafCount: leafCount,
+            committedAt: block.timestamp
+        });
+
+        emit RootCommitted(root, leafCount, block.timestamp);
+    }
+
     function getProduct(uint256 tokenId) public view returns (Product memory) {
         require(_exists(tokenId), "Product does not exist");
         return products[tokenId];
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import Timeline from './Timeline';
-import { API_ENDPOINTS } from '../lib/api';
+import { API_ENDPOINTS, fetchAllProducts } from '../lib/api';
 
 interface TrackingEvent {
   _id: string;
@@ -35,9 +35,7 @@ const History = () => {
 
   const fetchProducts = async () => {
     try {
-      const res = await fetch(API_ENDPOINTS.products);
-      const data = await res.json();
-      setProducts(data.products || []);
+      setProducts(await fetchAllProducts<Product>());
     } catch (error) {
       console.error('Failed to fetch products', error);
     }
@@ -4,7 +4,7 @@ import { Input } from '@/components/ui/input'
 import { Label } from '@/components/ui/label'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import RiskScoring from './RiskScoring'
-import { API_ENDPOINTS } from '@/lib/api'
+import { API_ENDPOINTS, authHeaders } from '@/lib/api'
 
 const InvoiceCreator = () => {
   const [amount, setAmount] = useState('')
@@ -28,6 +28,7 @@ const InvoiceCreator = () => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...authHeaders(),
         },
         body: JSON.stringify({
           amount: parseFloat(amount),
@@ -4,7 +4,7 @@ import { Input } from '@/components/ui/input'
 import { Label } from '@/components/ui/label'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import RiskScoring from './RiskScoring'
-import { API_ENDPOINTS } from '../lib/api'
+import { API_ENDPOINTS, authHeaders } from '../lib/api'
 
 interface Props {
    setStats?: React.Dispatch<
@@ -25,28 +25,72 @@ interface Invoice {
   risk_score: number
 }
 
+interface Filters {
+  max_risk: string
+  min_amount: string
+  max_amount: string
+  buyer: string
+  sort: 'created_at' | 'risk_score' | 'amount' | 'due_at'
+}
+
+const EMPTY_FILTERS: Filters = { max_risk: '', min_amount: '', max_amount: '', buyer: '', sort: 'created_at' }
+const INVOICE_PAGE_SIZE = 20
+
+// Builds the get_invoices query; empty filters are left out so the backend defaults apply
+const invoicesUrl = (filters: Filters, cursor: string | null) => {
+  const params = new URLSearchParams({ limit: String(INVOICE_PAGE_SIZE), sort: filters.sort, include_total: 'true' })
+  for (const key of ['max_risk', 'min_amount', 'max_amount', 'buyer'] as const) {
+    if (filters[key].trim()) params.set(key, filters[key].trim())
+  }
+  if (cursor) params.set('cursor', cursor)
+  return `${API_ENDPOINTS.getInvoices}?${params}`
+}
+
 const InvoiceFunder = ({ setStats }: Props) => {
   const [invoices, setInvoices] = useState<Invoice[]>([])
   const [fundAmount, setFundAmount] = useState<{ [key: string]: string }>({})
   const [loading, setLoading] = useState(true)
-
+  const [filters, setFilters] = useState<Filters>(EMPTY_FILTERS)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [total, setTotal] = useState<number | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
-    fetchInvoices()
+    fetchInvoices(EMPTY_FILTERS)
   }, [])
 
-  const fetchInvoices = async () => {
+  // Loads the first page for `applied`, or appends the page after `cursor`
+  const fetchInvoices = async (applied: Filters, cursor: string | null = null) => {
     try {
-      const res = await fetch(API_ENDPOINTS.getInvoices)
+      const res = await fetch(invoicesUrl(applied, cursor))
       const data = await res.json()
-      setInvoices(data.invoices)
+      if (!res.ok) {
+        console.error('Error fetching invoices:', data.detail)
+        return
+      }
+      setInvoices((prev) => (cursor ? [...prev, ...data.invoices] : data.invoices))
+      setNextCursor(data.next_cursor)
+      if (!cursor) setTotal(data.total)
     } catch (error) {
       console.error('Error fetching invoices:', error)
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
+  const applyFilters = (e: React.FormEvent) => {
+    e.preventDefault()
+    setLoading(true)
+    fetchInvoices(filters)
+  }
+
+  const loadMore = () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    fetchInvoices(filters, nextCursor)
+  }
+
   const handleFundInvoice = async (invoiceId: string, amount: string) => {
     const ethAmount = parseFloat(amount)
     if (!ethAmount || ethAmount <= 0) return
@@ -55,33 +99,29 @@ const InvoiceFunder = ({ setStats }: Props) => {
     console.log('Mock funding invoice:', { invoiceId, amount: ethAmount })
     alert(`Mock: Successfully funded invoice ${invoiceId} with ${ethAmount} ETH`)
 
-    // 🔥 Update dashboard + persist to backend (only if setStats is provided)
-    if (setStats) {
-      setStats((prev) => {
-        const updatedStats = {
-          totalInvested: prev.totalInvested + ethAmount,
-          activeInvestments: prev.activeInvestments + 1,
-          returns: prev.returns,
-          balance: prev.balance - ethAmount,
-        }
-
-        // Persist to DB
-        fetch(API_ENDPOINTS.invoicesFunded, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-            total_ivested: updatedStats.totalInvested,
-            active_investments: updatedStats.activeInvestments,
-            returns: updatedStats.returns,
-            available_balance: updatedStats.balance,
-            status: 'active',
-          }),
-        }).catch((err) =>
-          console.error('Failed to persist funding data:', err)
-        )
-
-        return updatedStats
+    // 🔥 Record the funding; the backend returns the updated portfolio totals
+    try {
+      const res = await fetch(API_ENDPOINTS.fundInvoice(invoiceId), {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', ...authHeaders() },
+        body: JSON.stringify({ amount: ethAmount }),
       })
+      const data = await res.json()
+
+      if (res.status === 401) {
+        alert('Please log in to fund invoices')
+        return
+      }
+      if (res.ok && setStats) {
+        setStats({
+          totalInvested: data.portfolio.total_ivested,
+          activeInvestments: data.portfolio.active_investments,
+          returns: data.portfolio.returns,
+          balance: data.portfolio.available_balance,
+        })
+      }
+    } catch (err) {
+      console.error('Failed to persist funding data:', err)
     }
 
     setFundAmount((prev) => ({ ...prev, [invoiceId]: '' }))
@@ -101,6 +141,68 @@ const InvoiceFunder = ({ setStats }: Props) => {
         </div>
       )}
 
+      <form onSubmit={applyFilters} className="grid grid-cols-2 md:grid-cols-6 gap-3 items-end">
+        <div>
+          <Label htmlFor="filter-max-risk">Max Risk</Label>
+          <Input
+            id="filter-max-risk"
+            type="number"
+            min={0}
+            max={100}
+            value={filters.max_risk}
+            onChange={(e) => setFilters({ ...filters, max_risk: e.target.value })}
+            placeholder="100"
+          />
+        </div>
+        <div>
+          <Label htmlFor="filter-min-amount">Min Amount</Label>
+          <Input
+            id="filter-min-amount"
+            type="number"
+            value={filters.min_amount}
+            onChange={(e) => setFilters({ ...filters, min_amount: e.target.value })}
+          />
+        </div>
+        <div>
+          <Label htmlFor="filter-max-amount">Max Amount</Label>
+          <Input
+            id="filter-max-amount"
+            type="number"
+            value={filters.max_amount}
+            onChange={(e) => setFilters({ ...filters, max_amount: e.target.value })}
+          />
+        </div>
+        <div>
+          <Label htmlFor="filter-buyer">Buyer</Label>
+          <Input
+            id="filter-buyer"
+            value={filters.buyer}
+            onChange={(e) => setFilters({ ...filters, buyer: e.target.value })}
+          />
+        </div>
+        <div>
+          <Label htmlFor="filter-sort">Sort By</Label>
+          <select
+            id="filter-sort"
+            className="flex h-10 w-full rounded-md border border-input bg-background px-3 py-2 text-sm"
+            value={filters.sort}
+            onChange={(e) => setFilters({ ...filters, sort: e.target.value as Filters['sort'] })}
+          >
+            <option value="created_at">Newest</option>
+            <option value="risk_score">Risk Score</option>
+            <option value="amount">Amount</option>
+            <option value="due_at">Due Date</option>
+          </select>
+        </div>
+        <Button type="submit">Apply</Button>
+      </form>
+
+      {total !== null && (
+        <p className="text-sm text-muted-foreground">
+          Showing {invoices.length} of {total} invoices
+        </p>
+      )}
+
       {invoices.map((invoice) => (
         <Card key={invoice._id}>
           <CardHeader>
@@ -145,6 +247,12 @@ const InvoiceFunder = ({ setStats }: Props) => {
           </CardContent>
         </Card>
       ))}
+
+      {nextCursor && (
+        <Button onClick={loadMore} disabled={loadingMore} variant="outline" className="w-full">
+          {loadingMore ? 'Loading...' : 'Load More'}
+        </Button>
+      )}
     </div>
   )
 }
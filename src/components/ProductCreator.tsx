@@ -15,6 +15,36 @@ import {
 import QRCode from 'react-qr-code';
 import { API_ENDPOINTS } from '@/lib/api';
 
+interface MintStatus {
+  mint_status: string;
+  nft_token_id: number | null;
+  qr_code: string | null;
+  error: string | null;
+}
+
+const MINT_POLL_INTERVAL_MS = 2000;
+const MINT_POLL_ATTEMPTS = 90;
+
+// Products are minted by a background worker, so the token ID and QR code
+// only exist once the mint status reports "minted"
+const waitForMint = async (productId: string): Promise<MintStatus> => {
+  for (let attempt = 0; attempt < MINT_POLL_ATTEMPTS; attempt++) {
+    const response = await fetch(API_ENDPOINTS.mintStatus(productId));
+    const status: MintStatus = await response.json();
+    if (!response.ok) {
+      throw new Error('Failed to fetch mint status');
+    }
+    if (status.mint_status === 'minted') {
+      return status;
+    }
+    if (status.mint_status === 'failed') {
+      throw new Error(status.error || 'Minting failed');
+    }
+    await new Promise((resolve) => setTimeout(resolve, MINT_POLL_INTERVAL_MS));
+  }
+  throw new Error('Minting is taking longer than expected, check the product list later');
+};
+
 interface FormData {
   name: string;
   description: string;
@@ -51,13 +81,15 @@ const ProductCreator = () => {
     const data = await response.json();
     
     if (response.ok) {
+      // Anchored products get their QR code immediately; minted ones once the NFT exists
+      const minted = data.mint_status === 'pending_mint' ? await waitForMint(data.product_id) : data;
       // Use the unique QR code from backend
       const qrCodeData = JSON.stringify({
         product_id: data.product_id,
-        nft_token_id: data.nft_token_id,
+        nft_token_id: minted.nft_token_id,
         ipfs_cid: data.ipfs_cid,
         metadata_hash: data.metadata_hash,
-        qr_code: data.qr_code,
+        qr_code: minted.qr_code,
         verification_token: data.verification_token,
         serial_number: formData.serial_number,
         batch_id: formData.batch_id,
@@ -71,7 +103,9 @@ const ProductCreator = () => {
     }
   } catch (error) {
     console.error('Error:', error);
-    alert('Network error. Make sure backend is running on port 8001');
+    alert(error instanceof Error && error.message !== 'Failed to fetch'
+      ? error.message
+      : 'Network error. Make sure backend is running on port 8001');
   } finally {
     setIsLoading(false);
   }
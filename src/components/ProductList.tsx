@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import { Package, Calendar, Hash } from 'lucide-react';
-import { API_ENDPOINTS } from '../lib/api';
+import { fetchAllProducts } from '../lib/api';
 
 interface Product {
   _id: string;
@@ -22,9 +22,7 @@ const ProductList = () => {
 
   const fetchProducts = async () => {
     try {
-      const res = await fetch(API_ENDPOINTS.products);
-      const data = await res.json();
-      setProducts(data.products);
+      setProducts(await fetchAllProducts<Product>());
     } catch (error) {
       console.error('Failed to fetch products', error);
     } finally {
@@ -10,7 +10,7 @@ import {
   Loader2,
   Send
 } from 'lucide-react';
-import { API_ENDPOINTS } from '../lib/api';
+import { API_ENDPOINTS, fetchAllProducts, fetchAllTrackingEvents } from '../lib/api';
 
 interface Product {
   _id: string;
@@ -58,9 +58,7 @@ const ProductTracker = ({ role, userName }: ProductTrackerProps) => {
 
   const fetchProducts = async () => {
     try {
-      const res = await fetch(API_ENDPOINTS.products);
-      const data = await res.json();
-      setProducts(data.products || []);
+      setProducts(await fetchAllProducts<Product>());
     } catch (error) {
       console.error('Failed to fetch products', error);
     }
@@ -68,9 +66,7 @@ const ProductTracker = ({ role, userName }: ProductTrackerProps) => {
 
   const fetchTrackingEvents = async (productId: string) => {
     try {
-      const res = await fetch(`${API_ENDPOINTS.trackingEvents}/${productId}`);
-      const data = await res.json();
-      setTrackingEvents(data.events || []);
+      setTrackingEvents(await fetchAllTrackingEvents<TrackingEvent>(productId));
     } catch (error) {
       console.error('Failed to fetch tracking events', error);
     }
@@ -92,9 +92,10 @@ const QRScanner = ({ mode = 'customer', role, onClose }: QRScannerProps = {}) =>
     setLoading(true);
 
     try {
-      // Parse QR data - assume JSON format: {"tokenId": 123, "verificationToken": "abc..."}
+      // Parse QR data - JSON format: {"tokenId": 123, "verificationToken": "abc..."},
+      // or {"productId": "...", "verificationToken": "abc..."} for anchored products
       const parsedData = JSON.parse(qrData);
-      const { tokenId, verificationToken } = parsedData;
+      const { tokenId, productId, verificationToken } = parsedData;
 
       // Call backend verification API
       const response = await fetch(API_ENDPOINTS.verify, {
@@ -103,7 +104,7 @@ const QRScanner = ({ mode = 'customer', role, onClose }: QRScannerProps = {}) =>
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          token_id: parseInt(tokenId),
+          ...(productId ? { product_id: productId } : { token_id: parseInt(tokenId) }),
           verification_token: verificationToken,
         }),
       });
@@ -311,7 +312,7 @@ const QRScanner = ({ mode = 'customer', role, onClose }: QRScannerProps = {}) =>
             </div>
             <div>
               <span className="text-sm text-muted-foreground">NFT Token ID</span>
-              <p className="font-medium text-primary">#{result.product.nft_token_id}</p>
+              <p className="font-medium text-primary">{result.product.nft_token_id ? `#${result.product.nft_token_id}` : 'Merkle anchored'}</p>
             </div>
           </div>
         </div>
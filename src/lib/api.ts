@@ -5,11 +5,60 @@ export const API_ENDPOINTS = {
   login: `${API_BASE_URL}api/login`,
   register: `${API_BASE_URL}api/register`,
   products: `${API_BASE_URL}api/products`,
+  mintStatus: (productId: string) => `${API_BASE_URL}api/products/${productId}/mint_status`,
   verify: `${API_BASE_URL}api/verify`,
   trackingEvents: `${API_BASE_URL}api/tracking_events`,
   invoicesCreate: `${API_BASE_URL}api/invoices_create`,
   getInvoices: `${API_BASE_URL}api/get_invoices`,
   invoicesFunded: `${API_BASE_URL}api/invoices_funded`,
+  fundInvoice: (invoiceId: string) => `${API_BASE_URL}api/invoices/${invoiceId}/fund`,
   distributorStats: `${API_BASE_URL}api/distributor_stats`,
   retailerStats: `${API_BASE_URL}api/retailer_stats`,
-};
\ No newline at end of file
+};
+
+// Attach the login token when present; portfolio reads fall back to an anonymous investor, funding requires it
+export const authHeaders = (): Record<string, string> => {
+  const token = localStorage.getItem('token');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+// GET /api/products returns one page at a time; follow next_cursor to load them all
+export const fetchAllProducts = async <T = any>(): Promise<T[]> => {
+  const products: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const url = cursor ? `${API_ENDPOINTS.products}?cursor=${encodeURIComponent(cursor)}` : API_ENDPOINTS.products;
+    const res = await fetch(url);
+    if (!res.ok) {
+      throw new Error('Failed to fetch products');
+    }
+    const data = await res.json();
+    products.push(...(data.products || []));
+    cursor = data.next_cursor;
+  } while (cursor);
+  return products;
+};
+
+// Every tracking event of a product, following the cursor across pages
+export const fetchAllTrackingEvents = async <T = any>(productId: string): Promise<T[]> => {
+  const events: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const url = `${API_ENDPOINTS.trackingEvents}/${productId}` + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : '');
+    const res = await fetch(url);
+    if (!res.ok) {
+      throw new Error('Failed to fetch tracking events');
+    }
+    const data = await res.json();
+    events.push(...(data.events || []));
+    cursor = data.next_cursor;
+  } while (cursor);
+  return events;
+};
+
+// Product count without downloading the list
+export const fetchProductCount = async (): Promise<number> => {
+  const res = await fetch(`${API_ENDPOINTS.products}?limit=1&fields=_id&include_total=true`);
+  const data = await res.json();
+  return data.total;
+};
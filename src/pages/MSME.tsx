@@ -4,7 +4,7 @@ import Dashboard from '../components/Dashboard'
 import InvoiceCreator from '../components/InvoiceCreator'
 import InvoiceSettlement from '../components/InvoiceSettlement'
 import { FileText, DollarSign, CheckCircle, TrendingUp } from 'lucide-react'
-import { API_ENDPOINTS } from '../lib/api'
+import { API_ENDPOINTS, fetchProductCount } from '../lib/api'
 
 const MSME = () => {
   const [totalInvoices, setTotalInvoices] = useState(0)
@@ -17,9 +17,9 @@ const MSME = () => {
 
   const fetchInvoices = async () => {
     try {
-      const res = await fetch(API_ENDPOINTS.getInvoices)
+      const res = await fetch(`${API_ENDPOINTS.getInvoices}?limit=1&fields=_id&include_total=true`)
       const data = await res.json()
-      setTotalInvoices(data.invoices.length)
+      setTotalInvoices(data.total)
     } catch (err) {
       console.error('Failed to fetch invoices', err)
     }
@@ -27,9 +27,7 @@ const MSME = () => {
 
   const fetchProducts = async () => {
     try {
-      const res = await fetch(API_ENDPOINTS.products)
-      const data = await res.json()
-      setNftsMinted(data.products.length)
+      setNftsMinted(await fetchProductCount())
     } catch (err) {
       console.error('Failed to fetch products', err)
     }